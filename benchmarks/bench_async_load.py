@@ -0,0 +1,87 @@
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+# Add project root to path to allow direct script execution
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from recommenders.router_agent import create_router
+from retrievers.cache import query_cache
+from retrievers.resources import registry, close_async_resources
+
+DEFAULT_PROMPTS = ["company:Google", "users similar to u001", "connections for u001", "recommend people for u001"]
+
+def percentile(latencies, p):
+    ordered = sorted(latencies)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+def run_sync(router, prompts, concurrency):
+    """Serves every prompt through router.invoke on `concurrency` threads."""
+    def timed(prompt):
+        start = time.perf_counter()
+        router.invoke({"input": prompt})
+        return (time.perf_counter() - start) * 1000
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(timed, prompts))
+
+async def run_async(router, prompts, concurrency):
+    """Serves every prompt through router.ainvoke with at most `concurrency` in flight."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def timed(prompt):
+        async with semaphore:
+            start = time.perf_counter()
+            await router.ainvoke({"input": prompt})
+            return (time.perf_counter() - start) * 1000
+
+    return await asyncio.gather(*(timed(prompt) for prompt in prompts))
+
+def report(mode, concurrency, latencies, elapsed):
+    print(f"{mode:<6} {concurrency:>5} {statistics.median(latencies):>9.1f} {percentile(latencies, 99):>9.1f} "
+          f"{len(latencies) / elapsed:>9.1f}")
+
+async def main_async(args):
+    router = create_router()
+    prompts = args.prompts or DEFAULT_PROMPTS
+    # Warm up connections and models so the first level does not pay for loading them
+    for prompt in prompts:
+        router.invoke({"input": prompt})
+        await router.ainvoke({"input": prompt})
+
+    print(f"{'mode':<6} {'conc.':>5} {'p50 (ms)':>9} {'p99 (ms)':>9} {'req/s':>9}")
+    concurrency = 1
+    while concurrency <= args.max_concurrency:
+        batch = [prompts[i % len(prompts)] for i in range(args.requests)]
+        for mode in ["sync", "async"]:
+            start = time.perf_counter()
+            if mode == "sync":
+                latencies = await asyncio.get_running_loop().run_in_executor(None, run_sync, router, batch, concurrency)
+            else:
+                latencies = await run_async(router, batch, concurrency)
+            report(mode, concurrency, latencies, time.perf_counter() - start)
+        concurrency *= 2
+    await close_async_resources()
+
+def main():
+    """Measures p50/p99 latency of fast-path prompts at increasing concurrency, sync vs async."""
+    parser = argparse.ArgumentParser(description="Load test the sync and async router entry points.")
+    parser.add_argument("prompts", nargs="*", help="Fast-path prompts to cycle through.")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per concurrency level and mode.")
+    parser.add_argument("--max-concurrency", type=int, default=64, help="Highest concurrency level (doubles from 1).")
+    parser.add_argument("--with-cache", action="store_true", help="Keep the query cache on (measures cache hits instead of backends).")
+    args = parser.parse_args()
+
+    if not args.with_cache:
+        query_cache.ttl = 0
+    try:
+        asyncio.run(main_async(args))
+    finally:
+        registry.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+
+# Add project root to path to allow direct script execution
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from retrievers.bio_store import BioStore, build_bio_index
+
+def write_synthetic_bios(path, n):
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(n):
+            record = {"user_id": f"u{i:07d}", "bio": f"Synthetic bio number {i}. " * 20, "sources": ["synthetic"]}
+            f.write(json.dumps(record) + '\n')
+
+def linear_scan_bio(path, user_id):
+    """The original get_user_bio implementation: parse every line until a match."""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line)
+            if record['user_id'] == user_id:
+                return record['bio']
+    return None
+
+def main():
+    """Compares linear JSONL scans against the offset-indexed BioStore on synthetic corpora."""
+    parser = argparse.ArgumentParser(description="Benchmark bio lookup: linear scan vs offset index.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000], help="Corpus sizes to test.")
+    parser.add_argument("--lookups", type=int, default=10_000, help="Number of random indexed lookups per size.")
+    parser.add_argument("--scan-lookups", type=int, default=5, help="Number of random linear-scan lookups per size.")
+    args = parser.parse_args()
+
+    print(f"{'records':>10} {'index build (s)':>16} {'scan (ms/op)':>13} {'index (us/op)':>14}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for n in args.sizes:
+            path = os.path.join(tmp_dir, f"bios_{n}.jsonl")
+            write_synthetic_bios(path, n)
+            ids = [f"u{random.randrange(n):07d}" for _ in range(max(args.lookups, args.scan_lookups))]
+
+            start = time.perf_counter()
+            build_bio_index(path)
+            build_s = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for user_id in ids[:args.scan_lookups]:
+                linear_scan_bio(path, user_id)
+            scan_ms = (time.perf_counter() - start) * 1000 / args.scan_lookups
+
+            store = BioStore(path)
+            start = time.perf_counter()
+            for user_id in ids[:args.lookups]:
+                store.get_bio(user_id)
+            index_us = (time.perf_counter() - start) * 1e6 / args.lookups
+            store.close()
+
+            print(f"{n:>10} {build_s:>16.2f} {scan_ms:>13.2f} {index_us:>14.1f}")
+
+if __name__ == "__main__":
+    main()
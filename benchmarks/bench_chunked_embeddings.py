@@ -0,0 +1,72 @@
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+# Add project root to path to allow direct script execution
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ingest.chunking import chunk_for_model, DEFAULT_CHUNK_TOKENS
+from retrievers.resources import BIOS_FILE_PATH, get_embedding_model, registry
+from retrievers.vector import LocalVectorIndex, get_semantic_recommendations
+from retrievers.vector_store import QuantizedVectorStore
+
+def load_bios(path, repeat):
+    """Reads parsed bios; repeat > 1 appends numbered copies of each bio's text to simulate long resumes."""
+    bios = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line)
+            if record.get("bio"):
+                bios[record["user_id"]] = "\n\n".join([record["bio"]] * repeat)
+    return bios
+
+def build(bios, model, chunk_tokens):
+    """Chunks and encodes every bio into a local store. Returns (store, seconds)."""
+    start = time.perf_counter()
+    user_ids, texts = [], []
+    for user_id, bio in bios.items():
+        for chunk in chunk_for_model(bio, model, chunk_tokens):
+            user_ids.append(user_id)
+            texts.append(chunk)
+    vectors = model.encode(texts, batch_size=64)
+    store = QuantizedVectorStore.from_vectors(user_ids, vectors, n_lists=0)
+    return store, time.perf_counter() - start
+
+def main():
+    """Compares one truncated vector per bio with chunked multi-vector embeddings:
+    vectors stored, index size, share of bio tokens embedded, build time and query latency."""
+    parser = argparse.ArgumentParser(description="Benchmark chunked vs single-vector bio embeddings.")
+    parser.add_argument("--repeat", type=int, default=1, help="Concatenate each bio this many times to lengthen it.")
+    parser.add_argument("--chunk-tokens", type=int, default=DEFAULT_CHUNK_TOKENS, help="Maximum tokens per chunk.")
+    parser.add_argument("--queries", type=int, default=50, help="Users queried per layout.")
+    args = parser.parse_args()
+
+    model = get_embedding_model()
+    bios = load_bios(BIOS_FILE_PATH, args.repeat)
+    token_counts = {user_id: len(model.tokenizer.tokenize(bio)) for user_id, bio in bios.items()}
+    total_tokens = sum(token_counts.values())
+    # Two special tokens share the model's sequence budget
+    embedded_single = sum(min(count, model.max_seq_length - 2) for count in token_counts.values())
+    query_users = list(bios)[:args.queries]
+
+    print(f"{len(bios)} bios, {total_tokens / len(bios):.0f} tokens on average (model limit {model.max_seq_length})\n")
+    print(f"{'layout':<22} {'vectors':>8} {'size (MB)':>10} {'tokens embedded':>16} {'build (s)':>10} {'query p50 (ms)':>15}")
+    for label, chunk_tokens in [("single vector", 0), (f"chunks of {args.chunk_tokens}", args.chunk_tokens)]:
+        store, build_seconds = build(bios, model, chunk_tokens)
+        size_mb = (store.codes.nbytes + store.vectors.nbytes) / 1e6
+        coverage = embedded_single / total_tokens if chunk_tokens == 0 else 1.0
+        index = LocalVectorIndex(store)
+        timings = []
+        for user_id in query_users:
+            start = time.perf_counter()
+            get_semantic_recommendations.uncached(user_id, index, model)
+            timings.append((time.perf_counter() - start) * 1000)
+        print(f"{label:<22} {len(store):>8} {size_mb:>10.2f} {coverage:>16.1%} {build_seconds:>10.2f} "
+              f"{statistics.median(timings):>15.2f}")
+    registry.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import os
+import sys
+import time
+import argparse
+import statistics
+
+# Add project root to path to allow direct script execution
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from recommenders.graph_candidates import load_edges
+from retrievers.graph import get_graph_recommendations, get_precomputed_graph_recommendations
+from retrievers.resources import get_duckdb_cursor, get_neo4j_driver, registry
+
+def median_ms(fn, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+def main():
+    """Compares live two-hop Cypher against the precomputed candidates table for hub-heavy and sparse users."""
+    parser = argparse.ArgumentParser(description="Benchmark live vs precomputed graph recommendations.")
+    parser.add_argument("--users", type=int, default=5, help="Number of hub-heavy and of sparse users to test.")
+    parser.add_argument("--runs", type=int, default=20, help="Timed calls per user and path.")
+    args = parser.parse_args()
+
+    driver = get_neo4j_driver()
+    user_entities, entity_members = load_edges(driver)
+
+    # A user's expansion cost is the total size of the schools/companies they are attached to
+    fan_out = {user_id: sum(len(entity_members[e]) for e in entities) for user_id, entities in user_entities.items()}
+    ranked = sorted(fan_out, key=fan_out.get)
+    groups = [("hub-heavy", ranked[::-1][:args.users]), ("sparse", ranked[:args.users])]
+
+    con = get_duckdb_cursor()
+    # The best-connected user is the one certain to have candidates
+    if get_precomputed_graph_recommendations(ranked[-1], con) is None:
+        print("Candidates table not found. Run recommenders/graph_candidates.py first.")
+        return
+
+    print(f"{'group':<10} {'user':<8} {'fan-out':>8} {'live (ms)':>10} {'precomputed (ms)':>17}")
+    for label, user_ids in groups:
+        for user_id in user_ids:
+            live = median_ms(lambda: get_graph_recommendations.uncached(user_id, driver), args.runs)
+            precomputed = median_ms(lambda: get_precomputed_graph_recommendations(user_id, con), args.runs)
+            print(f"{label:<10} {user_id:<8} {fan_out[user_id]:>8} {live:>10.2f} {precomputed:>17.2f}")
+
+    con.close()
+    registry.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import os
+import sys
+import time
+import random
+import string
+import argparse
+
+# Add project root to path to allow direct script execution
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from retrievers.name_index import NameIndex
+
+def random_token(rng):
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 9))).capitalize()
+
+def synthetic_names(n, rng):
+    """Names drawn from a first/last-name vocabulary, so tokens repeat the way real names do."""
+    first = [random_token(rng) for _ in range(max(50, n // 200))]
+    last = [random_token(rng) for _ in range(max(100, n // 50))]
+    return [(f"{rng.choice(first)} {rng.choice(last)}", f"u{i:07d}") for i in range(n)]
+
+def typo(name, rng):
+    """Swaps two adjacent letters in a random token of a name."""
+    tokens = name.split()
+    i = rng.randrange(len(tokens))
+    j = rng.randrange(len(tokens[i]) - 1)
+    token = tokens[i]
+    tokens[i] = token[:j] + token[j + 1] + token[j] + token[j + 2:]
+    return " ".join(tokens)
+
+def time_calls(fn, queries):
+    start = time.perf_counter()
+    for query in queries:
+        fn(query)
+    return (time.perf_counter() - start) * 1e6 / len(queries)
+
+def main():
+    """Measures NameIndex build time, resolve() latency (best match only) for exact,
+    case-folded, prefix and misspelt names, and lookup() latency for 5 ranked candidates."""
+    parser = argparse.ArgumentParser(description="Benchmark name resolution on synthetic name sets.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000], help="Number of names to index.")
+    parser.add_argument("--lookups", type=int, default=2_000, help="Lookups per query kind and size.")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    print(f"{'names':>10} {'build (s)':>10} {'exact (us)':>11} {'casefold (us)':>14} {'prefix (us)':>12} "
+          f"{'typo (us)':>10} {'top-5 (us)':>11}")
+    for n in args.sizes:
+        entries = synthetic_names(n, rng)
+        start = time.perf_counter()
+        index = NameIndex(entries)
+        build_s = time.perf_counter() - start
+
+        sample = [rng.choice(entries)[0] for _ in range(args.lookups)]
+        typos = [typo(name, rng) for name in sample]
+        exact_us = time_calls(index.resolve, sample)
+        casefold_us = time_calls(index.resolve, [name.lower() for name in sample])
+        prefix_us = time_calls(index.resolve, [name[:5].lower() for name in sample])
+        typo_us = time_calls(index.resolve, typos)
+        ranked_us = time_calls(index.lookup, typos)
+        print(f"{n:>10} {build_s:>10.2f} {exact_us:>11.1f} {casefold_us:>14.1f} {prefix_us:>12.1f} "
+              f"{typo_us:>10.1f} {ranked_us:>11.1f}")
+
+if __name__ == "__main__":
+    main()
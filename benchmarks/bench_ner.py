@@ -0,0 +1,43 @@
+import os
+import sys
+import time
+import argparse
+import spacy
+
+# Add project root to path to allow direct script execution
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from retrievers.graph_builder import PARSED_BIOS_PATH, load_parsed_bios, load_ner_model
+
+def orgs(doc):
+    return [ent.text for ent in doc.ents if ent.label_ == 'ORG']
+
+def run(label, fn, texts):
+    start = time.perf_counter()
+    fn(texts)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<36} {elapsed:>8.2f}s {len(texts) / elapsed:>10.1f} docs/sec")
+
+def main():
+    """Compares serial, piped and multi-process spaCy NER throughput over the parsed bios."""
+    parser = argparse.ArgumentParser(description="Benchmark spaCy NER: serial vs nlp.pipe vs multi-process.")
+    parser.add_argument("--bios-file", type=str, default=PARSED_BIOS_PATH, help="Parsed bios JSONL file.")
+    parser.add_argument("--repeat", type=int, default=10, help="Repeat the corpus to get a measurable workload.")
+    parser.add_argument("--batch-size", type=int, default=32, help="nlp.pipe batch size.")
+    parser.add_argument("--processes", type=int, default=os.cpu_count(), help="Worker processes for the multi-process run.")
+    args = parser.parse_args()
+
+    texts = list(load_parsed_bios(args.bios_file).values()) * args.repeat
+    print(f"Benchmarking NER on {len(texts)} bios\n")
+
+    full_nlp = spacy.load("en_core_web_sm")
+    ner_nlp = load_ner_model()
+
+    run("serial, full pipeline", lambda t: [orgs(full_nlp(text)) for text in t], texts)
+    run("serial, NER only", lambda t: [orgs(ner_nlp(text)) for text in t], texts)
+    run("nlp.pipe, NER only", lambda t: [orgs(doc) for doc in ner_nlp.pipe(t, batch_size=args.batch_size)], texts)
+    run(f"nlp.pipe, NER only, {args.processes} processes",
+        lambda t: [orgs(doc) for doc in ner_nlp.pipe(t, batch_size=args.batch_size, n_process=args.processes)], texts)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import duckdb
+
+# Add project root to path to allow direct script execution
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ingest.load_profiles import write_users
+from retrievers.resources import registry
+from retrievers.sql import get_sql_recommendations, get_sql_matches_batch, get_user_details, get_user_columns
+
+def write_synthetic_users(path, n):
+    """Writes n synthetic users to a CSV and loads it with the same schema and indexes as load_profiles."""
+    csv_path = path + ".csv"
+    con = duckdb.connect(path)
+    con.execute(f"""
+        COPY (SELECT
+            printf('u%07d', i) AS user_id, 'User ' || i AS name, 'user' || i || '@example.com' AS email,
+            'Company ' || (i % 1000) AS company, 'School ' || (i % 200) AS school, 'City ' || (i % 50) AS location,
+            'Bio of user ' || i AS bio, 'Tag' AS tags, 'Engineer' AS title
+        FROM range({n}) t(i)) TO '{csv_path}' (HEADER)
+    """)
+    write_users(con, csv_path)
+    con.close()
+
+def connect_per_call(path, field, value):
+    """The original access pattern: a fresh read-only connection per call. The query is the
+    same indexed `<field>_key` lookup as the pooled path, so only the connection cost differs."""
+    con = duckdb.connect(database=path, read_only=True)
+    try:
+        return get_sql_recommendations.uncached(field, value, duckdb_con=con)
+    finally:
+        con.close()
+
+def calls_per_second(fn, args_list):
+    start = time.perf_counter()
+    for args in args_list:
+        fn(*args)
+    return len(args_list) / (time.perf_counter() - start)
+
+def main():
+    """Compares per-call connections, pooled thread cursors and batched lookups on a synthetic users table."""
+    parser = argparse.ArgumentParser(description="Benchmark SQL retriever calls/sec before and after connection pooling.")
+    parser.add_argument("--users", type=int, default=100_000, help="Rows in the synthetic users table.")
+    parser.add_argument("--calls", type=int, default=1_000, help="Lookups per pattern.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "users.duckdb")
+        write_synthetic_users(path, args.users)
+        # Point the shared connection at the synthetic database
+        registry.register("duckdb", lambda: duckdb.connect(database=path, read_only=True),
+                          closer=lambda con: con.close())
+
+        rng = random.Random(42)
+        values = [("company", f"Company {rng.randrange(1000)}") for _ in range(args.calls)]
+        user_ids = [f"u{rng.randrange(args.users):07d}" for _ in range(args.calls)]
+
+        print(f"{'pattern':<34} {'calls/sec':>12}")
+        rows = [
+            ("field lookup, connect per call", calls_per_second(lambda f, v: connect_per_call(path, f, v), values)),
+            ("field lookup, thread cursor", calls_per_second(get_sql_recommendations.uncached, values)),
+            ("field lookup, batched", args.calls / timed(lambda: get_sql_matches_batch("company", [v for _, v in values]))),
+            ("user details, one id per call", calls_per_second(lambda u: get_user_details([u]), [(u,) for u in user_ids])),
+            ("user details, batched (NumPy)", args.calls / timed(lambda: get_user_columns(user_ids))),
+        ]
+        for name, rate in rows:
+            print(f"{name:<34} {rate:>12.0f}")
+        registry.close()
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+PROJECT_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Modules behind the retriever, recommender and agent CLIs
+DEFAULT_MODULES = [
+    "retrievers.sql",
+    "retrievers.vector",
+    "retrievers.graph",
+    "recommenders.hybrid",
+    "recommenders.router_agent",
+]
+
+def import_profile(module):
+    """Imports a module in a fresh interpreter under -X importtime.
+    Returns (wall seconds, {imported module: cumulative microseconds})."""
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=PROJECT_ROOT, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{proc.stderr.strip().splitlines()[-1]}")
+
+    cumulative = {}
+    # Lines look like "import time:   self [us] | cumulative | imported package"
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        if cumulative_us.strip().isdigit():
+            cumulative[name.strip()] = int(cumulative_us)
+    return elapsed, cumulative
+
+def main():
+    """Measures cold-start cost of the entry-point modules: wall time of `import <module>`
+    in a fresh interpreter, and the heaviest top-level imports it pulls in."""
+    parser = argparse.ArgumentParser(description="Benchmark cold import time of the CLI entry points.")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES, help="Modules to import.")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters per module.")
+    parser.add_argument("--top", type=int, default=5, help="Heaviest top-level imports listed per module.")
+    args = parser.parse_args()
+
+    baseline = statistics.median(import_profile("sys")[0] for _ in range(args.runs))
+    print(f"Interpreter start-up: {baseline * 1000:.0f} ms\n")
+    print(f"{'module':<28} {'wall p50 (ms)':>14} {'import (ms)':>12}  heaviest imports")
+    for module in args.modules:
+        try:
+            profiles = [import_profile(module) for _ in range(args.runs)]
+        except RuntimeError as e:
+            print(f"{module:<28} {e}")
+            continue
+        wall = statistics.median(elapsed for elapsed, _ in profiles)
+        cumulative = profiles[-1][1]
+        # Report packages by their top-level name, e.g. langchain_core rather than langchain_core.tools
+        packages = {}
+        for name, us in cumulative.items():
+            top_level = name.split(".")[0]
+            packages[top_level] = max(packages.get(top_level, 0), us)
+        heaviest = sorted((p for p in packages if p != module.split(".")[0]), key=packages.get, reverse=True)[:args.top]
+        print(f"{module:<28} {wall * 1000:>14.0f} {cumulative.get(module, 0) / 1000:>12.0f}  "
+              + ", ".join(f"{p} {packages[p] / 1000:.0f}ms" for p in heaviest))
+
+if __name__ == "__main__":
+    main()
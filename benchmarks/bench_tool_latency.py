@@ -0,0 +1,47 @@
+import os
+import sys
+import time
+import argparse
+import statistics
+
+# Add project root to path to allow direct script execution
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from recommenders.router_agent import sql_retriever, vector_retriever, graph_retriever
+from retrievers.resources import registry
+from retrievers.cache import query_cache
+
+def time_call(tool, arg):
+    start = time.perf_counter()
+    tool(arg)
+    return (time.perf_counter() - start) * 1000
+
+def main():
+    """Measures cold (first call) vs warm (subsequent calls) latency of each agent tool."""
+    parser = argparse.ArgumentParser(description="Benchmark cold vs warm router_agent tool-call latency.")
+    parser.add_argument("--user-id", type=str, default="u001", help="User ID for the vector and graph tools.")
+    parser.add_argument("--sql-query", type=str, default="company:Google", help="'field:value' query for the SQL tool.")
+    parser.add_argument("--runs", type=int, default=20, help="Number of warm calls per tool.")
+    parser.add_argument("--skip-graph", action="store_true", help="Skip the graph tool (e.g. when Neo4j is unavailable).")
+    parser.add_argument("--with-cache", action="store_true", help="Keep the query cache on (warm calls become cache hits).")
+    args = parser.parse_args()
+
+    if not args.with_cache:
+        query_cache.ttl = 0
+
+    cases = [("sql_retriever", sql_retriever, args.sql_query),
+             ("vector_retriever", vector_retriever, args.user_id)]
+    if not args.skip_graph:
+        cases.append(("graph_retriever", graph_retriever, args.user_id))
+
+    print(f"{'tool':<18} {'cold (ms)':>10} {'warm p50 (ms)':>14} {'warm max (ms)':>14}")
+    for name, tool, arg in cases:
+        cold = time_call(tool, arg)
+        warm = [time_call(tool, arg) for _ in range(args.runs)]
+        print(f"{name:<18} {cold:>10.1f} {statistics.median(warm):>14.1f} {max(warm):>14.1f}")
+
+    print(f"\nResource health: {registry.health()}")
+    registry.close()
+
+if __name__ == "__main__":
+    main()
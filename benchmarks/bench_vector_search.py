@@ -0,0 +1,90 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+from qdrant_client import QdrantClient, models
+
+# Add project root to path to allow direct script execution
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from retrievers.resources import get_qdrant_client, registry
+from retrievers.vector_store import QuantizedVectorStore, export_qdrant_vectors, DEFAULT_NPROBE
+
+def synthetic_vectors(n, dim, rng):
+    """Clustered unit vectors, so neighbourhoods look more like real embeddings than pure noise."""
+    centers = rng.normal(size=(max(1, n // 100), dim))
+    vectors = centers[rng.integers(len(centers), size=n)] + 0.5 * rng.normal(size=(n, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+def load_into_qdrant(user_ids, vectors):
+    client = QdrantClient(":memory:")
+    client.create_collection("bench", vectors_config=models.VectorParams(size=vectors.shape[1], distance=models.Distance.COSINE))
+    for start in range(0, len(vectors), 1024):
+        client.upsert("bench", points=[
+            models.PointStruct(id=i, vector=vectors[i].tolist(), payload={"user_id": user_ids[i]})
+            for i in range(start, min(start + 1024, len(vectors)))
+        ])
+    return client
+
+def measure(search, queries, truth, k):
+    """Returns (recall@k, queries/sec) of a search function returning ranked user_ids."""
+    hits = 0
+    start = time.perf_counter()
+    results = [search(query) for query in queries]
+    elapsed = time.perf_counter() - start
+    for found, expected in zip(results, truth):
+        hits += len(set(found[:k]) & expected)
+    return hits / (k * len(queries)), len(queries) / elapsed
+
+def main():
+    """Compares recall@k and QPS of the Qdrant path and the local int8 store (exact and IVF)
+    on the same vectors, against exact float32 ground truth."""
+    parser = argparse.ArgumentParser(description="Benchmark Qdrant against the local quantized vector store.")
+    parser.add_argument("--source", choices=["collection", "synthetic"], default="synthetic",
+                        help="Use the indexed profiles collection or synthetic vectors.")
+    parser.add_argument("--vectors", type=int, default=100_000, help="Synthetic vectors to generate.")
+    parser.add_argument("--dim", type=int, default=384, help="Synthetic vector dimension.")
+    parser.add_argument("--queries", type=int, default=200, help="Query vectors, drawn from the data.")
+    parser.add_argument("--k", type=int, default=10, help="Neighbours per query.")
+    parser.add_argument("--nprobe", type=int, default=DEFAULT_NPROBE, help="IVF lists searched per query.")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    if args.source == "collection":
+        client = get_qdrant_client()
+        user_ids, vectors, _ = export_qdrant_vectors(client)
+        collection = "profiles"
+        vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    else:
+        vectors = synthetic_vectors(args.vectors, args.dim, rng)
+        user_ids = [f"u{i:07d}" for i in range(len(vectors))]
+        client = load_into_qdrant(user_ids, vectors)
+        collection = "bench"
+
+    ids = np.asarray(user_ids)
+    query_rows = rng.choice(len(vectors), min(args.queries, len(vectors)), replace=False)
+    queries = vectors[query_rows]
+    truth = [set(ids[np.argsort(-(vectors @ query))[:args.k]]) for query in queries]
+
+    start = time.perf_counter()
+    exact_store = QuantizedVectorStore.from_vectors(user_ids, vectors, n_lists=0)
+    print(f"Built int8 store for {len(vectors)} vectors in {time.perf_counter() - start:.2f}s")
+    start = time.perf_counter()
+    ivf_store = QuantizedVectorStore.from_vectors(user_ids, vectors, n_lists=max(1, int(4 * np.sqrt(len(vectors)))))
+    print(f"Built int8 + IVF store ({len(ivf_store.centroids)} lists) in {time.perf_counter() - start:.2f}s")
+
+    paths = [
+        ("qdrant", lambda q: [hit.payload["user_id"] for hit in
+                              client.search(collection_name=collection, query_vector=q.tolist(), limit=args.k)]),
+        ("local int8, exact scan", lambda q: [u for u, _ in exact_store.search(q, args.k)]),
+        (f"local int8, IVF nprobe={args.nprobe}", lambda q: [u for u, _ in ivf_store.search(q, args.k, nprobe=args.nprobe)]),
+    ]
+    print(f"\n{'path':<28} {f'recall@{args.k}':>10} {'QPS':>10}")
+    for name, search in paths:
+        recall, qps = measure(search, queries, truth, args.k)
+        print(f"{name:<28} {recall:>10.3f} {qps:>10.0f}")
+    registry.close()
+
+if __name__ == "__main__":
+    main()
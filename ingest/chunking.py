@@ -0,0 +1,81 @@
+import re
+
+# all-MiniLM-L6-v2 truncates at 256 word pieces; leave room for the special tokens
+DEFAULT_CHUNK_TOKENS = 200
+# Sentences repeated at the start of the next chunk when a section is split
+DEFAULT_OVERLAP_SENTENCES = 1
+
+_SECTION_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+def count_words(text):
+    return len(text.split())
+
+def _split_long(sentence, max_tokens, count_tokens):
+    """Cuts a single over-long sentence into word windows that fit max_tokens."""
+    words = sentence.split()
+    window = max(1, len(words) * max_tokens // max(1, count_tokens(sentence)))
+    while window > 1 and any(count_tokens(" ".join(words[i:i + window])) > max_tokens
+                             for i in range(0, len(words), window)):
+        window = window * 3 // 4
+    return [" ".join(words[i:i + window]) for i in range(0, len(words), window)]
+
+def _pack(units, max_tokens, count_tokens, overlap):
+    """Greedily packs text units into chunks of at most max_tokens, carrying the last
+    `overlap` units of a full chunk into the next one."""
+    chunks, current, size = [], [], 0
+    for unit, tokens in units:
+        if current and size + tokens > max_tokens:
+            chunks.append(current)
+            current = current[-overlap:] if overlap else []
+            size = sum(t for _, t in current)
+            # Drop the carried context if it would not leave room for the new unit
+            if size + tokens > max_tokens:
+                current, size = [], 0
+        current.append((unit, tokens))
+        size += tokens
+    if current:
+        chunks.append(current)
+    return [" ".join(unit for unit, _ in chunk) for chunk in chunks]
+
+def chunk_bio(bio, max_tokens=DEFAULT_CHUNK_TOKENS, count_tokens=count_words, overlap=DEFAULT_OVERLAP_SENTENCES):
+    """Splits a bio into chunks that each fit the embedding model's input.
+
+    Bios are concatenated bio and resume files, so blank lines mark sections. Short
+    sections are packed together; long ones are split at sentence boundaries with
+    `overlap` sentences repeated for context, and over-long sentences at word windows.
+    `count_tokens` should be the model tokenizer's count; words are used by default.
+    Returns a list of strings (empty for an empty bio).
+    """
+    sections = []
+    for section in _SECTION_BREAK.split(bio or ""):
+        section = " ".join(section.split())
+        if section:
+            sections.append((section, count_tokens(section)))
+
+    chunks = []
+    pending = []
+    for section, tokens in sections:
+        if tokens <= max_tokens:
+            pending.append((section, tokens))
+            continue
+        # Flush the short sections before a long one so chunks follow the document order
+        chunks.extend(_pack(pending, max_tokens, count_tokens, 0))
+        pending = []
+        sentences = []
+        for sentence in _SENTENCE_END.split(section):
+            sentence_tokens = count_tokens(sentence)
+            if sentence_tokens <= max_tokens:
+                sentences.append((sentence, sentence_tokens))
+            else:
+                sentences.extend((part, count_tokens(part)) for part in _split_long(sentence, max_tokens, count_tokens))
+        chunks.extend(_pack(sentences, max_tokens, count_tokens, overlap))
+    chunks.extend(_pack(pending, max_tokens, count_tokens, 0))
+    return chunks
+
+def chunk_for_model(bio, model, max_tokens=DEFAULT_CHUNK_TOKENS):
+    """chunk_bio measured with a SentenceTransformer's own tokenizer.
+    max_tokens=0 keeps the whole bio as one text, which the model truncates."""
+    if not max_tokens:
+        return [bio] if bio else []
+    return chunk_bio(bio, max_tokens, lambda text: len(model.tokenizer.tokenize(text)))
@@ -1,38 +1,129 @@
-import duckdb
 import os
+import sys
+import argparse
+
+# Add project root to path to allow direct script execution
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ingest.manifest import content_hash, load_manifest, save_manifest, bump_data_version
+from retrievers.name_index import refresh_name_indexes
+from retrievers.resources import connect_duckdb_for_write
 
 # Define paths
 DATA_DIR = "data"
 CSV_FILE = os.path.join(DATA_DIR, "structured", "users.csv")
 DB_FILE = os.path.join(DATA_DIR, "db", "profiles.duckdb")
+MANIFEST_STAGE = "load_profiles"
+
+# Declared column types for users.csv, in file order
+CSV_COLUMNS = {
+    "user_id": "VARCHAR", "name": "VARCHAR", "email": "VARCHAR", "company": "VARCHAR", "school": "VARCHAR",
+    "location": "VARCHAR", "bio": "VARCHAR", "tags": "VARCHAR", "title": "VARCHAR",
+}
+# Fields that get a lower-cased, trimmed `<field>_key` column with an ART index for equality lookups
+LOOKUP_FIELDS = ["name", "company", "school", "location"]
+
+# The small filter columns live in `users`; the wide bio text is kept in `user_bios`
+# so scans over company/school/location never read bio pages
+USERS_TABLE_SQL = f"""
+CREATE TABLE users (
+    user_id VARCHAR PRIMARY KEY,
+    name VARCHAR NOT NULL,
+    email VARCHAR,
+    company VARCHAR,
+    school VARCHAR,
+    location VARCHAR,
+    tags VARCHAR,
+    title VARCHAR,
+    {', '.join(f'{field}_key VARCHAR' for field in LOOKUP_FIELDS)}
+)"""
+USER_BIOS_TABLE_SQL = """
+CREATE TABLE user_bios (
+    user_id VARCHAR PRIMARY KEY,
+    bio VARCHAR NOT NULL
+)"""
+
+def write_users(con, csv_file):
+    """Replaces the users and user_bios tables with the rows of `csv_file` in one transaction.
+    Rows are stored sorted by company, school and location so that DuckDB's per-row-group
+    min/max statistics let filter scans skip most of the table; the ART indexes are built
+    after the insert, which is much faster than maintaining them row by row."""
+    columns = ", ".join(f"'{name}': '{sql_type}'" for name, sql_type in CSV_COLUMNS.items())
+    keys = ", ".join(f"lower(trim({field}))" for field in LOOKUP_FIELDS)
+    con.execute("BEGIN TRANSACTION")
+    try:
+        con.execute("DROP TABLE IF EXISTS user_bios")
+        con.execute("DROP TABLE IF EXISTS users")
+        con.execute(f"CREATE TEMP TABLE staged_users AS SELECT * FROM read_csv('{csv_file}', header=true, columns={{{columns}}})")
+        con.execute(USERS_TABLE_SQL)
+        con.execute(f"""
+            INSERT INTO users
+            SELECT user_id, name, email, company, school, location, tags, title, {keys}
+            FROM staged_users ORDER BY company, school, location, user_id""")
+        con.execute(USER_BIOS_TABLE_SQL)
+        con.execute("INSERT INTO user_bios SELECT user_id, bio FROM staged_users WHERE bio IS NOT NULL ORDER BY user_id")
+        con.execute("DROP TABLE staged_users")
+        for field in LOOKUP_FIELDS:
+            con.execute(f"CREATE INDEX users_{field}_key_idx ON users ({field}_key)")
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+
+def load_profiles(delta=False):
+    """Loads users.csv into the DuckDB 'users' and 'user_bios' tables.
+    In delta mode the load is skipped when the CSV content is unchanged since the last run.
+    Returns False if the load failed."""
+    if not os.path.exists(CSV_FILE):
+        print(f"Error: {CSV_FILE} not found. Please ensure it exists.")
+        return False
+
+    with open(CSV_FILE, 'rb') as f:
+        csv_hash = content_hash(f.read().decode('utf-8'))
+    if delta and load_manifest(MANIFEST_STAGE).get(CSV_FILE) == csv_hash and os.path.exists(DB_FILE):
+        print(f"{CSV_FILE} is unchanged since the last load. Skipping.")
+        return True
+
+    # Ensure parent directory for DB exists
+    db_dir = os.path.dirname(DB_FILE)
+    if not os.path.exists(db_dir):
+        os.makedirs(db_dir)
+
+    # Connect to DuckDB (it will create the file if it doesn't exist)
+    try:
+        con = connect_duckdb_for_write(DB_FILE)
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        return False
+
+    # Ingest data using DuckDB's native CSV reader for robustness
+    try:
+        write_users(con, CSV_FILE)
+
+        print(f"Successfully created 'users' and 'user_bios' tables in DuckDB from {CSV_FILE}")
+
+        # Apply only the added/removed names to the persisted resolution indexes
+        for field, (added, removed) in refresh_name_indexes(con).items():
+            print(f"Name index '{field}': {added} added, {removed} removed.")
+        save_manifest(MANIFEST_STAGE, {CSV_FILE: csv_hash})
+        bump_data_version()
+
+        # Verify by querying all columns of the table to ensure correctness
+        print("\nVerifying data in 'users' table (first 5 rows):")
+        result = con.execute("SELECT * FROM users LIMIT 5").fetchdf()
+        print(result)
+
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        return False
+    finally:
+        # Close the connection
+        con.close()
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load structured user profiles into DuckDB.")
+    parser.add_argument("--delta", action="store_true", help="Skip the load if users.csv is unchanged since the last run.")
+    args = parser.parse_args()
 
-# Ensure parent directory for DB exists
-db_dir = os.path.dirname(DB_FILE)
-if not os.path.exists(db_dir):
-    os.makedirs(db_dir)
-
-# Connect to DuckDB (it will create the file if it doesn't exist)
-con = duckdb.connect(database=DB_FILE, read_only=False)
-
-# Ingest data using DuckDB's native CSV reader for robustness
-try:
-    # Drop the table if it exists to ensure a fresh start
-    con.execute("DROP TABLE IF EXISTS users")
-    
-    # Use DuckDB's native CSV reader to create the table. This is more reliable.
-    con.execute(f"CREATE TABLE users AS SELECT * FROM read_csv_auto('{CSV_FILE}')")
-    
-    print(f"Successfully created 'users' table in DuckDB from {CSV_FILE}")
-
-    # Verify by querying all columns of the table to ensure correctness
-    print("\nVerifying data in 'users' table (first 5 rows):")
-    result = con.execute("SELECT * FROM users LIMIT 5").fetchdf()
-    print(result)
-
-except FileNotFoundError:
-    print(f"Error: {CSV_FILE} not found. Please ensure it exists.")
-except Exception as e:
-    print(f"An error occurred: {e}")
-finally:
-    # Close the connection
-    con.close()
+    load_profiles(delta=args.delta)
@@ -0,0 +1,73 @@
+import os
+import json
+import hashlib
+import threading
+import uuid
+
+# Define paths
+MANIFEST_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'manifests')
+
+# Serializes the tmp-file-and-replace writes below, which share a tmp path per file,
+# when pipeline stages run in parallel threads
+_write_lock = threading.Lock()
+
+def content_hash(value) -> str:
+    """Returns a stable SHA-256 hex digest for a string or a JSON-serializable value."""
+    if not isinstance(value, str):
+        value = json.dumps(value, sort_keys=True, default=str)
+    return hashlib.sha256(value.encode('utf-8')).hexdigest()
+
+def file_signature(path: str) -> dict:
+    """Returns the cheap change signature (size and mtime) of a source file."""
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+def manifest_path(stage: str) -> str:
+    return os.path.join(MANIFEST_DIR, f"{stage}.json")
+
+def load_manifest(stage: str) -> dict:
+    """Loads the {key: hash} manifest recorded by the last successful run of a stage."""
+    path = manifest_path(stage)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_manifest(stage: str, entries: dict):
+    """Atomically replaces the manifest of a stage."""
+    os.makedirs(MANIFEST_DIR, exist_ok=True)
+    path = manifest_path(stage)
+    tmp_path = path + ".tmp"
+    with _write_lock:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entries, f, sort_keys=True)
+        os.replace(tmp_path, path)
+
+def diff_manifest(old: dict, new: dict):
+    """Compares two manifests and returns (changed, removed) key lists.
+    `changed` covers both new keys and keys whose hash differs."""
+    changed = [key for key, digest in new.items() if old.get(key) != digest]
+    removed = [key for key in old if key not in new]
+    return changed, removed
+
+def data_version_path() -> str:
+    return os.path.join(MANIFEST_DIR, "data_version")
+
+def bump_data_version():
+    """Records that the indexed data changed. Query caches key their entries on this
+    stamp, so every rebuild invalidates previously cached results."""
+    os.makedirs(MANIFEST_DIR, exist_ok=True)
+    path = data_version_path()
+    tmp_path = path + ".tmp"
+    with _write_lock:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(uuid.uuid4().hex)
+        os.replace(tmp_path, path)
+
+def read_data_version() -> str:
+    """Returns the current data version stamp, or an empty string if none was written yet."""
+    try:
+        with open(data_version_path(), 'r', encoding='utf-8') as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return ""
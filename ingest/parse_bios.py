@@ -1,18 +1,125 @@
 import os
+import sys
 import json
-import re
-from collections import defaultdict
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import pymupdf
 
+# Add project root to path to allow direct script execution
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from retrievers.bio_store import BioStore, build_bio_index, index_path_for
+from ingest.manifest import content_hash, file_signature, load_manifest, save_manifest, bump_data_version
+
 # Define paths
 DATA_DIR = "data"
 UNSTRUCTURED_DIR = os.path.join(DATA_DIR, "unstructured")
 OUTPUT_FILE = os.path.join(DATA_DIR, "parsed", "parsed_bios.jsonl")
+MANIFEST_STAGE = "parse_bios"
+# Records of an in-progress run and the log of which users they cover, used to resume after a crash
+PARTIAL_FILE = OUTPUT_FILE + ".partial"
+PROGRESS_FILE = OUTPUT_FILE + ".progress"
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+def list_source_files(user_dir_path):
+    """Returns the sorted .txt and .pdf files in a user directory, skipping hidden files."""
+    return sorted(
+        filename for filename in os.listdir(user_dir_path)
+        if not filename.startswith('.') and (filename.endswith('.txt') or filename.endswith('.pdf'))
+    )
+
+def parse_user_dir(user_dir_path):
+    """Extracts and concatenates the text of every source file in a user directory.
+    Returns (bio, sources)."""
+    bio = ""
+    sources = []
+    for filename in list_source_files(user_dir_path):
+        filepath = os.path.join(user_dir_path, filename)
+        content = ""
+        source, _ = os.path.splitext(filename)
+
+        if filename.endswith(".txt"):
+            with open(filepath, 'r', encoding='utf-8') as f:
+                content = f.read()
+        elif filename.endswith(".pdf"):
+            try:
+                with pymupdf.open(filepath) as doc:
+                    content = "".join(page.get_text() for page in doc)
+            except Exception as e:
+                print(f"Error processing PDF {filepath}: {e}")
+                continue
+
+        if content:
+            bio += content + "\n\n"
+            sources.append(source)
+    return bio.strip(), sources
+
+def sources_hash(user_dir_path):
+    """Hashes the names, sizes and mtimes of a user's source files, so unchanged
+    directories can be detected without opening any file."""
+    return content_hash({
+        filename: file_signature(os.path.join(user_dir_path, filename))
+        for filename in list_source_files(user_dir_path)
+    })
 
-def parse_unstructured_data():
-    """Parses all .txt and .pdf files in the unstructured data directory."""
-    user_bios = defaultdict(lambda: {"bio": "", "sources": []})
+def _parse_user(user_id, user_dir_path):
+    """Pool worker: parses one user directory and returns (user_id, bio, sources)."""
+    bio, sources = parse_user_dir(user_dir_path)
+    return user_id, bio, sources
 
+def recover_partial_run(digests):
+    """Recovers the records of an interrupted run.
+
+    Rewrites the partial output keeping only records that are confirmed in the progress
+    log and whose source hash still matches `digests`, and returns {user_id: (digest, written)}
+    for those users. Returns an empty dict when there is nothing to resume.
+    """
+    if not os.path.exists(PROGRESS_FILE):
+        return {}
+
+    completed = {}
+    with open(PROGRESS_FILE, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A torn final line from the crash
+                continue
+            if digests.get(entry["user_id"]) == entry["digest"]:
+                completed[entry["user_id"]] = (entry["digest"], entry["written"])
+
+    kept = set()
+    tmp_file = PARTIAL_FILE + ".tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as out:
+        if os.path.exists(PARTIAL_FILE):
+            with open(PARTIAL_FILE, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    user_id = record["user_id"]
+                    if user_id in completed and user_id not in kept:
+                        out.write(json.dumps(record) + '\n')
+                        kept.add(user_id)
+    os.replace(tmp_file, PARTIAL_FILE)
+
+    # Users whose record was lost before the progress line was flushed are re-parsed
+    completed = {user_id: state for user_id, state in completed.items() if user_id in kept or not state[1]}
+    with open(PROGRESS_FILE, 'w', encoding='utf-8') as f:
+        for user_id, (digest, written) in completed.items():
+            f.write(json.dumps({"user_id": user_id, "digest": digest, "written": written}) + '\n')
+    return completed
+
+def parse_unstructured_data(delta=False, workers=DEFAULT_WORKERS):
+    """Parses all .txt and .pdf files in the unstructured data directory.
+
+    User directories are parsed across a pool of worker processes and each record is
+    streamed to a partial output file as soon as it completes, with a progress log that
+    lets an interrupted run resume where it stopped. In delta mode, users whose source
+    files are unchanged since the last run reuse their previously parsed record.
+    Returns the number of users with a bio.
+    """
     if not os.path.exists(UNSTRUCTURED_DIR):
         print(f"Directory not found: {UNSTRUCTURED_DIR}")
         # Create directory to prevent script failure
@@ -20,7 +127,7 @@ def parse_unstructured_data():
         print(f"Created directory: {UNSTRUCTURED_DIR}")
         return 0
 
-    user_dirs = [d for d in os.listdir(UNSTRUCTURED_DIR) if os.path.isdir(os.path.join(UNSTRUCTURED_DIR, d))]
+    user_dirs = sorted(d for d in os.listdir(UNSTRUCTURED_DIR) if os.path.isdir(os.path.join(UNSTRUCTURED_DIR, d)))
 
     if not user_dirs:
         print("No user directories found in unstructured data folder.")
@@ -28,49 +135,89 @@ def parse_unstructured_data():
 
     print(f"Found {len(user_dirs)} user directories to process.")
 
-    for user_id in user_dirs:
-        user_dir_path = os.path.join(UNSTRUCTURED_DIR, user_id)
-        
-        for filename in os.listdir(user_dir_path):
-            # Skip hidden files and non-text/pdf files
-            if filename.startswith('.') or not (filename.endswith('.txt') or filename.endswith('.pdf')):
-                continue
-
-            filepath = os.path.join(user_dir_path, filename)
-            content = ""
-            source, _ = os.path.splitext(filename)
-
-            if filename.endswith(".txt"):
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    content = f.read()
-            elif filename.endswith(".pdf"):
-                try:
-                    with pymupdf.open(filepath) as doc:
-                        content = "".join(page.get_text() for page in doc)
-                except Exception as e:
-                    print(f"Error processing PDF {filepath}: {e}")
-                    continue
-            
-            if content:
-                user_bios[user_id]['bio'] += content + "\n\n"
-                user_bios[user_id]['sources'].append(source)
-
     # Ensure output directory exists
     output_dir = os.path.dirname(OUTPUT_FILE)
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
-    # Write to a .jsonl file
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        for user_id, data in user_bios.items():
-            record = {"user_id": user_id, "bio": data["bio"].strip(), "sources": data["sources"]}
-            f.write(json.dumps(record) + '\n')
-    
-    return len(user_bios)
+    digests = {user_id: sources_hash(os.path.join(UNSTRUCTURED_DIR, user_id)) for user_id in user_dirs}
+    completed = recover_partial_run(digests)
+    if completed:
+        print(f"Resuming interrupted run: {len(completed)} user(s) already parsed.")
+    else:
+        # Start a fresh partial output and progress log
+        open(PARTIAL_FILE, 'w').close()
+        open(PROGRESS_FILE, 'w').close()
+
+    previous_manifest = load_manifest(MANIFEST_STAGE) if delta else {}
+    previous_store = BioStore(OUTPUT_FILE) if previous_manifest and os.path.exists(OUTPUT_FILE) else None
+
+    # Users without any bio text are recorded too, so delta runs do not parse them again
+    manifest = {user_id: digest for user_id, (digest, _) in completed.items()}
+    written_count = sum(1 for _, written in completed.values() if written)
+    parsed_count = reused_count = 0
+    try:
+        with open(PARTIAL_FILE, 'a', encoding='utf-8') as out, open(PROGRESS_FILE, 'a', encoding='utf-8') as progress:
+            def emit(user_id, record):
+                nonlocal written_count
+                # The record is flushed before its progress line, so a crash never marks a lost record as done
+                if record:
+                    out.write(json.dumps(record) + '\n')
+                    out.flush()
+                    written_count += 1
+                manifest[user_id] = digests[user_id]
+                progress.write(json.dumps({"user_id": user_id, "digest": digests[user_id], "written": bool(record)}) + '\n')
+                progress.flush()
+
+            pending = []
+            for user_id in user_dirs:
+                if user_id in completed:
+                    continue
+                if previous_store and previous_manifest.get(user_id) == digests[user_id]:
+                    # Unchanged: reuse the record, or keep the user empty if the last run found no text
+                    emit(user_id, previous_store.get_record(user_id))
+                    reused_count += 1
+                else:
+                    pending.append(user_id)
+
+            def handle(user_id, bio, sources):
+                emit(user_id, {"user_id": user_id, "bio": bio, "sources": sources} if bio else None)
+
+            if workers > 1 and len(pending) > 1:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    futures = [executor.submit(_parse_user, user_id, os.path.join(UNSTRUCTURED_DIR, user_id))
+                               for user_id in pending]
+                    for future in as_completed(futures):
+                        handle(*future.result())
+            else:
+                for user_id in pending:
+                    handle(*_parse_user(user_id, os.path.join(UNSTRUCTURED_DIR, user_id)))
+            parsed_count = len(pending)
+    finally:
+        if previous_store:
+            previous_store.close()
+
+    os.replace(PARTIAL_FILE, OUTPUT_FILE)
+    save_manifest(MANIFEST_STAGE, manifest)
+    os.remove(PROGRESS_FILE)
+
+    print(f"Parsed {parsed_count} user(s), reused {reused_count} unchanged, resumed {len(completed)}.")
+
+    # Build the user_id -> byte offset index used for O(log N) bio lookups
+    build_bio_index(OUTPUT_FILE)
+    print(f"Built bio offset index at {index_path_for(OUTPUT_FILE)}")
+    bump_data_version()
+
+    return written_count
 
 if __name__ == "__main__":
-    parsed_count = parse_unstructured_data()
-    
+    parser = argparse.ArgumentParser(description="Parse unstructured bios and resumes into a JSONL file.")
+    parser.add_argument("--delta", action="store_true", help="Only re-parse users whose source files changed since the last run.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Worker processes used to parse user directories.")
+    args = parser.parse_args()
+
+    parsed_count = parse_unstructured_data(delta=args.delta, workers=args.workers)
+
     if parsed_count > 0:
         print(f"Successfully parsed {parsed_count} user(s) and saved to {OUTPUT_FILE}")
         print("\nSample output:")
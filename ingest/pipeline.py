@@ -0,0 +1,337 @@
+import os
+import sys
+import time
+import argparse
+import threading
+from collections import namedtuple, defaultdict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# Add project root to path to allow direct script execution
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ingest.manifest import content_hash, file_signature, load_manifest, save_manifest
+from ingest.chunking import DEFAULT_CHUNK_TOKENS
+
+# Fingerprints of the inputs each stage last completed with
+MANIFEST_STAGE = "pipeline"
+# Enough threads for the three independent branches (Neo4j graph, graph snapshot, vector index)
+DEFAULT_MAX_PARALLEL = 3
+
+# name: unique stage name; deps: stages whose outputs it reads; sources: raw input paths;
+# outputs: paths that must exist, or checks taking the PipelineContext that must return True,
+# to skip it; options: PipelineContext attributes that change its result; run: callable
+# taking the PipelineContext
+Stage = namedtuple("Stage", ["name", "deps", "sources", "outputs", "options", "run"])
+
+class PipelineContext:
+    """Run options plus the data shared between stages (parsed bios, the users table,
+    extracted organisations, the Qdrant client). Each item is loaded at most once, on
+    first use, so stages skipped as unchanged never pay for it. Items have their own
+    locks so a slow load (e.g. NER) does not block stages waiting on a different one."""
+
+    def __init__(self, delta=False, chunk_tokens=DEFAULT_CHUNK_TOKENS):
+        self.delta = delta
+        self.chunk_tokens = chunk_tokens
+        # DuckDB allows one read-write handle per database file in a process, so stages
+        # opening profiles.duckdb take turns
+        self.duckdb_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._item_locks = defaultdict(threading.Lock)
+        self._items = {}
+        self._loaders = {
+            "user_bios": self._load_user_bios,
+            "users_df": self._load_users_df,
+            "user_organizations": self._load_user_organizations,
+            "qdrant_client": self._load_qdrant_client,
+        }
+
+    def get(self, name):
+        """Returns the named shared item, loading it on first use."""
+        with self._lock:
+            item_lock = self._item_locks[name]
+        with item_lock:
+            if name not in self._items:
+                self._items[name] = self._loaders[name]()
+            return self._items[name]
+
+    def close(self):
+        if "qdrant_client" in self._items:
+            self._items["qdrant_client"].close()
+
+    def _load_user_bios(self):
+        from retrievers.graph_builder import PARSED_BIOS_PATH, load_parsed_bios
+        return load_parsed_bios(PARSED_BIOS_PATH)
+
+    def _load_users_df(self):
+        import duckdb
+        from retrievers.graph_builder import DUCKDB_PATH, USERS_QUERY
+        with self.duckdb_lock:
+            con = duckdb.connect(database=DUCKDB_PATH, read_only=True)
+            try:
+                return con.execute(USERS_QUERY).fetchdf()
+            finally:
+                con.close()
+
+    def _load_user_organizations(self):
+        from retrievers.graph_builder import extract_bio_organizations
+        return extract_bio_organizations(self.get("user_bios"))
+
+    def _load_qdrant_client(self):
+        from qdrant_client import QdrantClient
+        from recommenders.semantic_indexer import QDRANT_PATH
+        os.makedirs(QDRANT_PATH, exist_ok=True)
+        return QdrantClient(path=QDRANT_PATH)
+
+# --- Stages ---
+
+def _parse_bios(ctx):
+    from ingest.parse_bios import parse_unstructured_data
+    parse_unstructured_data(delta=ctx.delta)
+
+def _load_profiles(ctx):
+    from ingest.load_profiles import load_profiles
+    with ctx.duckdb_lock:
+        if not load_profiles(delta=ctx.delta):
+            raise RuntimeError("Loading users.csv into DuckDB failed.")
+
+def _extract_organizations(ctx):
+    # Shared by both graph builds, so spaCy runs once per changed bio
+    ctx.get("user_organizations")
+
+def _build_graph(ctx):
+    from retrievers.graph_builder import build_knowledge_graph
+    build_knowledge_graph(ctx.get("users_df"), ctx.get("user_bios"), delta=ctx.delta,
+                          user_organizations=ctx.get("user_organizations"))
+
+def _build_graph_snapshot(ctx):
+    from retrievers.graph_memory import build_snapshot
+    build_snapshot(users_df=ctx.get("users_df"), user_organizations=ctx.get("user_organizations"))
+
+def _index_bios(ctx):
+    from recommenders.semantic_indexer import index_bios
+    if index_bios(delta=ctx.delta, chunk_tokens=ctx.chunk_tokens,
+                  parsed_bios=ctx.get("user_bios"), client=ctx.get("qdrant_client")) is None:
+        raise RuntimeError("Indexing bios into Qdrant failed.")
+
+def _build_vector_store(ctx):
+    from retrievers.vector_store import build_vector_store
+    build_vector_store(ctx.get("qdrant_client"))
+
+def _precompute_candidates(ctx):
+    from recommenders.graph_candidates import precompute_candidates
+    with ctx.duckdb_lock:
+        precompute_candidates()
+
+# --- Output checks ---
+# For stages whose results live in a database rather than a file, so a wiped database
+# reruns the stage even though its inputs did not change
+
+def _graph_populated(ctx):
+    from neo4j import GraphDatabase
+    from retrievers.resources import NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD
+    try:
+        with GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD)) as driver, driver.session() as session:
+            return session.run("MATCH (u:User) RETURN count(u) AS users").single()["users"] > 0
+    except Exception as e:
+        print(f"[pipeline] Could not check the Neo4j graph: {type(e).__name__}: {e}")
+        return False
+
+def _candidates_table_exists(ctx):
+    import duckdb
+    from ingest.load_profiles import DB_FILE
+    from retrievers.graph import CANDIDATES_TABLE
+    if not os.path.exists(DB_FILE):
+        return False
+    with ctx.duckdb_lock:
+        con = duckdb.connect(database=DB_FILE, read_only=True)
+        try:
+            return con.execute("SELECT count(*) FROM duckdb_tables() WHERE table_name = ?",
+                               [CANDIDATES_TABLE]).fetchone()[0] > 0
+        finally:
+            con.close()
+
+def _collection_exists(ctx):
+    from retrievers.vector_store import COLLECTION_NAME
+    return ctx.get("qdrant_client").collection_exists(collection_name=COLLECTION_NAME)
+
+def default_stages():
+    """The preprocessing DAG: parse and load feed three independent branches."""
+    from ingest.parse_bios import UNSTRUCTURED_DIR, OUTPUT_FILE
+    from ingest.load_profiles import CSV_FILE, DB_FILE
+    from retrievers.resources import GRAPH_SNAPSHOT_DIR, VECTOR_STORE_DIR
+    return [
+        Stage("parse_bios", [], [UNSTRUCTURED_DIR], [OUTPUT_FILE], [], _parse_bios),
+        Stage("load_profiles", [], [CSV_FILE], [DB_FILE], [], _load_profiles),
+        Stage("ner", ["parse_bios"], [], [], [], _extract_organizations),
+        Stage("graph", ["load_profiles", "ner"], [], [_graph_populated], [], _build_graph),
+        Stage("graph_snapshot", ["load_profiles", "ner"], [], [GRAPH_SNAPSHOT_DIR], [], _build_graph_snapshot),
+        Stage("graph_candidates", ["graph"], [], [_candidates_table_exists], [], _precompute_candidates),
+        Stage("semantic_index", ["parse_bios", "load_profiles"], [], [_collection_exists], ["chunk_tokens"], _index_bios),
+        Stage("vector_store", ["semantic_index"], [], [VECTOR_STORE_DIR], [], _build_vector_store),
+    ]
+
+# --- Scheduling ---
+
+def source_signature(path):
+    """Size and mtime of a file, or of every file under a directory; None if missing."""
+    if not os.path.exists(path):
+        return None
+    if os.path.isfile(path):
+        return file_signature(path)
+    signature = {}
+    for root, _, files in os.walk(path):
+        for name in files:
+            file_path = os.path.join(root, name)
+            signature[os.path.relpath(file_path, path)] = file_signature(file_path)
+    return signature
+
+def topological_order(stages):
+    """Orders stages so every stage follows its dependencies. Raises ValueError on unknown
+    dependencies or cycles."""
+    by_name = {stage.name: stage for stage in stages}
+    ordered, visiting, done = [], set(), set()
+
+    def visit(name):
+        if name in done:
+            return
+        if name in visiting:
+            raise ValueError(f"Pipeline stages form a cycle through '{name}'.")
+        if name not in by_name:
+            raise ValueError(f"Unknown pipeline stage: '{name}'.")
+        visiting.add(name)
+        for dep in by_name[name].deps:
+            visit(dep)
+        visiting.discard(name)
+        done.add(name)
+        ordered.append(by_name[name])
+
+    for stage in stages:
+        visit(stage.name)
+    return ordered
+
+def fingerprints(stages, ctx):
+    """Hashes each stage's sources, options and its dependencies' fingerprints, so a change
+    to a raw input invalidates every stage downstream of it."""
+    result = {}
+    for stage in topological_order(stages):
+        result[stage.name] = content_hash({
+            "sources": {path: source_signature(path) for path in stage.sources},
+            "options": {option: getattr(ctx, option) for option in stage.options},
+            "deps": {dep: result[dep] for dep in stage.deps},
+        })
+    return result
+
+def outputs_exist(stage, ctx):
+    """True if every output of the stage is present: paths must exist and checks return True."""
+    return all(output(ctx) if callable(output) else os.path.exists(output) for output in stage.outputs)
+
+def _run_stage(stage, ctx):
+    """Runs one stage. Returns (seconds, exception or None)."""
+    print(f"[pipeline] {stage.name} started")
+    start = time.perf_counter()
+    try:
+        stage.run(ctx)
+        return time.perf_counter() - start, None
+    except Exception as e:
+        return time.perf_counter() - start, e
+
+def run_pipeline(stages, ctx, max_parallel=DEFAULT_MAX_PARALLEL, force=False, skip=()):
+    """Runs the stages in dependency order, with up to `max_parallel` independent stages
+    at once, in this process.
+
+    A stage is left out as "unchanged" when its fingerprint matches the last successful
+    run and its outputs exist (unless `force`). Stages named in `skip` are "skipped", and
+    so is everything depending on them; stages downstream of a failure are "blocked".
+    Returns {stage name: (status, seconds)}.
+    """
+    current = fingerprints(stages, ctx)
+    recorded = load_manifest(MANIFEST_STAGE)
+    pending = {stage.name: stage for stage in topological_order(stages)}
+    results = {}
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max_parallel) as executor:
+        while pending or running:
+            # Settle every stage whose dependencies are done: start it, or resolve it
+            # without running, which may in turn make its dependents ready
+            progressed = True
+            while progressed:
+                progressed = False
+                for name, stage in list(pending.items()):
+                    if not all(dep in results for dep in stage.deps):
+                        continue
+                    del pending[name]
+                    progressed = True
+                    dep_statuses = {results[dep][0] for dep in stage.deps}
+                    if name in skip or "skipped" in dep_statuses:
+                        results[name] = ("skipped", 0.0)
+                    elif dep_statuses & {"failed", "blocked"}:
+                        results[name] = ("blocked", 0.0)
+                    elif not force and recorded.get(name) == current[name] and outputs_exist(stage, ctx):
+                        results[name] = ("unchanged", 0.0)
+                    else:
+                        running[executor.submit(_run_stage, stage, ctx)] = stage
+
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                seconds, error = future.result()
+                if error is None:
+                    recorded[stage.name] = current[stage.name]
+                    results[stage.name] = ("ran", seconds)
+                    print(f"[pipeline] {stage.name} finished in {seconds:.2f}s")
+                else:
+                    # Forget the last success so the next run retries this stage
+                    recorded.pop(stage.name, None)
+                    results[stage.name] = ("failed", seconds)
+                    print(f"[pipeline] {stage.name} failed after {seconds:.2f}s: {type(error).__name__}: {error}")
+                save_manifest(MANIFEST_STAGE, recorded)
+    return results
+
+def longest_branch(stages, results):
+    """Returns (seconds, [stage names]) of the slowest dependency chain that ran, the lower
+    bound on wall time with unlimited parallelism."""
+    finish = {}
+    for stage in topological_order(stages):
+        before = max(((finish[dep][0], finish[dep][1]) for dep in stage.deps), default=(0.0, []))
+        finish[stage.name] = (before[0] + results[stage.name][1], before[1] + [stage.name])
+    return max(finish.values(), default=(0.0, []))
+
+def main():
+    """Runs the whole preprocessing pipeline in one process."""
+    stage_names = [stage.name for stage in default_stages()]
+    parser = argparse.ArgumentParser(description="Run the data preprocessing pipeline as a DAG of stages.")
+    parser.add_argument("--delta", action="store_true", help="Let stages reprocess only the users that changed since the last run.")
+    parser.add_argument("--force", action="store_true", help="Run every stage, even those whose inputs are unchanged.")
+    parser.add_argument("--skip", nargs="+", default=[], choices=stage_names, metavar="STAGE",
+                        help=f"Stages to leave out, with everything downstream of them ({', '.join(stage_names)}).")
+    parser.add_argument("--max-parallel", type=int, default=DEFAULT_MAX_PARALLEL, help="Stages run at the same time.")
+    parser.add_argument("--chunk-tokens", type=int, default=DEFAULT_CHUNK_TOKENS, help="Maximum tokens per embedded bio chunk.")
+    args = parser.parse_args()
+
+    print(f"--- Starting Data Preprocessing Pipeline {'(delta mode) ' if args.delta else ''}---")
+    stages = default_stages()
+    ctx = PipelineContext(delta=args.delta, chunk_tokens=args.chunk_tokens)
+    start = time.perf_counter()
+    try:
+        results = run_pipeline(stages, ctx, max_parallel=args.max_parallel, force=args.force, skip=set(args.skip))
+    finally:
+        ctx.close()
+    elapsed = time.perf_counter() - start
+
+    print(f"\n{'stage':<18} {'status':<10} {'seconds':>8}")
+    for stage in topological_order(stages):
+        status, seconds = results[stage.name]
+        print(f"{stage.name:<18} {status:<10} {seconds:>8.2f}")
+    branch_seconds, branch = longest_branch(stages, results)
+    print(f"\nWall time {elapsed:.2f}s for {sum(s for _, s in results.values()):.2f}s of stage work; "
+          f"longest branch {branch_seconds:.2f}s ({' -> '.join(branch)}).")
+
+    if any(status in ("failed", "blocked") for status, _ in results.values()):
+        sys.exit(1)
+    print("--- Data Preprocessing Pipeline Complete ---")
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,21 @@
 
 # This script runs all data preprocessing steps in the correct order.
 # It ensures that the database and search indexes are fully built from the raw data.
+#
+# Usage: ./preprocess_data.sh [--delta] [--force] [--skip STAGE ...]
+#   --delta  Only re-parse, re-load, re-embed or rebuild the users whose content
+#            hash changed since the last run (see data/manifests/).
+#   --force  Also run stages whose inputs are unchanged since their last successful run.
+#   --skip   Leave out stages (and everything downstream), e.g. "--skip graph" without Neo4j.
+#
+# The stages run in one Python process (ingest/pipeline.py) as a dependency graph:
+#
+#   parse_bios ──> ner ──┬──> graph ──> graph_candidates
+#                        └──> graph_snapshot
+#   load_profiles ───────┴──> (graph, graph_snapshot, semantic_index)
+#   parse_bios, load_profiles ──> semantic_index ──> vector_store
+#
+# Independent stages run concurrently and a per-stage timing summary is printed at the end.
 
 # Exit immediately if a command exits with a non-zero status.
 set -e
@@ -11,27 +26,4 @@ set -e
 PYTHON_EXEC="$(pwd)/venv/bin/python"
 
 # --- Main Script ---
-echo "--- Starting Data Preprocessing Pipeline ---"
-
-# Step 1: Parse unstructured bios from JSONL into a structured format.
-echo "
-Step 1/4: Parsing unstructured bios..."
-$PYTHON_EXEC ingest/parse_bios.py
-
-# Step 2: Load structured user profiles from CSV into the DuckDB database.
-echo "
-Step 2/4: Loading structured profiles into DuckDB..."
-$PYTHON_EXEC ingest/load_profiles.py
-
-# Step 3: Build the Neo4j knowledge graph from the data in DuckDB.
-echo "
-Step 3/4: Building the Neo4j knowledge graph..."
-$PYTHON_EXEC retrievers/graph_builder.py
-
-# Step 4: Index all user bios for semantic search using Qdrant.
-echo "
-Step 4/4: Indexing bios for semantic search..."
-$PYTHON_EXEC recommenders/semantic_indexer.py
-
-echo "
---- Data Preprocessing Pipeline Complete ---"
+$PYTHON_EXEC ingest/pipeline.py "$@"
@@ -0,0 +1,121 @@
+import os
+import sys
+import math
+import time
+import heapq
+import argparse
+from collections import defaultdict
+import pandas as pd
+from neo4j import GraphDatabase
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Add project root to path to allow direct script execution
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from retrievers.graph import CANDIDATES_TABLE, DEFAULT_MAX_HUB_DEGREE, format_reasons
+from ingest.manifest import bump_data_version
+from retrievers.resources import connect_duckdb_for_write
+
+# --- Configuration ---
+DATA_DIR = "data"
+DUCKDB_PATH = os.path.join(DATA_DIR, "db", "profiles.duckdb")
+NEO4J_URI = os.getenv("NEO4J_URI")
+NEO4J_USER = os.getenv("NEO4J_USER")
+NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
+DEFAULT_TOP_K = 20
+
+EDGES_QUERY = """
+MATCH (u:User)-[:ATTENDED|WORKED_AT]->(n)
+RETURN u.user_id AS user_id, labels(n)[0] AS type, n.name AS name
+"""
+
+def load_edges(driver):
+    """Reads every User -> School/Company edge from Neo4j in a single query.
+    Returns (user_entities, entity_members) adjacency dicts keyed by user_id and (type, name)."""
+    user_entities = defaultdict(set)
+    entity_members = defaultdict(set)
+    with driver.session() as session:
+        for record in session.run(EDGES_QUERY):
+            entity = (record["type"], record["name"])
+            user_entities[record["user_id"]].add(entity)
+            entity_members[entity].add(record["user_id"])
+    return user_entities, entity_members
+
+def compute_candidates(user_entities, entity_members, top_k=DEFAULT_TOP_K, max_hub_degree=DEFAULT_MAX_HUB_DEGREE):
+    """Scores every user's 2nd-degree candidates and keeps the top_k per user.
+
+    Each shared School/Company contributes 1 / log(size) to the score (Adamic-Adar),
+    so a small shared school outweighs a shared employer with thousands of people.
+    Nodes larger than max_hub_degree are skipped, matching the live ranked query.
+    Yields (user_id, rank, recommended_user_id, score, reasons) rows.
+    """
+    weights = {
+        entity: 1.0 / math.log(len(members))
+        for entity, members in entity_members.items()
+        if len(members) > 1 and (max_hub_degree is None or len(members) <= max_hub_degree)
+    }
+    for user_id, entities in user_entities.items():
+        scores = defaultdict(float)
+        shared = defaultdict(list)
+        for entity in entities:
+            weight = weights.get(entity)
+            if weight is None:
+                continue
+            for other in entity_members[entity]:
+                if other != user_id:
+                    scores[other] += weight
+                    shared[other].append(entity)
+        # Highest score first, ties by ascending user_id, as in the live query
+        top = heapq.nsmallest(top_k, scores.items(), key=lambda item: (-item[1], item[0]))
+        for rank, (other, score) in enumerate(top, start=1):
+            reasons = [{"type": entity_type, "name": name} for entity_type, name in sorted(shared[other])]
+            yield user_id, rank, other, score, format_reasons(reasons)
+
+def write_candidates(rows, db_path=DUCKDB_PATH):
+    """Replaces the candidates table in DuckDB and indexes it by user_id."""
+    df = pd.DataFrame(list(rows), columns=["user_id", "rank", "recommended_user_id", "score", "reason"])
+    con = connect_duckdb_for_write(db_path)
+    try:
+        con.execute(f"""
+        CREATE OR REPLACE TABLE {CANDIDATES_TABLE} (
+            user_id VARCHAR NOT NULL,
+            rank INTEGER NOT NULL,
+            recommended_user_id VARCHAR NOT NULL,
+            score DOUBLE NOT NULL,
+            reason VARCHAR,
+            PRIMARY KEY (user_id, rank)
+        )""")
+        con.execute(f"INSERT INTO {CANDIDATES_TABLE} SELECT * FROM df ORDER BY user_id, rank")
+        con.execute(f"CREATE INDEX {CANDIDATES_TABLE}_user_idx ON {CANDIDATES_TABLE} (user_id)")
+    finally:
+        con.close()
+    return len(df)
+
+def precompute_candidates(top_k=DEFAULT_TOP_K, max_hub_degree=DEFAULT_MAX_HUB_DEGREE, db_path=DUCKDB_PATH):
+    """Reads the graph edges from Neo4j and replaces the candidates table. Returns the rows written."""
+    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+    try:
+        user_entities, entity_members = load_edges(driver)
+    finally:
+        driver.close()
+    print(f"Loaded {sum(len(e) for e in user_entities.values())} edges for {len(user_entities)} users "
+          f"and {len(entity_members)} schools/companies.")
+
+    count = write_candidates(compute_candidates(user_entities, entity_members, top_k, max_hub_degree), db_path)
+    bump_data_version()
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute ranked 2nd-degree graph recommendations into DuckDB.")
+    parser.add_argument("--top-k", type=int, default=DEFAULT_TOP_K, help="Candidates kept per user.")
+    parser.add_argument("--max-hub-degree", type=int, default=DEFAULT_MAX_HUB_DEGREE, help="Skip shared nodes with more members than this.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    count = precompute_candidates(args.top_k, args.max_hub_degree)
+    print(f"Wrote {count} candidates to '{CANDIDATES_TABLE}' in {time.perf_counter() - start:.2f}s.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+import os
+import sys
+import time
+import asyncio
+import argparse
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+# Add project root to path to allow direct script execution
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from retrievers.sql import SQL_FIELDS, get_sql_recommendations_page, get_user_details, aget_sql_recommendations_page, aget_user_details
+from retrievers.vector import get_semantic_recommendations, aget_semantic_recommendations
+from retrievers.graph import get_graph_connections, aget_graph_connections
+from retrievers.resources import get_vector_index
+
+# --- Configuration ---
+RRF_K = 60
+DEFAULT_TIMEOUTS = {"sql": 1.0, "vector": 2.0, "graph": 2.0}
+DEFAULT_WEIGHTS = {"sql": 1.0, "vector": 1.0, "graph": 1.0}
+# SQL matches fused per field; users deeper in a huge match list barely move the RRF score
+SQL_CANDIDATES_PER_FIELD = 50
+
+# Threads per retriever. A retriever that times out keeps its thread until it returns, so
+# each retriever has its own pool: a hung backend can only exhaust its own workers, and
+# the other retrievers keep answering. Neo4j queries are also bounded by NEO4J_TIMEOUT.
+RETRIEVER_WORKERS = int(os.getenv("HYBRID_RETRIEVER_WORKERS", 8))
+
+def _rank_by_shared_fields(pages):
+    """Merges per-field match lists so users sharing more of company, school and location
+    come first, with their reasons joined; ties keep user_id order.
+
+    Each page holds the first SQL_CANDIDATES_PER_FIELD matches of one field by user_id,
+    not the best ones: within a field every match is equally good, so a large employer
+    contributes an arbitrary but deterministic slice of its staff. Only users seen on
+    several pages can be ranked above that slice.
+    """
+    reasons = defaultdict(list)
+    for page in pages:
+        for rec in page:
+            reasons[rec["user_id"]].append(rec["reason"])
+    ranked = sorted(reasons, key=lambda user_id: (-len(reasons[user_id]), user_id))
+    return [{"user_id": user_id, "reason": ", ".join(reasons[user_id])} for user_id in ranked]
+
+def _sql_candidates(user_id):
+    """Users sharing the target's company, school or location, most shared fields first."""
+    details = get_user_details([user_id])
+    if not details:
+        return []
+    return _rank_by_shared_fields(get_sql_recommendations_page(field, details[0][field], SQL_CANDIDATES_PER_FIELD)["results"]
+                                  for field in SQL_FIELDS if details[0].get(field))
+
+def _vector_candidates(user_id):
+    return get_semantic_recommendations(user_id, get_vector_index())
+
+RETRIEVERS = {"sql": _sql_candidates, "vector": _vector_candidates, "graph": get_graph_connections}
+
+_executors = {name: ThreadPoolExecutor(max_workers=RETRIEVER_WORKERS, thread_name_prefix=f"hybrid-{name}")
+              for name in RETRIEVERS}
+
+async def _asql_candidates(user_id):
+    details = await aget_user_details([user_id])
+    if not details:
+        return []
+    pages = await asyncio.gather(*(aget_sql_recommendations_page(field, details[0][field], SQL_CANDIDATES_PER_FIELD)
+                                   for field in SQL_FIELDS if details[0].get(field)))
+    return _rank_by_shared_fields(page["results"] for page in pages)
+
+ASYNC_RETRIEVERS = {"sql": _asql_candidates, "vector": aget_semantic_recommendations, "graph": aget_graph_connections}
+
+def reciprocal_rank_fusion(ranked_lists, weights=None, k=RRF_K, exclude=()):
+    """Fuses several ranked lists of {"user_id", "reason"} dicts into one ranking.
+
+    Each list contributes weight / (k + rank) to a user's score (reciprocal rank
+    fusion), so users found by several retrievers rise to the top without needing
+    comparable raw scores. Returns a list of {"user_id", "score", "reasons"} sorted by
+    score, where reasons is a list of {"source", "rank", "reason"}.
+    """
+    weights = weights or {}
+    scores = defaultdict(float)
+    reasons = defaultdict(list)
+    for source, results in ranked_lists.items():
+        weight = weights.get(source, 1.0)
+        rank = 0
+        seen = set()
+        for item in results:
+            # Tools report errors as plain strings inside their result lists
+            if not isinstance(item, dict) or item.get("user_id") in exclude or item.get("user_id") in seen:
+                continue
+            seen.add(item["user_id"])
+            rank += 1
+            scores[item["user_id"]] += weight / (k + rank)
+            reasons[item["user_id"]].append({"source": source, "rank": rank, "reason": item.get("reason")})
+    ranked = sorted(scores, key=lambda user_id: (-scores[user_id], user_id))
+    return [{"user_id": user_id, "score": scores[user_id], "reasons": reasons[user_id]} for user_id in ranked]
+
+def hybrid_recommend(user_id, k=10, timeouts=None, weights=None):
+    """Queries the SQL, vector and graph retrievers concurrently for a user and fuses the results.
+
+    Each retriever gets its own timeout measured from the start of the request, so the
+    wall-clock latency is bounded by the slowest retriever that answers in time, and a
+    retriever that is slow or failing is reported in `sources` instead of blocking.
+    Returns {"results": [...], "sources": {name: {"status", "latency_ms", "count"}}}.
+    """
+    timeouts = {**DEFAULT_TIMEOUTS, **(timeouts or {})}
+    weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+    start = time.perf_counter()
+    futures = {name: _executors[name].submit(fn, user_id) for name, fn in RETRIEVERS.items()}
+
+    ranked_lists = {}
+    sources = {}
+    for name, future in futures.items():
+        remaining = max(0.0, timeouts[name] - (time.perf_counter() - start))
+        try:
+            ranked_lists[name] = future.result(timeout=remaining)
+            sources[name] = {"status": "ok", "count": len(ranked_lists[name])}
+        except FutureTimeoutError:
+            sources[name] = {"status": "timeout", "count": 0}
+        except Exception as e:
+            sources[name] = {"status": f"error: {e}", "count": 0}
+        sources[name]["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+    results = reciprocal_rank_fusion(ranked_lists, weights, exclude={user_id})[:k]
+    return {"results": results, "sources": sources}
+
+async def ahybrid_recommend(user_id, k=10, timeouts=None, weights=None):
+    """Async hybrid_recommend with the same timeouts, fusion and return shape.
+    A retriever that misses its deadline is cancelled rather than left running."""
+    timeouts = {**DEFAULT_TIMEOUTS, **(timeouts or {})}
+    weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+    start = time.perf_counter()
+    ranked_lists = {}
+    sources = {}
+
+    async def run(name, fn):
+        try:
+            ranked_lists[name] = await asyncio.wait_for(fn(user_id), timeouts[name])
+            sources[name] = {"status": "ok", "count": len(ranked_lists[name])}
+        except asyncio.TimeoutError:
+            sources[name] = {"status": "timeout", "count": 0}
+        except Exception as e:
+            sources[name] = {"status": f"error: {e}", "count": 0}
+        sources[name]["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+    await asyncio.gather(*(run(name, fn) for name, fn in ASYNC_RETRIEVERS.items()))
+    sources = {name: sources[name] for name in ASYNC_RETRIEVERS}
+    results = reciprocal_rank_fusion({name: ranked_lists[name] for name in ASYNC_RETRIEVERS if name in ranked_lists},
+                                     weights, exclude={user_id})[:k]
+    return {"results": results, "sources": sources}
+
+def main():
+    """Main function to test the hybrid recommender."""
+    parser = argparse.ArgumentParser(description="Get fused SQL + vector + graph recommendations for a user.")
+    parser.add_argument("user_id", type=str, help="The user ID to get recommendations for (e.g., 'u001').")
+    parser.add_argument("--k", type=int, default=10, help="Number of fused recommendations to return.")
+    args = parser.parse_args()
+
+    response = hybrid_recommend(args.user_id, k=args.k)
+    print(f"\n--- Hybrid Recommendations for {args.user_id} ---")
+    for name, status in response["sources"].items():
+        print(f"[{name}] {status}")
+    for rec in response["results"]:
+        reasons = "; ".join(f"{r['source']}#{r['rank']}: {r['reason']}" for r in rec["reasons"])
+        print(f"- {rec['user_id']} ({rec['score']:.4f}): {reasons}")
+
+if __name__ == "__main__":
+    main()
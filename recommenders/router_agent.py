@@ -1,43 +1,36 @@
 import os
+import re
 import sys
+import asyncio
+import logging
 import argparse
+from collections import namedtuple
 from dotenv import load_dotenv
 
-# --- LangChain Imports ---
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.agents import tool, AgentExecutor, create_tool_calling_agent
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-
-# --- Database and Retriever Imports ---
-import duckdb
-from neo4j import GraphDatabase
-from qdrant_client import QdrantClient
-from sentence_transformers import SentenceTransformer
-
 # Add project root to path to allow direct script execution
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(PROJECT_ROOT)
 
-from retrievers.sql import get_sql_recommendations
-from retrievers.vector import get_semantic_recommendations
-from retrievers.graph import get_graph_recommendations
+from retrievers.sql import (
+    get_sql_recommendations_page, aget_sql_recommendations_page, normalize_field_value, suggest_field_values,
+)
+from retrievers.vector import get_semantic_recommendations, aget_semantic_recommendations
+from retrievers.graph import get_graph_connections, aget_graph_connections
+from recommenders.hybrid import hybrid_recommend, ahybrid_recommend
+from retrievers.resources import close_async_resources, get_vector_index
 
 # --- Configuration ---
 load_dotenv()
-if not os.getenv("GOOGLE_API_KEY"):
-    raise ValueError("GOOGLE_API_KEY not found in .env file. Please add it to proceed.")
 
-NEO4J_URI = os.getenv("NEO4J_URI")
-NEO4J_USER = os.getenv("NEO4J_USER")
-NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
+logger = logging.getLogger(__name__)
 
-DATA_DIR = os.path.join(PROJECT_ROOT, 'data')
-DUCKDB_PATH = os.path.join(DATA_DIR, 'db', 'profiles.duckdb')
-QDRANT_STORAGE_PATH = os.path.join(DATA_DIR, 'qdrant_storage')
+# Fast-path matches below this confidence are handed to the LLM agent
+FAST_PATH_THRESHOLD = 0.8
 
 # --- Tool Definitions ---
+# Plain functions, wrapped as LangChain tools only when the agent is built, so fast-path
+# prompts and CLI runs never import LangChain or the Gemini client
 
-@tool
 def sql_retriever(query: str) -> list:
     """Searches for users based on structured data like company, school, or location.
     Use this for queries like 'Find users who work at Google' or 'Who went to MIT?'.
@@ -45,43 +38,126 @@ def sql_retriever(query: str) -> list:
     try:
         field, value = query.split(':', 1)
         field = field.strip()
-        value = value.strip()
-        con = duckdb.connect(database=DUCKDB_PATH, read_only=True)
-        results = get_sql_recommendations(field, value, con)
-        con.close()
-        return results
+        # Match the stored spelling, so 'company:google' finds 'Google'
+        value = normalize_field_value(field, value.strip())
+        return _bounded_page(get_sql_recommendations_page(field, value), field, value)
     except Exception as e:
         return [f"Error processing SQL query: {e}. Ensure the query is in 'field:value' format."]
 
-@tool
-def vector_retriever(user_id: str) -> list:
+def _bounded_page(page, field, value):
+    """Returns only the first page of matches, noting how many were left out, so a broad
+    query like 'location:San Francisco' cannot flood the agent context. When nothing
+    matches, names the stored values the query may have meant instead of guessing one."""
+    if not page["results"]:
+        suggestions = suggest_field_values(field, value)
+        if suggestions:
+            return [f"No users found with {field} '{value}'. Did you mean: {', '.join(suggestions)}?"]
+        return []
+    if page["next_cursor"] is None:
+        return page["results"]
+    return page["results"] + [f"Showing the first {len(page['results'])} of {page['total']} matching users."]
+
+def _parse_vector_query(query: str):
+    """Splits 'u001, location:Seattle, -company:Google' into the user_id, the filters
+    results must match and the ones they must not."""
+    user_id, *terms = [term.strip() for term in query.split(',')]
+    filters, exclude_filters = {}, {}
+    for term in terms:
+        target = exclude_filters if term.startswith('-') else filters
+        field, value = term.lstrip('-').split(':', 1)
+        target.setdefault(field.strip(), []).append(value.strip())
+    # None rather than {} so unfiltered calls share cache entries with other callers
+    return user_id, filters or None, exclude_filters or None
+
+def vector_retriever(query: str) -> list:
     """Finds users with semantically similar bios or profiles.
-    Use this for queries like 'Find users similar to u001' or 'Who has a profile like u001?'."""
+    Use this for queries like 'Find users similar to u001' or 'Who has a profile like u001?'.
+    The query is a user_id, optionally followed by comma-separated filters on company, school,
+    location or title: 'field:value' keeps only matching users and '-field:value' removes them,
+    e.g. 'u001, location:Seattle' or 'u001, -company:Google'."""
     try:
-        client = QdrantClient(path=QDRANT_STORAGE_PATH)
-        model = SentenceTransformer('all-MiniLM-L6-v2', device='cpu')
-        results = get_semantic_recommendations(user_id, client, model)
-        return results
+        user_id, filters, exclude_filters = _parse_vector_query(query)
+        # The model is only loaded if the user has no stored vector to search with
+        return get_semantic_recommendations(user_id, get_vector_index(),
+                                            filters=filters, exclude_filters=exclude_filters)
     except Exception as e:
         return [f"Error during vector search: {e}"]
 
-@tool
 def graph_retriever(user_id: str) -> list:
     """Finds users connected through a shared school or company in the knowledge graph (2nd-degree connections).
     Use this for queries about network connections, like 'Who is in u001's network?' or 'Find connections for u001'."""
     try:
-        driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
-        results = get_graph_recommendations(user_id, driver)
-        driver.close()
-        return results
+        # Offline-ranked candidates when they cover the user, else a live query
+        return get_graph_connections(user_id)
     except Exception as e:
         return [f"Error connecting to graph database: {e}"]
 
+def hybrid_retriever(user_id: str) -> list:
+    """Recommends people for a user by combining structured matches, similar bios and network connections.
+    Use this for open-ended requests like 'Recommend people for u001' or 'Who should u001 meet?'."""
+    try:
+        return _format_hybrid(hybrid_recommend(user_id))
+    except Exception as e:
+        return [f"Error during hybrid search: {e}"]
+
+def _format_hybrid(response):
+    return [{
+        "user_id": rec["user_id"],
+        "reason": " & ".join(r["reason"] for r in rec["reasons"] if r["reason"]),
+        "score": rec["score"],
+    } for rec in response["results"]]
+
+# --- Async Tool Variants ---
+# Same inputs, outputs and error strings as the tools above, used by RecommendationRouter.ainvoke
+
+async def _asql_retriever(query: str) -> list:
+    try:
+        field, value = query.split(':', 1)
+        field = field.strip()
+        value = normalize_field_value(field, value.strip())
+        return _bounded_page(await aget_sql_recommendations_page(field, value), field, value)
+    except Exception as e:
+        return [f"Error processing SQL query: {e}. Ensure the query is in 'field:value' format."]
+
+async def _avector_retriever(query: str) -> list:
+    try:
+        user_id, filters, exclude_filters = _parse_vector_query(query)
+        return await aget_semantic_recommendations(user_id, filters=filters, exclude_filters=exclude_filters)
+    except Exception as e:
+        return [f"Error during vector search: {e}"]
+
+async def _agraph_retriever(user_id: str) -> list:
+    try:
+        return await aget_graph_connections(user_id)
+    except Exception as e:
+        return [f"Error connecting to graph database: {e}"]
+
+async def _ahybrid_retriever(user_id: str) -> list:
+    try:
+        return _format_hybrid(await ahybrid_recommend(user_id))
+    except Exception as e:
+        return [f"Error during hybrid search: {e}"]
+
+TOOLS = {fn.__name__: fn for fn in [sql_retriever, vector_retriever, graph_retriever, hybrid_retriever]}
+
+ASYNC_TOOLS = {
+    "sql_retriever": _asql_retriever,
+    "vector_retriever": _avector_retriever,
+    "graph_retriever": _agraph_retriever,
+    "hybrid_retriever": _ahybrid_retriever,
+}
+
 # --- Agent Setup ---
 
-def create_agent_executor():
-    """Creates and returns the LangChain agent executor."""
-    tools = [sql_retriever, vector_retriever, graph_retriever]
+def create_agent_executor(llm=None):
+    """Creates and returns the LangChain agent executor.
+    Uses Gemini unless another chat model (e.g. a stub for offline tests) is passed in.
+    LangChain and the Gemini client are imported here rather than at module load."""
+    from langchain.agents import AgentExecutor, create_tool_calling_agent
+    from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+    from langchain_core.tools import tool
+
+    tools = [tool(fn) for fn in TOOLS.values()]
     
     prompt_template = """
     You are an AI assistant that helps find users in a professional network.
@@ -95,27 +171,170 @@ def create_agent_executor():
         MessagesPlaceholder(variable_name="agent_scratchpad"),
     ])
 
-    llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0, convert_system_message_to_human=True)
+    if llm is None:
+        if not os.getenv("GOOGLE_API_KEY"):
+            raise ValueError("GOOGLE_API_KEY not found in .env file. Please add it to proceed.")
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0, convert_system_message_to_human=True)
     agent = create_tool_calling_agent(llm, tools, prompt)
     agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=True, return_intermediate_steps=True)
     
     return agent_executor
 
+# --- Fast-Path Routing ---
+
+# Mirrors the (action, observation) pairs of AgentExecutor's intermediate_steps
+FastPathAction = namedtuple("FastPathAction", ["tool", "tool_input"])
+
+_USER_ID = r"(?P<value>u\d+)"
+# Words that end an entity value: prepositions, conjunctions and the keywords of other
+# intents. A prompt with a second constraint ("at Google in Seattle", "at Google and went
+# to MIT") then only matches part-way, scores below the threshold and goes to the agent.
+_STOP_WORDS = (r"at|in|for|from|of|on|to|near|with|without|by|and|or|but|not|except|who|that|which|where|"
+               r"is|are|was|like|similar|works?|working|employed|went|attended|studied|graduated|lives?|living|located|based")
+_WORD = r"(?!(?:" + _STOP_WORDS + r")\b)[\w.&'-]+(?![\w.&'-])"
+_VALUE = r"(?P<value>" + _WORD + r"(?:\s+" + _WORD + r")*)"
+_PREFIX = r"(?:(?:find|show|list|get)(?: me)?\s+)?(?:(?:all\s+)?(?:the\s+)?(?:users|people|profiles)\s+)?"
+
+# (tool, tool input template, pattern). Patterns are matched against the whole prompt.
+FAST_PATH_RULES = [
+    ("sql_retriever", "{field}:{value}", re.compile(r"(?P<field>company|school|location)\s*:\s*" + _VALUE)),
+    ("sql_retriever", "company:{value}", re.compile(_PREFIX + r"(?:who\s+)?(?:works?|working|employed|is employed)\s+(?:at|for)\s+" + _VALUE)),
+    ("sql_retriever", "school:{value}", re.compile(_PREFIX + r"(?:who\s+)?(?:went to|attended|studied at|graduated from|go to)\s+" + _VALUE)),
+    ("sql_retriever", "location:{value}", re.compile(_PREFIX + r"(?:who\s+)?(?:lives?|living|located|based|are)\s+in\s+" + _VALUE)),
+    ("vector_retriever", "{value}", re.compile(_PREFIX + r"(?:(?:who is|who are|that are|with (?:a )?(?:bio|profile)s?)\s+)?(?:similar to|like)\s+" + _USER_ID)),
+    ("graph_retriever", "{value}", re.compile(_PREFIX + r"(?:(?:connections|network|contacts)\s+(?:for|of)\s+" + _USER_ID
+                                              + r"|(?:who is in\s+)?" + _USER_ID.replace("value", "owner") + r"'s\s+(?:network|connections))")),
+    ("hybrid_retriever", "{value}", re.compile(r"(?:(?:recommend|suggest)\s+(?:people|users|connections)\s+for|(?:get\s+)?(?:recommendations|suggestions)\s+for|who should)\s+"
+                                               + _USER_ID + r"(?:\s+meet)?")),
+]
+
+def classify_prompt(prompt: str):
+    """Matches a prompt against the fast-path rules.
+
+    Returns (tool_name, tool_input, confidence). A rule matching the whole prompt scores
+    1.0; one that only matches part of a longer prompt scores 0.5, and a tie between
+    different tool calls halves the confidence, so ambiguous prompts fall back to the agent.
+    Returns (None, None, 0.0) when nothing matches.
+    """
+    text = prompt.strip().rstrip("?.!").strip()
+    normalized = text.lower()
+    candidates = []
+    for tool_name, template, pattern in FAST_PATH_RULES:
+        match = pattern.fullmatch(normalized)
+        confidence = 1.0
+        if not match:
+            match = pattern.search(normalized)
+            confidence = 0.5
+        if not match:
+            continue
+        groups = match.groupdict()
+        value_group = "value" if groups.get("value") else "owner"
+        # Slice the value out of the original text to preserve its capitalisation
+        value = text[match.start(value_group):match.end(value_group)].strip()
+        candidates.append((confidence, tool_name, template.format(field=groups.get("field"), value=value)))
+
+    if not candidates:
+        return None, None, 0.0
+    candidates.sort(key=lambda c: c[0], reverse=True)
+    confidence, tool_name, tool_input = candidates[0]
+    if any(c[0] == confidence and c[1:] != (tool_name, tool_input) for c in candidates[1:]):
+        confidence /= 2
+    return tool_name, tool_input, confidence
+
+class RecommendationRouter:
+    """Serves prompts through a deterministic fast path when they match a known intent
+    and through the LLM agent otherwise.
+
+    invoke() returns the same shape as AgentExecutor.invoke ("output" and
+    "intermediate_steps") plus a "route" key naming the path that served the request.
+    The agent is only created the first time a prompt needs it.
+    """
+
+    def __init__(self, agent_factory=create_agent_executor, threshold=FAST_PATH_THRESHOLD):
+        self.agent_factory = agent_factory
+        self.threshold = threshold
+        self._agent_executor = None
+        self.tools = TOOLS
+
+    @property
+    def agent_executor(self):
+        if self._agent_executor is None:
+            self._agent_executor = self.agent_factory()
+        return self._agent_executor
+
+    def _route(self, prompt):
+        """Returns (tool_name, tool_input) for the fast path, or (None, None) for the agent."""
+        tool_name, tool_input, confidence = classify_prompt(prompt)
+        if tool_name and confidence >= self.threshold:
+            logger.info("route=fast tool=%s input=%r confidence=%.2f prompt=%r", tool_name, tool_input, confidence, prompt)
+            return tool_name, tool_input
+        logger.info("route=agent confidence=%.2f prompt=%r", confidence, prompt)
+        return None, None
+
+    @staticmethod
+    def _fast_path_result(prompt, tool_name, tool_input, results):
+        found = [r for r in results if isinstance(r, dict)]
+        output = f"Found {len(found)} users." if found else "\n".join(str(r) for r in results) or "No users found."
+        return {
+            "input": prompt,
+            "output": output,
+            "intermediate_steps": [(FastPathAction(tool_name, tool_input), results)],
+            "route": f"fast:{tool_name}",
+        }
+
+    def invoke(self, inputs):
+        prompt = inputs["input"]
+        tool_name, tool_input = self._route(prompt)
+        if tool_name:
+            return self._fast_path_result(prompt, tool_name, tool_input, self.tools[tool_name](tool_input))
+
+        result = self.agent_executor.invoke(inputs)
+        result["route"] = "agent"
+        return result
+
+    async def ainvoke(self, inputs):
+        """Async invoke(). Fast-path prompts use the async retrievers, so many requests can
+        be in flight on one event loop; agent prompts go through AgentExecutor.ainvoke."""
+        prompt = inputs["input"]
+        tool_name, tool_input = self._route(prompt)
+        if tool_name:
+            return self._fast_path_result(prompt, tool_name, tool_input, await ASYNC_TOOLS[tool_name](tool_input))
+
+        result = await self.agent_executor.ainvoke(inputs)
+        result["route"] = "agent"
+        return result
+
+def create_router(threshold=FAST_PATH_THRESHOLD):
+    """Creates a RecommendationRouter backed by the default agent executor."""
+    return RecommendationRouter(create_agent_executor, threshold)
+
 def main():
     """Main function to run the agent from the command line."""
     parser = argparse.ArgumentParser(description="Use a LangChain agent to get recommendations.")
     parser.add_argument("prompt", type=str, help="The natural language prompt for the agent.")
+    parser.add_argument("--no-fast-path", action="store_true", help="Always send the prompt to the LLM agent.")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="Serve the prompt through the async API.")
     args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(name)s: %(message)s")
 
-    agent_executor = create_agent_executor()
+    agent_executor = create_agent_executor() if args.no_fast_path else create_router()
     
     print(f"\n🤖 Sending prompt to agent: '{args.prompt}'")
     print("-" * 30)
 
-    result = agent_executor.invoke({"input": args.prompt})
+    if args.use_async:
+        async def serve():
+            try:
+                return await agent_executor.ainvoke({"input": args.prompt})
+            finally:
+                await close_async_resources()
+        result = asyncio.run(serve())
+    else:
+        result = agent_executor.invoke({"input": args.prompt})
 
     print("-" * 30)
-    print(f"✅ Agent Response:")
+    print(f"✅ Agent Response ({result.get('route', 'agent')}):")
     print(result["output"])
 
 if __name__ == "__main__":
@@ -1,9 +1,22 @@
 import json
 import os
+import sys
+import time
+import uuid
+import argparse
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from itertools import islice
 import pandas as pd
 from qdrant_client import QdrantClient, models
 from sentence_transformers import SentenceTransformer
 
+# Add project root to path to allow direct script execution
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ingest.manifest import content_hash, load_manifest, save_manifest, diff_manifest, bump_data_version
+from ingest.chunking import chunk_for_model, DEFAULT_CHUNK_TOKENS
+from retrievers.vector_store import PAYLOAD_FIELDS, payload_key
+
 # Define paths
 DATA_DIR = "data"
 BIOS_FILE = os.path.join(DATA_DIR, "parsed", "parsed_bios.jsonl")
@@ -12,16 +25,95 @@ USERS_CSV_FILE = os.path.join(DATA_DIR, "structured", "users.csv")
 # Qdrant configuration
 QDRANT_PATH = os.path.join(DATA_DIR, "qdrant_storage")
 COLLECTION_NAME = "profiles"
+MODEL_NAME = 'all-MiniLM-L6-v2'
+MANIFEST_STAGE = "semantic_index"
+
+# Namespace for deriving stable Qdrant point ids from user_ids
+POINT_ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "network-recommendation-engine/profiles")
+
+# Encoding and upsert defaults (overridable from the CLI)
+DEFAULT_BATCH_SIZE = 64
+DEFAULT_UPSERT_CHUNK = 256
+DEFAULT_WORKERS = 0
+
+# Per-process model used by pool workers, loaded once by _init_worker
+_worker_model = None
+
+def _init_worker():
+    global _worker_model
+    _worker_model = SentenceTransformer(MODEL_NAME, device='cpu')
+
+def _encode_in_worker(bios, batch_size):
+    return _worker_model.encode(bios, batch_size=batch_size)
+
+def point_id_for(user_id, chunk=0):
+    """Returns the stable Qdrant point id of one of a user's bio chunks, so re-upserting a
+    user overwrites its points. The first chunk keeps the id of the old one-vector-per-user layout."""
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, user_id if chunk == 0 else f"{user_id}#{chunk}"))
+
+def delete_users(client, user_ids, page_size=1000):
+    """Deletes every point (all chunks) of the given users."""
+    user_ids = list(user_ids)
+    for start in range(0, len(user_ids), page_size):
+        client.delete(
+            collection_name=COLLECTION_NAME,
+            points_selector=models.FilterSelector(filter=models.Filter(must=[
+                models.FieldCondition(key="user_id", match=models.MatchAny(any=user_ids[start:start + page_size]))
+            ])),
+            wait=True,
+        )
+
+def batched(iterable, size):
+    """Yields successive lists of at most `size` items from an iterable."""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+def encode_batches(batches, batch_size, workers, model=None):
+    """Encodes batches of (point_id, user_id, chunk_index, text) tuples, yielding (batch, vectors) pairs.
+
+    With workers == 0 the given model encodes in-process. Otherwise batches fan out
+    across a pool of worker processes, each holding its own model, with at most two
+    batches in flight per worker so memory stays bounded. Results may arrive out of order.
+    """
+    if workers <= 0:
+        for batch in batches:
+            yield batch, model.encode([text for _, _, _, text in batch], batch_size=batch_size)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        pending = {}
+        batches = iter(batches)
+        max_in_flight = workers * 2
+        while True:
+            for batch in islice(batches, max_in_flight - len(pending)):
+                future = executor.submit(_encode_in_worker, [text for _, _, _, text in batch], batch_size)
+                pending[future] = batch
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future.result()
+
+def index_bios(batch_size=DEFAULT_BATCH_SIZE, workers=DEFAULT_WORKERS, upsert_chunk=DEFAULT_UPSERT_CHUNK, delta=False,
+               chunk_tokens=DEFAULT_CHUNK_TOKENS, parsed_bios=None, client=None):
+    """Reads bios from both structured CSV and parsed JSONL files, splits them into
+    chunks that fit the model's input (one point per chunk, tagged with its user_id and
+    chunk_index), generates embeddings in batches, and streams them into Qdrant in bounded chunks.
+    In delta mode the collection is kept and only users whose bio hash changed since
+    the last run are re-embedded; users that disappeared are deleted.
 
-def index_bios():
-    """Reads bios from both structured CSV and parsed JSONL files,
-    generates embeddings, and indexes them in Qdrant."""
+    `parsed_bios` ({user_id: bio}) and `client` may be passed in already loaded; a
+    client created here is closed on return. Returns the number of chunks indexed,
+    or None if indexing failed."""
     
     # --- 1. Collect all bios from different sources ---
     user_bios = {}
 
     # Source 1: Parsed bios from JSONL
-    if os.path.exists(BIOS_FILE):
+    if parsed_bios is not None:
+        user_bios.update((user_id, bio) for user_id, bio in parsed_bios.items() if user_id and bio)
+    elif os.path.exists(BIOS_FILE):
         with open(BIOS_FILE, 'r', encoding='utf-8') as f:
             for line in f:
                 record = json.loads(line)
@@ -31,9 +123,14 @@ def index_bios():
     else:
         print(f"Warning: Parsed bios file not found at {BIOS_FILE}. Skipping.")
 
-    # Source 2: Structured bios from users.csv
+    # Source 2: Structured bios from users.csv, which also provides the filterable payload fields
+    user_payloads = {}
     if os.path.exists(USERS_CSV_FILE):
         csv_users_df = pd.read_csv(USERS_CSV_FILE)
+        for record in csv_users_df[["user_id"] + PAYLOAD_FIELDS].to_dict(orient='records'):
+            user_payloads[record["user_id"]] = {
+                field: payload_key(record[field]) for field in PAYLOAD_FIELDS if pd.notna(record[field])
+            }
         # Filter out rows where bio is missing
         csv_users_df = csv_users_df[csv_users_df['bio'].notna()]
         
@@ -51,53 +148,130 @@ def index_bios():
 
     # --- 2. Setup model and Qdrant client ---
     print("Loading sentence transformer model...")
-    model = SentenceTransformer('all-MiniLM-L6-v2', device='cpu')
+    model = SentenceTransformer(MODEL_NAME, device='cpu')
     print("Model loaded.")
 
-    os.makedirs(QDRANT_PATH, exist_ok=True)
-    client = QdrantClient(path=QDRANT_PATH)
-    print("Qdrant client initialized.")
+    owns_client = client is None
+    if owns_client:
+        os.makedirs(QDRANT_PATH, exist_ok=True)
+        client = QdrantClient(path=QDRANT_PATH)
+        print("Qdrant client initialized.")
+    try:
+        return _index_into_collection(client, model, user_bios, user_payloads, batch_size, workers, upsert_chunk,
+                                      delta, chunk_tokens)
+    finally:
+        if owns_client:
+            client.close()
 
-    # --- 3. Recreate Qdrant collection ---
+def _index_into_collection(client, model, user_bios, user_payloads, batch_size, workers, upsert_chunk, delta, chunk_tokens):
+    """Steps 3-4 of index_bios against an open client. Returns the chunks indexed, or None on failure."""
+    # --- 3. Recreate Qdrant collection (or keep it in delta mode) ---
     vector_size = model.get_sentence_embedding_dimension()
-    if client.collection_exists(collection_name=COLLECTION_NAME):
+    collection_exists = client.collection_exists(collection_name=COLLECTION_NAME)
+    if collection_exists and not delta:
+        # Forget what was indexed before dropping it, so a later --delta run after a failed
+        # rebuild re-embeds everyone instead of trusting hashes of points that are gone
+        save_manifest(MANIFEST_STAGE, {})
         client.delete_collection(collection_name=COLLECTION_NAME)
+        collection_exists = False
         print(f"Collection '{COLLECTION_NAME}' deleted.")
 
-    try:
-        client.create_collection(
+    if not collection_exists:
+        try:
+            client.create_collection(
+                collection_name=COLLECTION_NAME,
+                vectors_config=models.VectorParams(size=vector_size, distance=models.Distance.COSINE),
+            )
+            print(f"Collection '{COLLECTION_NAME}' created successfully.")
+        except Exception as e:
+            print(f"Failed to create collection: {e}")
+            return
+
+    # Index user_id so query-by-id lookups avoid a full scan, and the profile fields so
+    # filtered searches are evaluated inside the HNSW traversal. Also run for existing
+    # collections so delta builds pick up newly added fields.
+    for field_name in ["user_id"] + PAYLOAD_FIELDS:
+        client.create_payload_index(
             collection_name=COLLECTION_NAME,
-            vectors_config=models.VectorParams(size=vector_size, distance=models.Distance.COSINE),
+            field_name=field_name,
+            field_schema=models.PayloadSchemaType.KEYWORD,
         )
-        print(f"Collection '{COLLECTION_NAME}' created successfully.")
-    except Exception as e:
-        print(f"Failed to create collection: {e}")
-        return
+    # Queries read a user's first chunks by position; point ids (uuid5) carry no order
+    client.create_payload_index(
+        collection_name=COLLECTION_NAME,
+        field_name="chunk_index",
+        field_schema=models.PayloadSchemaType.INTEGER,
+    )
 
-    # --- 4. Generate embeddings and prepare points ---
-    points = []
-    print(f"Generating embeddings for {len(user_bios)} unique user bios...")
-    
-    # Using a list comprehension for creating points
-    points = [
-        models.PointStruct(
-            id=i + 1,
-            vector=model.encode(bio).tolist(),
-            payload={"user_id": user_id}
-        )
-        for i, (user_id, bio) in enumerate(user_bios.items())
-    ]
+    # --- 3b. Work out which users need (re-)embedding ---
+    # The model name is part of the hash so switching models re-embeds everything; the
+    # payload is too, so a user who changes company is re-upserted with the new value
+    manifest = {user_id: content_hash(f"{MODEL_NAME}\n{chunk_tokens}\n{bio}\n{sorted(user_payloads.get(user_id, {}).items())}")
+                for user_id, bio in user_bios.items()}
+    previous_manifest = load_manifest(MANIFEST_STAGE) if delta and collection_exists else {}
+    changed, removed = diff_manifest(previous_manifest, manifest)
+
+    if removed:
+        delete_users(client, removed)
+        print(f"Deleted {len(removed)} users no longer present in the sources.")
+    if previous_manifest:
+        # A changed bio may split into fewer chunks, so drop the old ones before upserting
+        delete_users(client, [user_id for user_id in changed if user_id in previous_manifest])
+    if delta:
+        print(f"{len(changed)} of {len(user_bios)} bios changed since the last run.")
 
-    # --- 5. Upsert points to the collection ---
+    # --- 4. Encode in batches and upsert in bounded chunks ---
+    print(f"Generating embeddings for {len(changed)} unique user bios "
+          f"(chunks of {chunk_tokens or 'unlimited'} tokens, batch size {batch_size}, "
+          f"{workers or 'no'} worker processes, upsert chunk {upsert_chunk})...")
+    items = ((point_id_for(user_id, i), user_id, i, chunk)
+             for user_id in changed
+             for i, chunk in enumerate(chunk_for_model(user_bios[user_id], model, chunk_tokens)))
+
+    # Pool workers load their own models, so the parent's copy is only needed in-process
+    encoder_model = model if workers <= 0 else None
+    buffer = []
+    indexed = 0
+    start = time.perf_counter()
     try:
-        client.upsert(
-            collection_name=COLLECTION_NAME,
-            points=points,
-            wait=True
-        )
-        print(f"Successfully indexed {len(points)} bios into Qdrant.")
+        for batch, vectors in encode_batches(batched(items, batch_size), batch_size, workers, encoder_model):
+            buffer.extend(
+                models.PointStruct(id=point_id, vector=vector.tolist(),
+                                   payload={"user_id": user_id, "chunk_index": chunk_index,
+                                            **user_payloads.get(user_id, {})})
+                for (point_id, user_id, chunk_index, _), vector in zip(batch, vectors)
+            )
+            while len(buffer) >= upsert_chunk:
+                client.upsert(collection_name=COLLECTION_NAME, points=buffer[:upsert_chunk], wait=True)
+                indexed += upsert_chunk
+                buffer = buffer[upsert_chunk:]
+        if buffer:
+            client.upsert(collection_name=COLLECTION_NAME, points=buffer, wait=True)
+            indexed += len(buffer)
     except Exception as e:
         print(f"Failed to upsert points: {e}")
+        return
+
+    save_manifest(MANIFEST_STAGE, manifest)
+    bump_data_version()
+
+    elapsed = time.perf_counter() - start
+    print(f"Successfully indexed {indexed} chunks of {len(changed)} bios into Qdrant in {elapsed:.2f}s "
+          f"({len(changed) / elapsed if elapsed else 0:.1f} bios/sec, {indexed / elapsed if elapsed else 0:.1f} chunks/sec).")
+    return indexed
+
+def main():
+    parser = argparse.ArgumentParser(description="Embed user bios and index them in Qdrant.")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Number of bios encoded per model call.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Encoder worker processes (0 encodes in the main process).")
+    parser.add_argument("--upsert-chunk", type=int, default=DEFAULT_UPSERT_CHUNK, help="Maximum number of points per Qdrant upsert.")
+    parser.add_argument("--delta", action="store_true", help="Only re-embed users whose bio changed since the last run.")
+    parser.add_argument("--chunk-tokens", type=int, default=DEFAULT_CHUNK_TOKENS,
+                        help="Maximum tokens per bio chunk (0 embeds each bio as one truncated vector).")
+    args = parser.parse_args()
+
+    index_bios(batch_size=args.batch_size, workers=args.workers, upsert_chunk=args.upsert_chunk, delta=args.delta,
+               chunk_tokens=args.chunk_tokens)
 
 if __name__ == "__main__":
-    index_bios()
+    main()
@@ -0,0 +1,108 @@
+import os
+import json
+import mmap
+import tempfile
+import argparse
+import numpy as np
+
+# --- Configuration ---
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+BIOS_FILE_PATH = os.path.join(DATA_DIR, 'parsed', 'parsed_bios.jsonl')
+
+def index_path_for(jsonl_path: str) -> str:
+    """Returns the path of the offset index that sits next to a bios JSONL file."""
+    return os.path.splitext(jsonl_path)[0] + ".idx.npy"
+
+def build_bio_index(jsonl_path: str = BIOS_FILE_PATH, index_path: str = None) -> int:
+    """Scans a bios JSONL file once and writes a sorted user_id -> (offset, length) index.
+
+    The index is a NumPy structured array saved with np.save, so readers can
+    memory-map it and binary-search it without loading it into memory.
+    Returns the number of indexed records.
+    """
+    index_path = index_path or index_path_for(jsonl_path)
+    keys, offsets, lengths = [], [], []
+    offset = 0
+    with open(jsonl_path, 'rb') as f:
+        for line in f:
+            stripped = line.strip()
+            if stripped:
+                keys.append(json.loads(stripped)['user_id'].encode('utf-8'))
+                offsets.append(offset)
+                lengths.append(len(line))
+            offset += len(line)
+
+    key_width = max((len(k) for k in keys), default=1)
+    index = np.empty(len(keys), dtype=[('user_id', f'S{key_width}'), ('offset', '<u8'), ('length', '<u4')])
+    index['user_id'] = keys
+    index['offset'] = offsets
+    index['length'] = lengths
+    index.sort(order='user_id')
+
+    # Write to a temporary file first so readers never see a half-written index. The name
+    # is unique, so an app process and the ingest run rebuilding at once never share it.
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(index_path)),
+                                    prefix=os.path.basename(index_path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, index)
+        os.replace(tmp_path, index_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return len(index)
+
+class BioStore:
+    """Constant-memory bio lookups backed by a memory-mapped offset index.
+
+    Both the index and the JSONL file are memory-mapped, so a lookup is a binary
+    search over the sorted keys plus a single record parse, regardless of corpus size.
+    The index is rebuilt on open if it is missing or older than the JSONL file.
+    """
+
+    def __init__(self, jsonl_path: str = BIOS_FILE_PATH, index_path: str = None):
+        self.jsonl_path = jsonl_path
+        self.index_path = index_path or index_path_for(jsonl_path)
+        if (not os.path.exists(self.index_path)
+                or os.path.getmtime(self.index_path) < os.path.getmtime(jsonl_path)):
+            build_bio_index(jsonl_path, self.index_path)
+
+        self._index = np.load(self.index_path, mmap_mode='r')
+        self._keys = self._index['user_id']
+        self._file = open(jsonl_path, 'rb')
+        # mmap cannot map an empty file
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if len(self._index) else None
+
+    def __len__(self):
+        return len(self._index)
+
+    def get_record(self, user_id: str):
+        """Returns the full parsed record for a user_id, or None if not found."""
+        key = user_id.encode('utf-8')
+        i = int(np.searchsorted(self._keys, key))
+        if i >= len(self._keys) or self._keys[i] != key:
+            return None
+        offset, length = int(self._index['offset'][i]), int(self._index['length'][i])
+        return json.loads(self._data[offset:offset + length])
+
+    def get_bio(self, user_id: str):
+        """Returns the bio for a user_id, or None if not found."""
+        record = self.get_record(user_id)
+        return record['bio'] if record else None
+
+    def close(self):
+        if self._data is not None:
+            self._data.close()
+        self._file.close()
+
+def main():
+    """Builds the offset index for the parsed bios file."""
+    parser = argparse.ArgumentParser(description="Build the offset index for a parsed bios JSONL file.")
+    parser.add_argument("--bios-file", type=str, default=BIOS_FILE_PATH, help="Path to the parsed bios JSONL file.")
+    args = parser.parse_args()
+
+    count = build_bio_index(args.bios_file)
+    print(f"Indexed {count} bios into {index_path_for(args.bios_file)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+import os
+import sys
+import copy
+import time
+import pickle
+import hashlib
+import inspect
+import threading
+import functools
+from collections import OrderedDict
+
+# Add project root to path to allow direct script execution
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ingest.manifest import data_version_path, read_data_version
+
+# --- Configuration ---
+CACHE_TTL_SECONDS = float(os.getenv("QUERY_CACHE_TTL", 3600))
+CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", 1024))
+CACHE_MAX_BYTES = int(os.getenv("QUERY_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+# Set to a directory to keep a second, on-disk tier that survives restarts
+CACHE_DIR = os.getenv("QUERY_CACHE_DIR")
+
+class QueryCache:
+    """A thread-safe LRU + TTL cache for retriever results, bounded by entry count and bytes.
+
+    Every key is prefixed with the data version stamp written by the preprocessing
+    pipeline; when the stamp changes the memory tier is cleared and the disk tier is
+    emptied, so results from a previous build are never served.
+    """
+
+    def __init__(self, ttl=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES, cache_dir=CACHE_DIR):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+        self._version = None
+        self._version_mtime = None
+        self.hits = self.misses = self.evictions = self.disk_hits = 0
+        self._version_listeners = []
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _current_version(self):
+        # Only re-read the stamp when its file changes; a stat is much cheaper than a read
+        try:
+            mtime = os.stat(data_version_path()).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self._version_mtime or self._version is None:
+            version = read_data_version()
+            if self._version is not None and version != self._version:
+                self._clear_locked()
+                for callback in self._version_listeners:
+                    callback(version)
+            self._version, self._version_mtime = version, mtime
+        return self._version
+
+    def on_version_change(self, callback):
+        """Registers callback(new_version), run when a changed data version clears the cache,
+        so handles on the rebuilt files can be dropped before the cache refills from them."""
+        self._version_listeners.append(callback)
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, hashlib.sha256(key.encode('utf-8')).hexdigest() + ".pkl")
+
+    def _clear_locked(self):
+        self._entries.clear()
+        self._bytes = 0
+        if self.cache_dir:
+            for filename in os.listdir(self.cache_dir):
+                if filename.endswith(".pkl"):
+                    os.remove(os.path.join(self.cache_dir, filename))
+
+    def clear(self):
+        with self._lock:
+            self._clear_locked()
+
+    def _store_locked(self, key, expires_at, size, value):
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key)[1]
+        self._entries[key] = (expires_at, size, value)
+        self._bytes += size
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+
+    def get(self, key):
+        """Returns (True, value) on a hit or (False, None) on a miss."""
+        now = time.time()
+        with self._lock:
+            key = f"{self._current_version()}:{key}"
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, copy.deepcopy(entry[2])
+                self._bytes -= self._entries.pop(key)[1]
+
+            if self.cache_dir:
+                path = self._disk_path(key)
+                try:
+                    with open(path, 'rb') as f:
+                        expires_at, value = pickle.load(f)
+                except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+                    expires_at = None
+                if expires_at is not None:
+                    if expires_at > now:
+                        self._store_locked(key, expires_at, os.path.getsize(path), value)
+                        self.hits += 1
+                        self.disk_hits += 1
+                        return True, copy.deepcopy(value)
+                    os.remove(path)
+
+            self.misses += 1
+            return False, None
+
+    def set(self, key, value):
+        expires_at = time.time() + self.ttl
+        payload = pickle.dumps((expires_at, value))
+        with self._lock:
+            key = f"{self._current_version()}:{key}"
+            if len(payload) > self.max_bytes:
+                return
+            self._store_locked(key, expires_at, len(payload), copy.deepcopy(value))
+            if self.cache_dir:
+                tmp_path = self._disk_path(key) + ".tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(payload)
+                os.replace(tmp_path, self._disk_path(key))
+
+    def stats(self):
+        """Returns hit/miss/eviction counters and current memory usage."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+# The process-wide cache shared by all retrievers
+query_cache = QueryCache()
+
+def cached(key_args, cache=None, namespace=None):
+    """Decorator caching a retriever's result on the named arguments only.
+
+    Results are keyed on `key_args` alone. Connection, index, backend and model arguments
+    are left out, so the same question hits the cache regardless of which handle answered
+    it, and a call passing a different handle may get a result another handle produced.
+    Callers that must query a specific handle (benchmarks, CLI mains) call the wrapper's
+    `.uncached` function instead. Exceptions are never cached.
+    Coroutine functions are supported; pass the sync function's name as `namespace` to
+    let an async variant share its entries.
+    """
+    def decorator(fn):
+        signature = inspect.signature(fn)
+        name = namespace or fn.__qualname__
+
+        def make_key(args, kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            return repr((fn.__module__, name, tuple(bound.arguments[arg] for arg in key_args)))
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                target = cache or query_cache
+                key = make_key(args, kwargs)
+                hit, value = target.get(key)
+                if hit:
+                    return value
+                value = await fn(*args, **kwargs)
+                target.set(key, value)
+                return value
+
+            wrapper.uncached = fn
+            return wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            target = cache or query_cache
+            key = make_key(args, kwargs)
+            hit, value = target.get(key)
+            if hit:
+                return value
+            value = fn(*args, **kwargs)
+            target.set(key, value)
+            return value
+
+        wrapper.uncached = fn
+        return wrapper
+    return decorator
@@ -1,55 +1,234 @@
 import os
-from neo4j import GraphDatabase
+import sys
+import logging
+from abc import ABC, abstractmethod
 from dotenv import load_dotenv
 
 load_dotenv()
 import argparse
 
-# --- Configuration ---
+# Add project root to path to allow direct script execution
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from retrievers.cache import cached
+
+logger = logging.getLogger(__name__)
+
 # --- Configuration ---
 # Neo4j configuration
 NEO4J_URI = os.getenv("NEO4J_URI")
 NEO4J_USER = os.getenv("NEO4J_USER")
 NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
 
-def get_graph_recommendations(user_id: str, neo4j_driver):
+# DuckDB table written by recommenders/graph_candidates.py
+CANDIDATES_TABLE = "graph_recommendations"
+
+def format_reasons(reasons):
+    """Formats a list of {type, name} shared nodes into a reason string."""
+    return ", ".join([f"Shared {r['type']}: {r['name']}" for r in reasons])
+
+# Schools/companies with more members than this are skipped during expansion
+DEFAULT_MAX_HUB_DEGREE = 1000
+
+UNRANKED_QUERY = """
+MATCH (target:User {user_id: $user_id})-[:ATTENDED|WORKED_AT]->(shared_node)<-[:ATTENDED|WORKED_AT]-(recommended:User)
+WHERE target <> recommended
+WITH recommended, COLLECT(DISTINCT {type: labels(shared_node)[0], name: shared_node.name}) AS reasons
+RETURN recommended.user_id AS user_id, reasons
+LIMIT $k
+"""
+
+# Adamic-Adar: each shared node contributes 1 / log(its degree), so rare shared
+# schools/companies rank above huge employers. Hubs above $max_degree are pruned
+# before the second hop, which is where their expansion cost would come from.
+RANKED_QUERY = """
+MATCH (target:User {user_id: $user_id})-[:ATTENDED|WORKED_AT]->(shared_node)
+WITH target, shared_node, COUNT { (shared_node)<-[:ATTENDED|WORKED_AT]-() } AS degree
+WHERE degree > 1 AND ($max_degree IS NULL OR degree <= $max_degree)
+MATCH (shared_node)<-[:ATTENDED|WORKED_AT]-(recommended:User)
+WHERE target <> recommended
+WITH recommended,
+     SUM(1.0 / log(degree)) AS score,
+     COLLECT(DISTINCT {type: labels(shared_node)[0], name: shared_node.name}) AS reasons
+RETURN recommended.user_id AS user_id, reasons, score
+ORDER BY score DESC, user_id
+LIMIT $k
+"""
+
+class GraphBackend(ABC):
+    """Interface for engines that can answer 2nd-degree connection queries.
+
+    second_degree() returns up to k dicts of {"user_id", "reasons", "score"}, where
+    reasons is a list of {type, name} shared nodes. Ranked mode orders candidates by
+    Adamic-Adar score and prunes hubs above max_hub_degree; unranked mode returns
+    matches in arbitrary order with a score of None.
     """
-    Finds 2nd-degree connections for a given user_id in the Neo4j graph.
+
+    @abstractmethod
+    def second_degree(self, user_id: str, k: int = 10, ranked: bool = True,
+                      max_hub_degree: int = DEFAULT_MAX_HUB_DEGREE):
+        """Returns up to k {"user_id", "reasons", "score"} dicts for user_id's 2nd-degree connections."""
+
+class Neo4jGraphBackend(GraphBackend):
+    """Runs 2nd-degree queries as Cypher against a Neo4j server."""
+
+    def __init__(self, driver):
+        self.driver = driver
+
+    def second_degree(self, user_id, k=10, ranked=True, max_hub_degree=DEFAULT_MAX_HUB_DEGREE):
+        query, params = _second_degree_query(user_id, k, ranked, max_hub_degree)
+        with self.driver.session() as session:
+            return [{
+                "user_id": record["user_id"],
+                "reasons": record["reasons"],
+                "score": record["score"] if ranked else None,
+            } for record in session.run(query, params)]
+
+def _second_degree_query(user_id, k, ranked, max_hub_degree):
+    # The server aborts the transaction after the timeout, so a stuck traversal cannot hold
+    # the caller's thread (e.g. a hybrid retriever worker) indefinitely
+    from neo4j import Query
+    from retrievers.resources import NEO4J_TIMEOUT_SECONDS
+    if ranked:
+        query, params = RANKED_QUERY, {"user_id": user_id, "k": k, "max_degree": max_hub_degree}
+    else:
+        query, params = UNRANKED_QUERY, {"user_id": user_id, "k": k}
+    return Query(query, timeout=NEO4J_TIMEOUT_SECONDS), params
+
+def _to_recommendations(matches, ranked):
+    recommendations = []
+    for match in matches:
+        recommendation = {
+            "user_id": match["user_id"],
+            "reason": format_reasons(match["reasons"])
+        }
+        if ranked:
+            recommendation["score"] = match["score"]
+        recommendations.append(recommendation)
+    return recommendations
+
+@cached(key_args=["user_id", "k", "ranked", "max_hub_degree"])
+def get_graph_recommendations(user_id: str, graph, k: int = 10, ranked: bool = True,
+                              max_hub_degree: int = DEFAULT_MAX_HUB_DEGREE):
+    """
+    Finds 2nd-degree connections for a given user_id in the graph.
     These are users connected through a shared school or company.
+    `graph` is a GraphBackend, or a Neo4j driver which is wrapped in a Neo4jGraphBackend.
+    In ranked mode (the default) candidates are scored by the number and rarity of shared
+    nodes and hubs larger than max_hub_degree are pruned (None disables pruning).
     Returns a list of dictionaries with user_id and the reason for the recommendation.
     """
-    query = """
-    MATCH (target:User {user_id: $user_id})-[:ATTENDED|WORKED_AT]->(shared_node)<-[:ATTENDED|WORKED_AT]-(recommended:User)
-    WHERE target <> recommended
-    WITH recommended, COLLECT(DISTINCT {type: labels(shared_node)[0], name: shared_node.name}) AS reasons
-    RETURN recommended.user_id AS user_id, reasons
-    LIMIT 10
+    backend = graph if isinstance(graph, GraphBackend) else Neo4jGraphBackend(graph)
+    return _to_recommendations(backend.second_degree(user_id, k=k, ranked=ranked, max_hub_degree=max_hub_degree), ranked)
+
+@cached(key_args=["user_id", "k", "ranked", "max_hub_degree"], namespace="get_graph_recommendations")
+async def aget_graph_recommendations(user_id: str, k: int = 10, ranked: bool = True,
+                                     max_hub_degree: int = DEFAULT_MAX_HUB_DEGREE):
+    """Async get_graph_recommendations against the backend chosen by GRAPH_BACKEND.
+    Neo4j is queried through the async driver; the in-process graph answers in
+    microseconds and is called directly."""
+    from retrievers.resources import GRAPH_BACKEND, get_graph_backend, get_async_neo4j_driver
+    if GRAPH_BACKEND == "memory":
+        return get_graph_recommendations.uncached(user_id, get_graph_backend(), k, ranked, max_hub_degree)
+
+    query, params = _second_degree_query(user_id, k, ranked, max_hub_degree)
+    async with get_async_neo4j_driver().session() as session:
+        result = await session.run(query, params)
+        matches = [{
+            "user_id": record["user_id"],
+            "reasons": record["reasons"],
+            "score": record["score"] if ranked else None,
+        } async for record in result]
+    return _to_recommendations(matches, ranked)
+
+def get_precomputed_graph_recommendations(user_id: str, duckdb_con, k: int = 10):
+    """
+    Reads a user's precomputed, ranked 2nd-degree connections from DuckDB in one indexed lookup.
+    Returns None if the candidates table has not been built yet or holds no rows for the
+    user (e.g. users added since the precompute), so callers fall back to a live query.
     """
-    with neo4j_driver.session() as session:
-        result = session.run(query, user_id=user_id)
-        recommendations = []
-        for record in result:
-            reasons_list = record["reasons"]
-            # Format the reason string from the collected reasons
-            reason_str = ", ".join([f"Shared {r['type']}: {r['name']}" for r in reasons_list])
-            recommendations.append({
-                "user_id": record["user_id"],
-                "reason": reason_str
-            })
-        return recommendations
+    import duckdb
+    try:
+        rows = duckdb_con.execute(
+            f"SELECT recommended_user_id, reason, score FROM {CANDIDATES_TABLE} "
+            "WHERE user_id = ? ORDER BY rank LIMIT ?",
+            [user_id, k],
+        ).fetchall()
+    except duckdb.CatalogException:
+        return None
+    return [{"user_id": row[0], "reason": row[1], "score": row[2]} for row in rows] or None
+
+async def aget_precomputed_graph_recommendations(user_id: str, k: int = 10):
+    """Async get_precomputed_graph_recommendations, run on the bounded db executor."""
+    from retrievers.resources import get_thread_duckdb_cursor, run_blocking
+    return await run_blocking(lambda: get_precomputed_graph_recommendations(user_id, get_thread_duckdb_cursor(), k))
+
+def get_graph_connections(user_id: str, k: int = 10):
+    """Serves a user's 2nd-degree connections for the agent tools and the hybrid retriever.
+
+    With the Neo4j backend the precomputed DuckDB candidates are used when they hold the
+    user; otherwise, and always with GRAPH_BACKEND=memory (whose snapshot answers in
+    microseconds), the active backend is queried live. A DuckDB error only skips the
+    precomputed lookup; a failing live backend is reset before the error propagates, so
+    a transient outage does not poison later calls.
+    """
+    import duckdb
+    from retrievers.resources import GRAPH_BACKEND, get_graph_backend, get_thread_duckdb_cursor, reset_graph_backend
+    if GRAPH_BACKEND != "memory":
+        try:
+            results = get_precomputed_graph_recommendations(user_id, get_thread_duckdb_cursor(), k)
+        except duckdb.Error as e:
+            logger.warning("Precomputed graph candidates unavailable, querying live: %s", e)
+            results = None
+        if results is not None:
+            return results
+    try:
+        return get_graph_recommendations(user_id, get_graph_backend(), k)
+    except Exception:
+        reset_graph_backend()
+        raise
+
+async def aget_graph_connections(user_id: str, k: int = 10):
+    """Async get_graph_connections."""
+    import duckdb
+    from retrievers.resources import GRAPH_BACKEND, reset_graph_backend
+    if GRAPH_BACKEND != "memory":
+        try:
+            results = await aget_precomputed_graph_recommendations(user_id, k)
+        except duckdb.Error as e:
+            logger.warning("Precomputed graph candidates unavailable, querying live: %s", e)
+            results = None
+        if results is not None:
+            return results
+    try:
+        return await aget_graph_recommendations(user_id, k)
+    except Exception:
+        reset_graph_backend(use_async=True)
+        raise
 
 def main():
     """Main function to test the graph retriever."""
     parser = argparse.ArgumentParser(description="Get graph-based recommendations for a user.")
     parser.add_argument("user_id", type=str, help="The user ID to get recommendations for (e.g., 'user1').")
+    parser.add_argument("--k", type=int, default=10, help="Number of recommendations to return.")
+    parser.add_argument("--unranked", action="store_true", help="Return unscored matches in arbitrary order.")
+    parser.add_argument("--max-hub-degree", type=int, default=DEFAULT_MAX_HUB_DEGREE, help="Skip shared nodes with more members than this.")
+    parser.add_argument("--backend", choices=["neo4j", "memory"], default="neo4j", help="Query Neo4j or the in-process graph snapshot.")
     args = parser.parse_args()
 
     driver = None
     try:
-        driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
-        print(f"Successfully connected to Neo4j.")
+        if args.backend == "memory":
+            from retrievers.graph_memory import CSRGraph
+            graph = CSRGraph.load()
+            print("Loaded in-process graph snapshot.")
+        else:
+            from neo4j import GraphDatabase
+            graph = driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+            print(f"Successfully connected to Neo4j.")
         
-        recommendations = get_graph_recommendations(args.user_id, driver)
+        recommendations = get_graph_recommendations.uncached(args.user_id, graph, k=args.k, ranked=not args.unranked,
+                                                             max_hub_degree=args.max_hub_degree)
         
         print(f"\n--- Graph Recommendations for {args.user_id} ---")
         if recommendations:
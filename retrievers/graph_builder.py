@@ -1,5 +1,8 @@
 import os
+import sys
 import json
+import time
+import argparse
 import duckdb
 import spacy
 import pandas as pd
@@ -8,22 +11,94 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# Add project root to path to allow direct script execution
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ingest.manifest import content_hash, load_manifest, save_manifest, diff_manifest, bump_data_version
+
 # --- Configuration ---
 DUCKDB_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'db', 'profiles.duckdb')
 PARSED_BIOS_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'parsed', 'parsed_bios.jsonl')
 NEO4J_URI = os.getenv("NEO4J_URI")
 NEO4J_USER = os.getenv("NEO4J_USER")
 NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
+MANIFEST_STAGE = "graph"
+# Profile columns only; bios come from the parsed JSONL and the lookup keys are derived
+USERS_QUERY = "SELECT user_id, name, email, company, school, location, tags, title FROM users"
+DEFAULT_BATCH_SIZE = 1000
+NER_CACHE_STAGE = "ner_orgs"
+NER_BATCH_SIZE = 32
+NER_PROCESSES = 1
+# Only the NER component is used, so everything else is left out of the pipeline
+NER_EXCLUDE = ["parser", "tagger", "attribute_ruler", "lemmatizer", "senter"]
+
+# --- Bulk load queries (one transaction per batch of rows) ---
+MERGE_USERS_QUERY = """
+UNWIND $rows AS row
+MERGE (u:User {user_id: row.user_id})
+SET u.name = row.name
+"""
+MERGE_SCHOOLS_QUERY = """
+UNWIND $rows AS row
+MATCH (u:User {user_id: row.user_id})
+MERGE (s:School {name: row.name})
+MERGE (u)-[:ATTENDED]->(s)
+"""
+MERGE_COMPANIES_QUERY = """
+UNWIND $rows AS row
+MATCH (u:User {user_id: row.user_id})
+MERGE (c:Company {name: row.name})
+MERGE (u)-[:WORKED_AT]->(c)
+"""
+
+def load_ner_model():
+    """Loads the spaCy model with only the components needed for NER."""
+    try:
+        return spacy.load("en_core_web_sm", exclude=NER_EXCLUDE)
+    except OSError:
+        print("Downloading spaCy model 'en_core_web_sm'... Please wait.")
+        spacy.cli.download("en_core_web_sm")
+        return spacy.load("en_core_web_sm", exclude=NER_EXCLUDE)
+
+def extract_bio_organizations(user_bios, get_nlp=load_ner_model, batch_size=NER_BATCH_SIZE, n_process=NER_PROCESSES):
+    """Extracts ORG entities for many bios at once. Returns {user_id: [org, ...]}.
+
+    Results are cached on disk per bio hash, so unchanged bios skip NER on later
+    builds; the remaining bios are streamed through nlp.pipe with batching and
+    optional worker processes. `get_nlp` is only called if some bio misses the cache.
+    """
+    cache = load_manifest(NER_CACHE_STAGE)
+    bio_hashes = {user_id: content_hash(bio) for user_id, bio in user_bios.items()}
+    missing = {digest: user_bios[user_id] for user_id, digest in bio_hashes.items() if digest not in cache}
+    print(f"NER cache: {len(bio_hashes) - len(missing)} hits, {len(missing)} bios to process.")
+
+    if missing:
+        docs = get_nlp().pipe(missing.values(), batch_size=batch_size, n_process=n_process)
+        for digest, doc in zip(missing.keys(), docs):
+            cache[digest] = [ent.text for ent in doc.ents if ent.label_ == 'ORG']
+        save_manifest(NER_CACHE_STAGE, cache)
+    return {user_id: cache[digest] for user_id, digest in bio_hashes.items()}
+
+def prune_ner_cache(user_bios):
+    """Drops cached NER results for bios that no longer exist so the cache doesn't grow forever.
+    Must be given every current bio, not just the ones rebuilt in a delta run."""
+    live_hashes = {content_hash(bio) for bio in user_bios.values()}
+    cache = load_manifest(NER_CACHE_STAGE)
+    save_manifest(NER_CACHE_STAGE, {digest: orgs for digest, orgs in cache.items() if digest in live_hashes})
 
 class Neo4jGraphBuilder:
-    def __init__(self, uri, user, password):
+    def __init__(self, uri, user, password, ner_batch_size=NER_BATCH_SIZE, ner_processes=NER_PROCESSES):
         self.driver = GraphDatabase.driver(uri, auth=(user, password))
-        try:
-            self.nlp = spacy.load("en_core_web_sm")
-        except OSError:
-            print("Downloading spaCy model 'en_core_web_sm'... Please wait.")
-            spacy.cli.download("en_core_web_sm")
-            self.nlp = spacy.load("en_core_web_sm")
+        self.ner_batch_size = ner_batch_size
+        self.ner_processes = ner_processes
+        self._nlp = None
+
+    @property
+    def nlp(self):
+        # Loaded on first use, so builds where every bio hits the NER cache skip spaCy entirely
+        if self._nlp is None:
+            self._nlp = load_ner_model()
+        return self._nlp
 
     def close(self):
         self.driver.close()
@@ -33,45 +108,97 @@ class Neo4jGraphBuilder:
             result = session.run(query, parameters)
             return [record for record in result]
 
+    def run_batched(self, query, rows, batch_size=DEFAULT_BATCH_SIZE):
+        """Sends rows to an `UNWIND $rows` query in batches, each in its own explicit
+        write transaction. Returns (nodes_created, relationships_created)."""
+        nodes = relationships = 0
+        with self.driver.session() as session:
+            for i in range(0, len(rows), batch_size):
+                batch = rows[i:i + batch_size]
+                counters = session.execute_write(lambda tx: tx.run(query, rows=batch).consume().counters)
+                nodes += counters.nodes_created
+                relationships += counters.relationships_created
+        return nodes, relationships
+
+    def create_constraints(self):
+        """Creates uniqueness constraints (and their backing indexes) used by every MERGE."""
+        for label, prop in [("User", "user_id"), ("School", "name"), ("Company", "name")]:
+            self.run_query(
+                f"CREATE CONSTRAINT {label.lower()}_{prop}_unique IF NOT EXISTS "
+                f"FOR (n:{label}) REQUIRE n.{prop} IS UNIQUE"
+            )
+
+    def has_users(self):
+        """Returns whether the graph holds any User node."""
+        return self.run_query("MATCH (u:User) RETURN count(u) AS users")[0]["users"] > 0
+
     def clear_graph(self):
         print("Clearing existing graph data...")
         self.run_query("MATCH (n) DETACH DELETE n")
         print("Graph cleared.")
 
+    def remove_users(self, user_ids):
+        """Deletes users and all of their relationships."""
+        self.run_query("MATCH (u:User) WHERE u.user_id IN $user_ids DETACH DELETE u", {'user_ids': list(user_ids)})
+
+    def reset_user_edges(self, user_ids):
+        """Drops the outgoing relationships of users so they can be rebuilt from fresh data."""
+        self.run_query("""
+        MATCH (u:User)-[r:ATTENDED|WORKED_AT]->()
+        WHERE u.user_id IN $user_ids
+        DELETE r
+        """, {'user_ids': list(user_ids)})
+
+    def prune_orphans(self):
+        """Deletes School and Company nodes that no user is attached to anymore."""
+        self.run_query("""
+        MATCH (n) WHERE (n:School OR n:Company) AND NOT (n)--()
+        DELETE n
+        """)
+
     def extract_organizations(self, text):
         doc = self.nlp(text)
         return [ent.text for ent in doc.ents if ent.label_ == 'ORG']
 
-    def build_graph(self, users_df, user_bios):
+    def extract_organizations_batch(self, user_bios):
+        """Extracts ORG entities for many bios at once. Returns {user_id: [org, ...]}."""
+        return extract_bio_organizations(user_bios, lambda: self.nlp, self.ner_batch_size, self.ner_processes)
+
+    def build_graph(self, users_df, user_bios, batch_size=DEFAULT_BATCH_SIZE, user_organizations=None):
+        """Merges users, schools and companies into the graph. `user_organizations` may hold
+        the ORG entities already extracted from `user_bios`; otherwise NER runs here."""
         print(f"Building graph for {len(users_df)} users...")
+        start = time.perf_counter()
+        self.create_constraints()
+
         # Process structured data
-        for _, row in users_df.iterrows():
-            self.run_query("MERGE (u:User {user_id: $user_id, name: $name})", 
-                           {'user_id': row['user_id'], 'name': row['name']})
+        user_rows, school_rows, company_rows = [], [], []
+        for row in users_df.to_dict(orient='records'):
+            user_rows.append({'user_id': row['user_id'], 'name': row['name']})
             if pd.notna(row.get('school')):
-                self.run_query("""
-                MATCH (u:User {user_id: $user_id})
-                MERGE (s:School {name: $school_name})
-                MERGE (u)-[:ATTENDED]->(s)
-                """, {'user_id': row['user_id'], 'school_name': row['school']})
+                school_rows.append({'user_id': row['user_id'], 'name': row['school']})
             if pd.notna(row.get('company')):
-                self.run_query("""
-                MATCH (u:User {user_id: $user_id})
-                MERGE (c:Company {name: $company_name})
-                MERGE (u)-[:WORKED_AT]->(c)
-                """, {'user_id': row['user_id'], 'company_name': row['company']})
+                company_rows.append({'user_id': row['user_id'], 'name': row['company']})
 
         # Process unstructured data
         print(f"Enriching graph with bio data for {len(user_bios)} users...")
-        for user_id, bio in user_bios.items():
-            organizations = self.extract_organizations(bio)
-            for org in organizations:
-                self.run_query("""
-                MATCH (u:User {user_id: $user_id})
-                MERGE (c:Company {name: $company_name})
-                MERGE (u)-[:WORKED_AT]->(c)
-                """, {'user_id': user_id, 'company_name': org})
-        print("Graph building complete.")
+        if user_organizations is None:
+            user_organizations = self.extract_organizations_batch(user_bios)
+        for user_id in user_bios:
+            for org in user_organizations.get(user_id, []):
+                company_rows.append({'user_id': user_id, 'name': org})
+
+        nodes = relationships = 0
+        for query, rows in [(MERGE_USERS_QUERY, user_rows),
+                            (MERGE_SCHOOLS_QUERY, school_rows),
+                            (MERGE_COMPANIES_QUERY, company_rows)]:
+            created_nodes, created_relationships = self.run_batched(query, rows, batch_size)
+            nodes += created_nodes
+            relationships += created_relationships
+
+        elapsed = time.perf_counter() - start
+        print(f"Graph building complete: {nodes} nodes and {relationships} relationships in {elapsed:.2f}s "
+              f"({nodes / elapsed:.0f} nodes/sec, {relationships / elapsed:.0f} relationships/sec).")
 
 def load_parsed_bios(file_path):
     user_bios = {}
@@ -81,11 +208,74 @@ def load_parsed_bios(file_path):
             user_bios[data['user_id']] = data['bio']
     return user_bios
 
+def user_hashes(users_df, user_bios):
+    """Hashes each user's CSV row together with their parsed bio."""
+    hashes = {}
+    for record in users_df.to_dict(orient='records'):
+        user_id = record['user_id']
+        hashes[user_id] = content_hash({'row': record, 'bio': user_bios.get(user_id)})
+    # Users with a bio but no structured row still get graph enrichment
+    for user_id, bio in user_bios.items():
+        hashes.setdefault(user_id, content_hash({'row': None, 'bio': bio}))
+    return hashes
+
+def build_knowledge_graph(users_df, user_bios, delta=False, batch_size=DEFAULT_BATCH_SIZE,
+                          ner_batch_size=NER_BATCH_SIZE, ner_processes=NER_PROCESSES, user_organizations=None):
+    """Builds (or in delta mode updates) the Neo4j graph from the users table and parsed bios.
+    A delta run against an empty graph builds it in full.
+    `user_organizations` may hold ORG entities already extracted for every bio, e.g. by the
+    preprocessing pipeline; otherwise NER runs as part of the build. Raises on failure."""
+    graph_builder = Neo4jGraphBuilder(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD,
+                                      ner_batch_size=ner_batch_size, ner_processes=ner_processes)
+    try:
+        print("Successfully connected to Neo4j.")
+
+        manifest = user_hashes(users_df, user_bios)
+        # The manifest only describes the graph while the graph still exists; a wiped
+        # database would otherwise look unchanged and stay empty
+        previous_manifest = load_manifest(MANIFEST_STAGE) if delta and graph_builder.has_users() else {}
+        if delta and not previous_manifest:
+            print("No previous graph build to update; building the full graph.")
+        if previous_manifest:
+            changed, removed = diff_manifest(previous_manifest, manifest)
+            print(f"{len(changed)} users changed and {len(removed)} removed since the last build.")
+            changed_set = set(changed)
+            if removed:
+                graph_builder.remove_users(removed)
+            if changed:
+                graph_builder.reset_user_edges(changed)
+            graph_builder.build_graph(
+                users_df[users_df['user_id'].isin(changed_set)],
+                {user_id: bio for user_id, bio in user_bios.items() if user_id in changed_set},
+                batch_size=batch_size,
+                user_organizations=user_organizations,
+            )
+            graph_builder.prune_orphans()
+        else:
+            # Forget the built users before clearing, so a later --delta run after a failed
+            # rebuild rebuilds everyone instead of trusting hashes of nodes that are gone
+            save_manifest(MANIFEST_STAGE, {})
+            graph_builder.clear_graph()
+            graph_builder.build_graph(users_df, user_bios, batch_size=batch_size, user_organizations=user_organizations)
+        save_manifest(MANIFEST_STAGE, manifest)
+        prune_ner_cache(user_bios)
+        bump_data_version()
+    finally:
+        graph_builder.close()
+        print("Neo4j connection closed.")
+
 def main():
+    parser = argparse.ArgumentParser(description="Build the Neo4j knowledge graph from DuckDB and parsed bios.")
+    parser.add_argument("--delta", action="store_true", help="Only rebuild users whose profile or bio changed since the last run.")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Rows sent per UNWIND transaction.")
+    parser.add_argument("--ner-batch-size", type=int, default=NER_BATCH_SIZE, help="Bios per nlp.pipe batch.")
+    parser.add_argument("--ner-processes", type=int, default=NER_PROCESSES, help="Worker processes for spaCy NER.")
+    args = parser.parse_args()
+
     # 1. Load data from DuckDB and JSONL
     print(f"Connecting to DuckDB at {DUCKDB_PATH}...")
     con = duckdb.connect(database=DUCKDB_PATH, read_only=True)
-    users_df = con.execute("SELECT * FROM users").fetchdf()
+    users_df = con.execute(USERS_QUERY).fetchdf()
     con.close()
     print(f"Loaded {len(users_df)} users from DuckDB.")
     
@@ -95,18 +285,10 @@ def main():
 
     # 2. Connect to Neo4j and build the graph
     try:
-        graph_builder = Neo4jGraphBuilder(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD)
-        print("Successfully connected to Neo4j.")
-        
-        graph_builder.clear_graph()
-        graph_builder.build_graph(users_df, user_bios)
-
+        build_knowledge_graph(users_df, user_bios, delta=args.delta, batch_size=args.batch_size,
+                              ner_batch_size=args.ner_batch_size, ner_processes=args.ner_processes)
     except Exception as e:
         print(f"Failed to connect or build graph in Neo4j: {e}")
-    finally:
-        if 'graph_builder' in locals() and graph_builder.driver:
-            graph_builder.close()
-            print("Neo4j connection closed.")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,191 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import numpy as np
+import pandas as pd
+
+# Add project root to path to allow direct script execution
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from retrievers.graph import GraphBackend, DEFAULT_MAX_HUB_DEGREE
+from ingest.manifest import bump_data_version
+
+# --- Configuration ---
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+SNAPSHOT_DIR = os.path.join(DATA_DIR, 'graph_snapshot')
+
+# Entity type codes stored in the entity_types array
+ENTITY_TYPES = ["School", "Company"]
+SNAPSHOT_ARRAYS = ["user_ids", "user_indptr", "user_indices",
+                   "entity_types", "entity_names", "entity_indptr", "entity_indices"]
+
+def _csr(rows, cols, n_rows):
+    """Builds (indptr, indices) for a deduplicated (row, col) edge list."""
+    order = np.lexsort((cols, rows))
+    rows, cols = rows[order], cols[order]
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+    return indptr, cols.astype(np.int32)
+
+class CSRGraph(GraphBackend):
+    """An in-process, read-only bipartite User <-> School/Company graph.
+
+    User and entity ids are interned to integers (users by their position in the sorted
+    user_ids array) and both directions of the adjacency are stored as CSR arrays, so a
+    two-hop query is a few NumPy slices with no network round-trip. Snapshots are
+    directories of .npy files that load memory-mapped.
+    """
+
+    def __init__(self, user_ids, user_indptr, user_indices, entity_types, entity_names,
+                 entity_indptr, entity_indices):
+        self.user_ids = user_ids
+        self.user_indptr = user_indptr
+        self.user_indices = user_indices
+        self.entity_types = entity_types
+        self.entity_names = entity_names
+        self.entity_indptr = entity_indptr
+        self.entity_indices = entity_indices
+        self.entity_degrees = np.diff(entity_indptr)
+
+    @classmethod
+    def from_edges(cls, edges):
+        """Builds a graph from an iterable of (user_id, entity_type, entity_name) edges."""
+        edges_df = pd.DataFrame(list(edges), columns=["user_id", "type", "name"]).drop_duplicates()
+        user_ids = np.array(sorted(edges_df["user_id"].unique()), dtype=str)
+        entities = edges_df[["type", "name"]].drop_duplicates().sort_values(["type", "name"]).reset_index(drop=True)
+        entity_index = {(t, n): i for i, (t, n) in enumerate(zip(entities["type"], entities["name"]))}
+
+        user_rows = np.searchsorted(user_ids, edges_df["user_id"].to_numpy(dtype=str))
+        entity_rows = np.array([entity_index[(t, n)] for t, n in zip(edges_df["type"], edges_df["name"])], dtype=np.int64)
+
+        user_indptr, user_indices = _csr(user_rows, entity_rows, len(user_ids))
+        entity_indptr, entity_indices = _csr(entity_rows, user_rows, len(entities))
+        entity_types = np.array([ENTITY_TYPES.index(t) for t in entities["type"]], dtype=np.int8)
+        return cls(user_ids, user_indptr, user_indices, entity_types,
+                   np.array(entities["name"], dtype=str), entity_indptr, entity_indices)
+
+    @classmethod
+    def from_sources(cls, users_df, user_organizations):
+        """Builds the same graph as Neo4jGraphBuilder: schools and companies from the users
+        table plus the organisations extracted from each user's bio."""
+        edges = []
+        for row in users_df.to_dict(orient='records'):
+            if pd.notna(row.get('school')):
+                edges.append((row['user_id'], "School", row['school']))
+            if pd.notna(row.get('company')):
+                edges.append((row['user_id'], "Company", row['company']))
+        known_users = set(users_df['user_id'])
+        for user_id, organizations in user_organizations.items():
+            # Neo4jGraphBuilder only attaches organisations to users that exist in the table
+            if user_id in known_users:
+                edges.extend((user_id, "Company", org) for org in organizations)
+        return cls.from_edges(edges)
+
+    def save(self, snapshot_dir=SNAPSHOT_DIR):
+        """Writes the graph as a directory of .npy files, replacing any previous snapshot."""
+        tmp_dir = snapshot_dir + ".tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        for name in SNAPSHOT_ARRAYS:
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), getattr(self, name))
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+        os.replace(tmp_dir, snapshot_dir)
+
+    @classmethod
+    def load(cls, snapshot_dir=SNAPSHOT_DIR):
+        """Memory-maps a snapshot written by save()."""
+        return cls(*(np.load(os.path.join(snapshot_dir, f"{name}.npy"), mmap_mode='r') for name in SNAPSHOT_ARRAYS))
+
+    def _user_index(self, user_id):
+        i = int(np.searchsorted(self.user_ids, user_id))
+        if i < len(self.user_ids) and self.user_ids[i] == user_id:
+            return i
+        return None
+
+    def _entities_of(self, u):
+        return self.user_indices[self.user_indptr[u]:self.user_indptr[u + 1]]
+
+    def second_degree(self, user_id, k=10, ranked=True, max_hub_degree=DEFAULT_MAX_HUB_DEGREE):
+        u = self._user_index(user_id)
+        if u is None:
+            return []
+
+        entities = np.asarray(self._entities_of(u))
+        degrees = self.entity_degrees[entities]
+        if ranked:
+            keep = degrees > 1
+            if max_hub_degree is not None:
+                keep &= degrees <= max_hub_degree
+            entities, degrees = entities[keep], degrees[keep]
+        if len(entities) == 0:
+            return []
+
+        # Gather every member of every shared entity, weighted per Adamic-Adar
+        members = np.concatenate([self.entity_indices[self.entity_indptr[e]:self.entity_indptr[e + 1]] for e in entities])
+        weights = np.repeat(1.0 / np.log(degrees) if ranked else np.ones(len(degrees)), degrees)
+        candidates, inverse = np.unique(members, return_inverse=True)
+        scores = np.bincount(inverse, weights=weights)
+        not_self = candidates != u
+        candidates, scores = candidates[not_self], scores[not_self]
+
+        if ranked:
+            # Sort by score desc, then user_id asc to match the Cypher ORDER BY
+            top = np.lexsort((candidates, -scores))[:k]
+        else:
+            top = np.arange(min(k, len(candidates)))
+
+        results = []
+        for i in top:
+            candidate = candidates[i]
+            shared = np.intersect1d(entities, self._entities_of(candidate), assume_unique=True)
+            results.append({
+                "user_id": str(self.user_ids[candidate]),
+                "reasons": [{"type": ENTITY_TYPES[self.entity_types[e]], "name": str(self.entity_names[e])} for e in shared],
+                "score": float(scores[i]) if ranked else None,
+            })
+        return results
+
+def build_snapshot(snapshot_dir=SNAPSHOT_DIR, users_df=None, user_organizations=None):
+    """Builds the in-process graph from the DuckDB users table and parsed bios and saves it.
+    Either source may be passed in already loaded; the missing ones are read here."""
+    if users_df is None:
+        import duckdb
+        from retrievers.graph_builder import DUCKDB_PATH, USERS_QUERY
+        con = duckdb.connect(database=DUCKDB_PATH, read_only=True)
+        users_df = con.execute(USERS_QUERY).fetchdf()
+        con.close()
+    if user_organizations is None:
+        from retrievers.graph_builder import PARSED_BIOS_PATH, load_parsed_bios, extract_bio_organizations
+        user_organizations = extract_bio_organizations(load_parsed_bios(PARSED_BIOS_PATH))
+
+    graph = CSRGraph.from_sources(users_df, user_organizations)
+    graph.save(snapshot_dir)
+    bump_data_version()
+    return graph
+
+def main():
+    """Builds the graph snapshot, or queries it when a user_id is given."""
+    parser = argparse.ArgumentParser(description="Build or query the in-process CSR graph snapshot.")
+    parser.add_argument("user_id", type=str, nargs="?", help="Query 2nd-degree connections for this user instead of building.")
+    parser.add_argument("--k", type=int, default=10, help="Number of recommendations to return.")
+    args = parser.parse_args()
+
+    if args.user_id is None:
+        start = time.perf_counter()
+        graph = build_snapshot()
+        print(f"Saved graph snapshot with {len(graph.user_ids)} users, {len(graph.entity_types)} schools/companies "
+              f"and {len(graph.user_indices)} edges to {SNAPSHOT_DIR} in {time.perf_counter() - start:.2f}s.")
+        return
+
+    graph = CSRGraph.load()
+    start = time.perf_counter()
+    matches = graph.second_degree(args.user_id, k=args.k)
+    elapsed_us = (time.perf_counter() - start) * 1e6
+    print(f"\n--- In-process Graph Recommendations for {args.user_id} ({elapsed_us:.0f} us) ---")
+    for match in matches:
+        print(f"- {match}")
+
+if __name__ == "__main__":
+    main()
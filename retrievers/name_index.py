@@ -0,0 +1,293 @@
+import os
+import re
+import sys
+import time
+import heapq
+import pickle
+import bisect
+import argparse
+from collections import defaultdict
+from itertools import combinations
+
+# Add project root to path to allow direct script execution
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from retrievers.resources import DATA_DIR, get_duckdb_cursor
+
+# --- Configuration ---
+NAME_INDEX_PATH = os.path.join(DATA_DIR, 'indexes', 'name_index.pkl')
+
+# One index per resolvable field: (name, id) rows from the users table. Company, school
+# and location names map to themselves so they can normalize sql_retriever values.
+NAME_QUERIES = {
+    "user": "SELECT name, user_id FROM users ORDER BY user_id",
+    "company": "SELECT DISTINCT company, company FROM users WHERE company IS NOT NULL",
+    "school": "SELECT DISTINCT school, school FROM users WHERE school IS NOT NULL",
+    "location": "SELECT DISTINCT location, location FROM users WHERE location IS NOT NULL",
+}
+
+# Fuzzy matches scoring below this (0-1) are dropped
+FUZZY_MIN_SCORE = 0.5
+
+_TOKEN_RE = re.compile(r"\w+")
+
+def tokenize(key):
+    return _TOKEN_RE.findall(key)
+
+def max_edits(token):
+    """Typos tolerated in a token: none for very short tokens, up to 2 for long ones."""
+    return 0 if len(token) <= 2 else 1 if len(token) <= 5 else 2
+
+def deletes(token, distance):
+    """Every string obtained by deleting up to `distance` characters from token."""
+    results = {token}
+    for n in range(1, min(distance, len(token) - 1) + 1):
+        for positions in combinations(range(len(token)), n):
+            results.add("".join(c for i, c in enumerate(token) if i not in positions))
+    return results
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance between a and b, or limit + 1 if it exceeds limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+class NameIndex:
+    """An in-memory name -> id index answering exact, case-folded, prefix and fuzzy lookups.
+
+    Exact and case-folded matches are dictionary hits; prefix matches ("alice" for
+    "Alice Heart") are a bisect over the sorted case-folded names. Fuzzy matches use a
+    SymSpell-style deletion index over name tokens: a misspelt token and the token it
+    was meant to be share a deletion variant, so candidates are found with a handful of
+    dictionary lookups instead of comparing against every name.
+    """
+
+    def __init__(self, entries=()):
+        """Builds the index from an iterable of (name, id) pairs. Ids keep their input order."""
+        self.exact = {}
+        self.folded = {}
+        self.display = {}
+        self.token_keys = defaultdict(set)    # token -> case-folded names containing it
+        self.token_deletes = defaultdict(set)  # deletion variant -> tokens
+        self.sorted_keys = []
+        for name, entry_id in entries:
+            self.add(name, entry_id, keep_sorted=False)
+        self.sorted_keys = sorted(self.folded)
+
+    def __len__(self):
+        return len(self.exact)
+
+    def entries(self):
+        """Yields every (name, id) pair in the index."""
+        for name, ids in self.exact.items():
+            for entry_id in ids:
+                yield name, entry_id
+
+    def add(self, name, entry_id, keep_sorted=True):
+        if not name:
+            return
+        self.exact.setdefault(name, []).append(entry_id)
+        key = name.casefold()
+        if key in self.folded:
+            self.folded[key].append(entry_id)
+            return
+        self.folded[key] = [entry_id]
+        self.display[key] = name
+        if keep_sorted:
+            bisect.insort(self.sorted_keys, key)
+        for token in tokenize(key):
+            if token not in self.token_keys:
+                for variant in deletes(token, max_edits(token)):
+                    self.token_deletes[variant].add(token)
+            self.token_keys[token].add(key)
+
+    def remove(self, name, entry_id):
+        if entry_id not in self.exact.get(name, ()):
+            return
+        self.exact[name].remove(entry_id)
+        if not self.exact[name]:
+            del self.exact[name]
+        key = name.casefold()
+        self.folded[key].remove(entry_id)
+        if self.folded[key]:
+            if self.display[key] == name:
+                self.display[key] = next(n for n in self.exact if n.casefold() == key)
+            return
+        del self.folded[key], self.display[key]
+        self.sorted_keys.pop(bisect.bisect_left(self.sorted_keys, key))
+        for token in tokenize(key):
+            self.token_keys[token].discard(key)
+            if not self.token_keys[token]:
+                del self.token_keys[token]
+                for variant in deletes(token, max_edits(token)):
+                    self.token_deletes[variant].discard(token)
+                    if not self.token_deletes[variant]:
+                        del self.token_deletes[variant]
+
+    def _prefixed(self, key, limit):
+        start = bisect.bisect_left(self.sorted_keys, key)
+        matches = []
+        for i in range(start, min(start + limit, len(self.sorted_keys))):
+            if not self.sorted_keys[i].startswith(key):
+                break
+            matches.append(self.sorted_keys[i])
+        return matches
+
+    def _similar_tokens(self, token):
+        """Returns {indexed token: similarity} for tokens within the edit budget of token."""
+        budget = max_edits(token)
+        candidates = set()
+        for variant in deletes(token, budget):
+            candidates |= self.token_deletes.get(variant, set())
+        similar = {}
+        for candidate in candidates:
+            distance = edit_distance(token, candidate, min(budget, max_edits(candidate)))
+            if distance <= budget:
+                similar[candidate] = 1.0 - distance / max(len(token), len(candidate))
+        return similar
+
+    def _fuzzy(self, key, limit):
+        """Ranks names by how well their tokens cover the query tokens, allowing typos."""
+        query_tokens = tokenize(key)
+        if not query_tokens:
+            return []
+        scores = defaultdict(float)
+        matched = defaultdict(int)
+        for token in query_tokens:
+            best = {}
+            # Most similar tokens first, so each name keeps its best similarity
+            for candidate, similarity in sorted(self._similar_tokens(token).items(), key=lambda c: -c[1]):
+                for name_key in self.token_keys[candidate]:
+                    best.setdefault(name_key, similarity)
+            for name_key, similarity in best.items():
+                scores[name_key] += similarity
+                matched[name_key] += 1
+        ranked = []
+        min_total = FUZZY_MIN_SCORE * len(query_tokens)
+        for name_key, total in scores.items():
+            if total < min_total:
+                continue
+            # Average similarity over the query tokens, discounted (by up to half) for
+            # name tokens the query did not mention
+            coverage = min(1.0, matched[name_key] / len(tokenize(name_key)))
+            score = total / len(query_tokens) * (0.5 + 0.5 * coverage)
+            if score >= FUZZY_MIN_SCORE:
+                ranked.append((score, name_key))
+        return [(name_key, score) for score, name_key in heapq.nsmallest(limit, ranked, key=lambda r: (-r[0], r[1]))]
+
+    def lookup(self, name, limit=5):
+        """Returns up to `limit` (name, id, match_type, score) candidates, best first.
+        match_type is "exact", "casefold", "prefix" or "fuzzy"; earlier kinds rank first."""
+        name = name.strip()
+        key = name.casefold()
+        results = []
+        seen = set()
+
+        def extend(display, ids, match_type, score):
+            for entry_id in ids:
+                if entry_id not in seen:
+                    seen.add(entry_id)
+                    results.append((display, entry_id, match_type, score))
+
+        if name in self.exact:
+            extend(name, self.exact[name], "exact", 1.0)
+        if key in self.folded:
+            extend(self.display[key], self.folded[key], "casefold", 1.0)
+        if len(results) < limit:
+            for candidate in self._prefixed(key, limit):
+                extend(self.display[candidate], self.folded[candidate], "prefix", len(key) / len(candidate))
+        if len(results) < limit:
+            for candidate, score in self._fuzzy(key, limit):
+                extend(self.display[candidate], self.folded[candidate], "fuzzy", score)
+        return results[:limit]
+
+    def resolve(self, name):
+        """Returns the id of the best match for `name`, or None."""
+        matches = self.lookup(name, limit=1)
+        return matches[0][1] if matches else None
+
+def fetch_name_entries(con):
+    """Reads the (name, id) rows of every indexed field from a DuckDB connection."""
+    return {field: con.execute(query).fetchall() for field, query in NAME_QUERIES.items()}
+
+def build_name_indexes(con):
+    return {field: NameIndex(rows) for field, rows in fetch_name_entries(con).items()}
+
+def load_name_indexes(path=NAME_INDEX_PATH):
+    """Loads the indexes written by save_name_indexes(), or returns None if there are none."""
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+        return None
+
+def save_name_indexes(indexes, path=NAME_INDEX_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(indexes, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+def refresh_name_indexes(con, path=NAME_INDEX_PATH):
+    """Brings the persisted indexes in line with the users table on `con`, applying only
+    the names that were added or removed since the last refresh.
+    Returns {field: (added, removed)}."""
+    indexes = load_name_indexes(path) or {}
+    changes = {}
+    for field, rows in fetch_name_entries(con).items():
+        index = indexes.setdefault(field, NameIndex())
+        new_entries = set(rows)
+        old_entries = set(index.entries())
+        for name, entry_id in old_entries - new_entries:
+            index.remove(name, entry_id)
+        for name, entry_id in rows:
+            if (name, entry_id) not in old_entries:
+                index.add(name, entry_id)
+        changes[field] = (len(new_entries - old_entries), len(old_entries - new_entries))
+    save_name_indexes(indexes, path)
+    return changes
+
+def load_or_build_name_indexes():
+    """Returns the persisted indexes, building them from the shared DuckDB connection if
+    load_profiles has not written them yet."""
+    indexes = load_name_indexes()
+    if indexes is not None and set(indexes) == set(NAME_QUERIES):
+        return indexes
+    con = get_duckdb_cursor()
+    try:
+        return build_name_indexes(con)
+    finally:
+        con.close()
+
+def main():
+    """Resolves a name against one of the name indexes."""
+    parser = argparse.ArgumentParser(description="Resolve a name through the in-memory name indexes.")
+    parser.add_argument("name", type=str, help="Full, partial or misspelt name, e.g. 'alise'.")
+    parser.add_argument("--field", choices=list(NAME_QUERIES), default="user", help="Which index to search.")
+    parser.add_argument("--limit", type=int, default=5, help="Number of candidates to return.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = load_or_build_name_indexes()[args.field]
+    print(f"Loaded {len(index)} {args.field} names in {(time.perf_counter() - start) * 1000:.1f} ms.")
+
+    start = time.perf_counter()
+    matches = index.lookup(args.name, limit=args.limit)
+    elapsed_us = (time.perf_counter() - start) * 1e6
+    print(f"\n--- Matches for '{args.name}' ({elapsed_us:.0f} us) ---")
+    for match in matches:
+        print(f"- {match}")
+
+if __name__ == "__main__":
+    main()
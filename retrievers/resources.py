@@ -0,0 +1,346 @@
+import os
+import atexit
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- Configuration ---
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+DUCKDB_PATH = os.path.join(DATA_DIR, 'db', 'profiles.duckdb')
+QDRANT_PATH = os.path.join(DATA_DIR, 'qdrant_storage')
+# Set to use a Qdrant server instead of the embedded storage folder (required for AsyncQdrantClient)
+QDRANT_URL = os.getenv("QDRANT_URL")
+BIOS_FILE_PATH = os.path.join(DATA_DIR, 'parsed', 'parsed_bios.jsonl')
+GRAPH_SNAPSHOT_DIR = os.path.join(DATA_DIR, 'graph_snapshot')
+# "neo4j" queries the Neo4j server; "memory" uses the in-process CSR snapshot
+GRAPH_BACKEND = os.getenv("GRAPH_BACKEND", "neo4j")
+VECTOR_STORE_DIR = os.path.join(DATA_DIR, 'vector_store')
+# "qdrant" searches the Qdrant collection; "local" uses the in-process quantized store
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "qdrant")
+EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'
+NER_MODEL_NAME = "en_core_web_sm"
+# Prompt-time NER only needs the entity recognizer
+NER_MODEL_EXCLUDE = ["parser", "tagger", "attribute_ruler", "lemmatizer", "senter"]
+NEO4J_URI = os.getenv("NEO4J_URI")
+NEO4J_USER = os.getenv("NEO4J_USER")
+NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
+# Bounds Neo4j connects and queries, so a hung server releases the calling thread
+NEO4J_TIMEOUT_SECONDS = float(os.getenv("NEO4J_TIMEOUT", 5))
+# Threads used to run blocking DuckDB/model calls from async code
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", 8))
+
+
+class ResourceRegistry:
+    """A process-wide registry of long-lived resources (database handles, models).
+
+    Each resource is created lazily by its factory on first use, shared by every
+    caller afterwards, and torn down by its closer on shutdown. Creation is
+    guarded by a lock so concurrent first calls only build a resource once.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._factories = {}
+        self._resources = {}
+
+    def register(self, name, factory, closer=None, health_check=None):
+        """Registers a factory for a named resource. Does not create it."""
+        with self._lock:
+            self._factories[name] = (factory, closer, health_check)
+
+    def get(self, name):
+        """Returns the named resource, creating it on first use."""
+        resource = self._resources.get(name)
+        if resource is not None:
+            return resource
+        with self._lock:
+            if name not in self._resources:
+                if name not in self._factories:
+                    raise KeyError(f"Unknown resource: {name}")
+                factory, _, _ = self._factories[name]
+                self._resources[name] = factory()
+            return self._resources[name]
+
+    def is_loaded(self, name):
+        return name in self._resources
+
+    def health(self):
+        """Runs the health check of every loaded resource.
+        Returns a dict mapping resource name to True or an error message.
+        The checks may be network round-trips, so they run outside the registry lock."""
+        with self._lock:
+            loaded = [(name, resource, self._factories[name][2]) for name, resource in self._resources.items()]
+        status = {}
+        for name, resource, health_check in loaded:
+            try:
+                if health_check:
+                    health_check(resource)
+                status[name] = True
+            except Exception as e:
+                status[name] = f"{type(e).__name__}: {e}"
+        return status
+
+    def reset(self, name):
+        """Closes a single resource so that the next get() recreates it."""
+        with self._lock:
+            resource = self._resources.pop(name, None)
+            if resource is not None:
+                _, closer, _ = self._factories[name]
+                if closer:
+                    try:
+                        closer(resource)
+                    except Exception as e:
+                        print(f"Error closing resource '{name}': {e}")
+
+    def release(self, name):
+        """Removes a resource without closing it and returns it, or None if it is not loaded."""
+        with self._lock:
+            return self._resources.pop(name, None)
+
+    def close(self):
+        """Closes every loaded resource. Safe to call more than once."""
+        with self._lock:
+            for name in list(self._resources):
+                self.reset(name)
+
+
+# --- Resource factories ---
+
+def _create_duckdb():
+    # The connection lives as long as the process, and its read lock on the file keeps
+    # other processes from opening it for writing; see connect_duckdb_for_write
+    import duckdb
+    return duckdb.connect(database=DUCKDB_PATH, read_only=True)
+
+
+def connect_duckdb_for_write(path=DUCKDB_PATH):
+    """Opens a read-write DuckDB connection for the ingest and precompute scripts.
+    A running app or agent holds the database open read-only through the registry, which
+    DuckDB's file lock does not allow alongside a writer; that case raises a RuntimeError
+    saying so instead of DuckDB's bare IOException."""
+    import duckdb
+    try:
+        return duckdb.connect(database=path, read_only=False)
+    except duckdb.IOException as e:
+        if "lock" not in str(e).lower():
+            raise
+        raise RuntimeError(f"Cannot open {path} for writing because another process holds it open "
+                           f"(a running UI or agent keeps a read-only connection). Stop it and retry. ({e})") from e
+
+
+def _create_qdrant():
+    from qdrant_client import QdrantClient
+    return QdrantClient(url=QDRANT_URL) if QDRANT_URL else QdrantClient(path=QDRANT_PATH)
+
+
+def _create_async_qdrant():
+    # The embedded storage folder can only be opened by one client per process, so the
+    # async client is only available against a Qdrant server
+    if not QDRANT_URL:
+        return None
+    from qdrant_client import AsyncQdrantClient
+    return AsyncQdrantClient(url=QDRANT_URL)
+
+
+def _create_embedding_model():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBEDDING_MODEL_NAME, device='cpu')
+
+
+def _create_neo4j_driver():
+    from neo4j import GraphDatabase
+    return GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD),
+                                connection_timeout=NEO4J_TIMEOUT_SECONDS,
+                                connection_acquisition_timeout=NEO4J_TIMEOUT_SECONDS)
+
+
+def _create_async_neo4j_driver():
+    from neo4j import AsyncGraphDatabase
+    return AsyncGraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD),
+                                     connection_timeout=NEO4J_TIMEOUT_SECONDS,
+                                     connection_acquisition_timeout=NEO4J_TIMEOUT_SECONDS)
+
+
+def _close_async(resource):
+    """Closes an async client from synchronous shutdown code."""
+    try:
+        asyncio.get_running_loop().create_task(resource.close())
+    except RuntimeError:
+        asyncio.run(resource.close())
+
+
+def _create_ner_model():
+    import spacy
+    return spacy.load(NER_MODEL_NAME, exclude=NER_MODEL_EXCLUDE)
+
+
+def _create_name_indexes():
+    from ingest.manifest import read_data_version
+    from retrievers.name_index import load_or_build_name_indexes
+    version = read_data_version()
+    return version, load_or_build_name_indexes()
+
+
+def _create_bio_store():
+    from retrievers.bio_store import BioStore
+    return BioStore(BIOS_FILE_PATH)
+
+
+def _create_graph_memory():
+    from retrievers.graph_memory import CSRGraph
+    return CSRGraph.load(GRAPH_SNAPSHOT_DIR)
+
+
+def _create_vector_store():
+    from retrievers.vector_store import QuantizedVectorStore
+    return QuantizedVectorStore.load(VECTOR_STORE_DIR)
+
+
+registry = ResourceRegistry()
+registry.register("duckdb", _create_duckdb,
+                  closer=lambda con: con.close(),
+                  health_check=lambda con: con.cursor().execute("SELECT 1").fetchone())
+registry.register("qdrant", _create_qdrant,
+                  closer=lambda client: client.close(),
+                  health_check=lambda client: client.get_collections())
+registry.register("embedding_model", _create_embedding_model)
+registry.register("neo4j", _create_neo4j_driver,
+                  closer=lambda driver: driver.close(),
+                  health_check=lambda driver: driver.verify_connectivity())
+registry.register("bio_store", _create_bio_store,
+                  closer=lambda store: store.close())
+registry.register("graph_memory", _create_graph_memory)
+registry.register("vector_store", _create_vector_store)
+registry.register("ner_model", _create_ner_model)
+registry.register("name_indexes", _create_name_indexes)
+# Async clients are bound to the event loop that first uses them; async callers
+# should run in one long-lived loop (e.g. the HTTP server's)
+registry.register("async_qdrant", _create_async_qdrant, closer=_close_async)
+registry.register("async_neo4j", _create_async_neo4j_driver, closer=_close_async)
+registry.register("db_executor",
+                  lambda: ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="db"),
+                  closer=lambda executor: executor.shutdown(wait=False))
+atexit.register(registry.close)
+
+# Resources read from files the preprocessing pipeline rewrites
+FILE_BACKED_RESOURCES = ["duckdb", "bio_store", "graph_memory", "vector_store", "name_indexes"]
+
+
+def _release_file_backed(_version):
+    # Released rather than closed, so calls still reading the old handles finish on them;
+    # the next get() opens the rebuilt files
+    for name in FILE_BACKED_RESOURCES:
+        registry.release(name)
+
+
+# The query cache notices data version bumps first; drop stale snapshots at the same time
+from retrievers.cache import query_cache
+query_cache.on_version_change(_release_file_backed)
+
+
+# --- Accessors ---
+
+def get_duckdb_cursor():
+    """Returns a new cursor on the shared read-only DuckDB connection.
+    DuckDB connections are not safe to share across threads, but cursors are cheap
+    duplicates of the same database handle, so each caller gets its own."""
+    return registry.get("duckdb").cursor()
+
+
+_thread_local = threading.local()
+
+
+def get_thread_duckdb_cursor():
+    """Returns this thread's long-lived cursor on the shared DuckDB connection.
+    Callers must not close it. A new cursor is opened if the connection was reset."""
+    con = registry.get("duckdb")
+    if getattr(_thread_local, "duckdb_con", None) is not con:
+        _thread_local.duckdb_cursor = con.cursor()
+        _thread_local.duckdb_con = con
+    return _thread_local.duckdb_cursor
+
+
+def get_qdrant_client():
+    return registry.get("qdrant")
+
+
+def get_embedding_model():
+    return registry.get("embedding_model")
+
+
+def get_neo4j_driver():
+    return registry.get("neo4j")
+
+
+def get_bio_store():
+    return registry.get("bio_store")
+
+
+def get_vector_index():
+    """Returns the VectorIndex selected by the VECTOR_BACKEND environment variable: the
+    shared QdrantClient, or the memory-mapped QuantizedVectorStore for "local"."""
+    from retrievers.vector import QdrantVectorIndex, LocalVectorIndex
+    if VECTOR_BACKEND == "local":
+        return LocalVectorIndex(registry.get("vector_store"))
+    return QdrantVectorIndex(get_qdrant_client())
+
+
+def get_ner_model():
+    return registry.get("ner_model")
+
+
+def get_name_index(field="user"):
+    """Returns the in-memory name index for "user", "company", "school" or "location",
+    reloading the indexes when the data version changes."""
+    from ingest.manifest import read_data_version
+    version, indexes = registry.get("name_indexes")
+    if version != read_data_version():
+        registry.reset("name_indexes")
+        version, indexes = registry.get("name_indexes")
+    return indexes[field]
+
+
+def get_graph_backend():
+    """Returns the GraphBackend selected by the GRAPH_BACKEND environment variable."""
+    if GRAPH_BACKEND == "memory":
+        return registry.get("graph_memory")
+    from retrievers.graph import Neo4jGraphBackend
+    return Neo4jGraphBackend(get_neo4j_driver())
+
+
+def reset_graph_backend(use_async=False):
+    """Drops the resource behind the active graph backend (the snapshot, or the sync or
+    async Neo4j driver) so the next query reloads or reconnects it."""
+    if GRAPH_BACKEND == "memory":
+        registry.reset("graph_memory")
+    else:
+        registry.reset("async_neo4j" if use_async else "neo4j")
+
+
+# --- Async accessors ---
+
+def get_async_qdrant_client():
+    """Returns the shared AsyncQdrantClient, or None when Qdrant runs embedded (no QDRANT_URL)."""
+    return registry.get("async_qdrant")
+
+
+def get_async_neo4j_driver():
+    return registry.get("async_neo4j")
+
+
+async def run_blocking(fn, *args):
+    """Runs a blocking call (DuckDB, model inference, embedded Qdrant) on the bounded
+    db executor so async callers never block the event loop."""
+    return await asyncio.get_running_loop().run_in_executor(registry.get("db_executor"), fn, *args)
+
+
+async def close_async_resources():
+    """Closes the async clients from inside the event loop they are bound to.
+    Async entry points should await this before their loop shuts down."""
+    for name in ("async_qdrant", "async_neo4j"):
+        resource = registry.release(name)
+        if resource is not None:
+            await resource.close()
@@ -1,67 +1,166 @@
 import os
-import duckdb
+import sys
 import argparse
 
-# --- Configuration ---
-DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
-DUCKDB_PATH = os.path.join(DATA_DIR, 'db', 'profiles.duckdb')
-
-def get_sql_recommendations(field: str, value: str, duckdb_con):
-    """Finds users based on a specific field and value in DuckDB."""
-    # Basic validation to prevent SQL injection, though parameters are safer
-    allowed_fields = ["company", "school", "location"]
-    if field not in allowed_fields:
-        raise ValueError(f"Invalid field. Allowed fields are: {', '.join(allowed_fields)}")
-
-    query = f"""SELECT user_id FROM users WHERE {field} = ?"""
-    result = duckdb_con.execute(query, [value]).fetchall()
-    
-    # fetchall returns a list of tuples, e.g., [('user2',), ('user5',)]
-    recommendations = [{
-        "user_id": row[0],
-        "reason": f"Same {field}: {value}"
-    } for row in result]
-    return recommendations
+# Add project root to path to allow direct script execution
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from retrievers.resources import DUCKDB_PATH, get_duckdb_cursor, get_thread_duckdb_cursor, get_name_index, run_blocking
+from retrievers.cache import cached
+
+# Columns that can be searched with get_sql_recommendations
+SQL_FIELDS = ["company", "school", "location"]
+# Matches per page returned by get_sql_recommendations_page and the agent tool
+SQL_PAGE_SIZE = int(os.getenv("SQL_PAGE_SIZE", 25))
+SQL_STREAM_BATCH_SIZE = 1000
+USER_DETAIL_COLUMNS = ["user_id", "name", "email", "company", "school", "location", "bio", "title"]
+
+# Statement text is built once per field, so every call reuses the same SQL string
+# and values are always bound as parameters. Lookups go through the lower-cased
+# `<field>_key` columns, which load_profiles indexes.
+SQL_QUERIES = {field: f"SELECT user_id FROM users WHERE {field}_key = ?" for field in SQL_FIELDS}
+SQL_BATCH_QUERIES = {field: f"SELECT {field}_key AS value, user_id FROM users WHERE {field}_key = ANY(?) ORDER BY value, user_id"
+                     for field in SQL_FIELDS}
+# Keyset pagination: each page starts after the last user_id of the previous one
+SQL_PAGE_QUERIES = {field: f"SELECT user_id FROM users WHERE {field}_key = ? AND user_id > ? ORDER BY user_id LIMIT ?"
+                    for field in SQL_FIELDS}
+SQL_COUNT_QUERIES = {field: f"SELECT count(*) FROM users WHERE {field}_key = ?" for field in SQL_FIELDS}
+# Bios live in their own table so the filter columns stay narrow
+USER_DETAILS_QUERY = f"""SELECT {', '.join('b.bio' if column == 'bio' else f'u.{column}' for column in USER_DETAIL_COLUMNS)}
+    FROM users u LEFT JOIN user_bios b USING (user_id) WHERE u.user_id = ANY(?)"""
+
+def lookup_key(value: str):
+    """Normalizes a value the same way load_profiles fills the `<field>_key` columns."""
+    return value.strip().lower()
+
+def _check_field(field):
+    if field not in SQL_FIELDS:
+        raise ValueError(f"Invalid field. Allowed fields are: {', '.join(SQL_FIELDS)}")
+
+def _fetch_columns(cursor, as_arrow):
+    return cursor.arrow() if as_arrow else cursor.fetchnumpy()
+
+def _to_recommendations(field, value, rows):
+    return [{"user_id": row[0], "reason": f"Same {field}: {value}"} for row in rows]
+
+@cached(key_args=["field", "value"])
+def get_sql_recommendations(field: str, value: str, duckdb_con=None):
+    """Finds every user with a specific field value in DuckDB. The result is unbounded;
+    use get_sql_recommendations_page or stream_sql_recommendations for large matches.
+    Uses the calling thread's cursor unless a connection is passed in."""
+    _check_field(field)
+    con = duckdb_con or get_thread_duckdb_cursor()
+    result = con.execute(SQL_QUERIES[field], [lookup_key(value)]).fetchall()
+    return _to_recommendations(field, value, result)
+
+@cached(key_args=["field", "value"], namespace="get_sql_recommendations")
+async def aget_sql_recommendations(field: str, value: str):
+    """Async get_sql_recommendations; the query runs on the bounded db executor."""
+    return await run_blocking(get_sql_recommendations.uncached, field, value)
+
+@cached(key_args=["field", "value", "limit", "after"])
+def get_sql_recommendations_page(field: str, value: str, limit: int = SQL_PAGE_SIZE, after: str | None = None, duckdb_con=None):
+    """Returns one page of get_sql_recommendations, ordered by user_id.
+    Pass the returned next_cursor as `after` to fetch the following page; it is None on
+    the last page. Returns {"results": [...], "next_cursor": str | None, "total": int}."""
+    _check_field(field)
+    con = duckdb_con or get_thread_duckdb_cursor()
+    key = lookup_key(value)
+    # Fetching one extra row tells us whether another page follows
+    rows = con.execute(SQL_PAGE_QUERIES[field], [key, after or "", limit + 1]).fetchall()
+    total = con.execute(SQL_COUNT_QUERIES[field], [key]).fetchone()[0]
+    next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+    return {"results": _to_recommendations(field, value, rows[:limit]), "next_cursor": next_cursor, "total": total}
+
+@cached(key_args=["field", "value", "limit", "after"], namespace="get_sql_recommendations_page")
+async def aget_sql_recommendations_page(field: str, value: str, limit: int = SQL_PAGE_SIZE, after: str | None = None):
+    """Async get_sql_recommendations_page, run on the bounded db executor."""
+    return await run_blocking(get_sql_recommendations_page.uncached, field, value, limit, after)
+
+def stream_sql_recommendations(field: str, value: str, batch_size: int = SQL_STREAM_BATCH_SIZE, as_arrow: bool = False):
+    """Yields every match in batches of at most `batch_size` rows, in no particular order:
+    lists of recommendation dicts, or pyarrow RecordBatches of user_id with as_arrow=True.
+    Only one batch is held in memory at a time. The stream has its own cursor, so the
+    caller can run other queries while consuming it."""
+    _check_field(field)
+    con = get_duckdb_cursor()
+    try:
+        cursor = con.execute(SQL_QUERIES[field], [lookup_key(value)])
+        if as_arrow:
+            yield from cursor.fetch_record_batch(batch_size)
+            return
+        while rows := cursor.fetchmany(batch_size):
+            yield _to_recommendations(field, value, rows)
+    finally:
+        con.close()
+
+def get_sql_matches_batch(field: str, values: list[str], as_arrow: bool = False):
+    """Finds the users matching any of `values` (case-insensitively) in one query.
+    Returns {"value": array, "user_id": array} as NumPy arrays (or a pyarrow Table with
+    as_arrow=True), sorted by value then user_id; `value` holds the lower-cased key."""
+    _check_field(field)
+    cursor = get_thread_duckdb_cursor().execute(SQL_BATCH_QUERIES[field], [[lookup_key(value) for value in values]])
+    return _fetch_columns(cursor, as_arrow)
+
+def get_user_columns(user_ids: list[str], as_arrow: bool = False):
+    """Fetches the detail columns for many users in one query as NumPy arrays (or a
+    pyarrow Table with as_arrow=True). Row order is not guaranteed."""
+    cursor = get_thread_duckdb_cursor().execute(USER_DETAILS_QUERY, [list(user_ids)])
+    return _fetch_columns(cursor, as_arrow)
 
 def get_user_details(user_ids: list[str]):
-    """Fetches full details for a list of user IDs from DuckDB by creating its own connection."""
+    """Fetches full details for a list of user IDs as a list of dicts."""
     if not user_ids:
         return []
+    cursor = get_thread_duckdb_cursor().execute(USER_DETAILS_QUERY, [list(user_ids)])
+    columns = [desc[0] for desc in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
 
-    con = None
-    try:
-        con = duckdb.connect(database=DUCKDB_PATH, read_only=True)
-        
-        # Create a placeholder string for the IN clause
-        placeholders = ', '.join(['?'] * len(user_ids))
-        
-        query = f"SELECT user_id, name, email, company, school, location, bio, title FROM users WHERE user_id IN ({placeholders})"
-        
-        cursor = con.execute(query, user_ids)
-        results = cursor.fetchall()
-        
-        # Convert results to a list of dictionaries using column names for robustness
-        users_details = []
-        columns = [desc[0] for desc in cursor.description]
-        for row in results:
-            users_details.append(dict(zip(columns, row)))
-            
-        return users_details
-    finally:
-        if con:
-            con.close()
+async def aget_user_details(user_ids: list[str]):
+    """Async get_user_details, run on the bounded db executor."""
+    return await run_blocking(get_user_details, user_ids)
+
+def resolve_user_name(name: str, limit: int = 5):
+    """Resolves a user name through the in-memory name index.
+
+    Returns (match, candidates), each a (display name, user_id) pair or list of them. `match`
+    is only set for an unambiguous exact or case-insensitive match, or a prefix that fits a
+    single user ("alice" -> "Alice Heart"); otherwise it is None, and `candidates` holds the
+    best matches, including fuzzy ones, for the caller to offer instead of guessing.
+    """
+    matches = get_name_index("user").lookup(name, limit=limit)
+    candidates = [(display, user_id) for display, user_id, _, _ in matches]
+    for match_types in [("exact", "casefold"), ("prefix",)]:
+        found = [(display, user_id) for display, user_id, match_type, _ in matches if match_type in match_types]
+        if found:
+            return (found[0] if len(found) == 1 else None), found
+    return None, candidates
 
 def get_user_id_by_name(name: str):
-    """Fetches a user_id for a given user name from DuckDB by creating its own connection."""
-    con = None
-    try:
-        con = duckdb.connect(database=DUCKDB_PATH, read_only=True)
-        query = "SELECT user_id FROM users WHERE name = ? LIMIT 1"
-        result = con.execute(query, [name]).fetchone()
-        return result[0] if result else None
-    finally:
-        if con:
-            con.close()
+    """Returns the user_id of an unambiguous exact, case-insensitive or unique-prefix match
+    for `name`, or None; see resolve_user_name() for the candidates."""
+    match, _ = resolve_user_name(name)
+    return match[1] if match else None
+
+def normalize_field_value(field: str, value: str):
+    """Maps a value to its stored spelling when the two differ only in case, e.g.
+    company:google -> Google. Prefix and fuzzy matches are never substituted, since they
+    would silently answer a different question; see suggest_field_values().
+    Returns the value unchanged for unknown fields or if there is no such match."""
+    if field not in SQL_FIELDS:
+        return value
+    for stored, _, match_type, _ in get_name_index(field).lookup(value, limit=1):
+        if match_type in ("exact", "casefold"):
+            return stored
+    return value
+
+def suggest_field_values(field: str, value: str, limit: int = 3):
+    """Returns up to `limit` stored values that start like or closely resemble `value`
+    (e.g. company:Gogle -> ["Google"]), for callers to offer when a lookup finds nobody."""
+    if field not in SQL_FIELDS:
+        return []
+    return [stored for stored, _, match_type, _ in get_name_index(field).lookup(value, limit=limit)
+            if match_type in ("prefix", "fuzzy")]
 
 def main():
     """Main function to test the SQL retriever."""
@@ -70,12 +169,13 @@ def main():
     parser.add_argument("--value", type=str, required=True, help="The value to search for.")
     args = parser.parse_args()
 
+    import duckdb
     con = None
     try:
         con = duckdb.connect(database=DUCKDB_PATH, read_only=True)
         print(f"Successfully connected to DuckDB.")
 
-        recommendations = get_sql_recommendations(args.field, args.value, con)
+        recommendations = get_sql_recommendations.uncached(args.field, args.value, con)
         
         print(f"\n--- SQL Recommendations for {args.field} = '{args.value}' ---")
         if recommendations:
@@ -1,51 +1,227 @@
 import os
-import json
-from qdrant_client import QdrantClient
-from sentence_transformers import SentenceTransformer
+import sys
+import asyncio
 import argparse
+from abc import ABC, abstractmethod
+
+# Add project root to path to allow direct script execution
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from retrievers.resources import (
+    BIOS_FILE_PATH, VECTOR_BACKEND, get_vector_index,
+    get_async_qdrant_client, get_embedding_model, get_bio_store, run_blocking,
+)
+from retrievers.vector_store import PAYLOAD_FIELDS, payload_key
+from retrievers.cache import cached
+from ingest.chunking import chunk_for_model
+# qdrant_client and sentence_transformers are imported where they are used, so importing
+# this module (and the router on top of it) does not pay for them up front
 
 # --- Configuration ---
-DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
-QDRANT_PATH = os.path.join(DATA_DIR, 'qdrant_db')
-BIOS_FILE_PATH = os.path.join(DATA_DIR, 'parsed', 'parsed_bios.jsonl')
 COLLECTION_NAME = "profiles"
+# Similar users returned per query (the user themselves is never included)
+DEFAULT_K = 4
+# A user's first chunks searched per query; long resumes have many more
+MAX_QUERY_CHUNKS = 8
+# How a candidate's best-chunk similarities to each query chunk are combined:
+# "max" favours one strong match, "sum" favours users similar across several sections
+DEFAULT_AGGREGATION = "max"
 
 def get_user_bio(user_id: str):
-    """Retrieves the bio for a given user_id from the JSONL file."""
+    """Retrieves the bio for a given user_id through the offset-indexed bio store."""
     try:
-        with open(BIOS_FILE_PATH, 'r', encoding='utf-8') as f:
-            for line in f:
-                record = json.loads(line)
-                if record['user_id'] == user_id:
-                    return record['bio']
+        return get_bio_store().get_bio(user_id)
     except FileNotFoundError:
         print(f"Error: Parsed bios file not found at {BIOS_FILE_PATH}")
         return None
-    return None
 
-def get_semantic_recommendations(user_id: str, qdrant_client: QdrantClient, model: SentenceTransformer):
-    """Finds semantically similar users from the Qdrant index."""
+def _user_filter(user_id: str):
+    from qdrant_client import models
+    return models.Filter(must=[
+        models.FieldCondition(key="user_id", match=models.MatchValue(value=user_id))
+    ])
+
+def _first_chunks_filter(user_id: str):
+    from qdrant_client import models
+    return models.Filter(must=[
+        models.FieldCondition(key="user_id", match=models.MatchValue(value=user_id)),
+        models.FieldCondition(key="chunk_index", range=models.Range(lt=MAX_QUERY_CHUNKS)),
+    ])
+
+def _chunks_query(scroll_filter):
+    return dict(collection_name=COLLECTION_NAME, scroll_filter=scroll_filter, limit=MAX_QUERY_CHUNKS,
+                with_payload=["chunk_index"], with_vectors=True)
+
+def _chunk_vectors(points):
+    """Returns the vectors of scrolled points in chunk order, or None if there are none.
+    Scroll returns points by id, and point ids are uuid5 hashes with no order of their own."""
+    points = sorted(points, key=lambda point: (point.payload or {}).get("chunk_index", MAX_QUERY_CHUNKS))
+    return [point.vector for point in points] or None
+
+def _normalize_filters(filters):
+    """Lower-cases filter values to match the stored payload and rejects unknown fields."""
+    normalized = {}
+    for field, values in (filters or {}).items():
+        if field not in PAYLOAD_FIELDS:
+            raise ValueError(f"Cannot filter on '{field}'. Allowed fields are: {', '.join(PAYLOAD_FIELDS)}")
+        normalized[field] = [payload_key(value) for value in ([values] if isinstance(values, str) else values)]
+    return normalized
+
+def _match(field, values):
+    from qdrant_client import models
+    return models.FieldCondition(key=field, match=models.MatchAny(any=list(values)))
+
+def _search_filter(user_id, filters, exclude, exclude_filters):
+    """Builds the Qdrant filter for a search: the user and `exclude` are always left out,
+    so exactly k results come back without over-fetching."""
+    from qdrant_client import models
+    return models.Filter(
+        must=[_match(field, values) for field, values in filters.items()] or None,
+        must_not=[_match("user_id", [user_id, *exclude])]
+                 + [_match(field, values) for field, values in exclude_filters.items()],
+    )
+
+def aggregate_hits(hit_lists, k, aggregation=DEFAULT_AGGREGATION):
+    """Combines one list of (user_id, score) hits per query chunk into the top k users.
+    Each list must already hold distinct users scored by their best chunk."""
+    scores = {}
+    for hits in hit_lists:
+        for user_id, score in hits:
+            if aggregation == "sum":
+                scores[user_id] = scores.get(user_id, 0.0) + score
+            else:
+                scores[user_id] = max(scores.get(user_id, score), score)
+    ranked = sorted(scores, key=lambda user_id: (-scores[user_id], user_id))[:k]
+    return [{"user_id": user_id, "reason": "Semantically similar bio"} for user_id in ranked]
+
+def _group_hits(result):
+    return [(group.id, group.hits[0].score) for group in result.groups]
+
+def _groups_query(query_vector, query_filter, k):
+    # Grouping by user_id collapses a user's chunks inside Qdrant, so k distinct users come back
+    return dict(collection_name=COLLECTION_NAME, query_vector=query_vector, query_filter=query_filter,
+                group_by="user_id", limit=k, group_size=1)
+
+class VectorIndex(ABC):
+    """Interface for engines that answer nearest-neighbour queries over bio chunk vectors.
+
+    user_vectors() returns a user's first stored chunk embeddings (at most MAX_QUERY_CHUNKS,
+    in chunk order), or None if the user is not indexed. search() returns one list of (user_id, score)
+    hits per query vector, each holding up to k distinct users scored by their best
+    chunk, never user_id or anyone in `exclude`. `filters` and `exclude_filters` map
+    PAYLOAD_FIELDS to lists of payload_key() values.
+    """
+
+    @abstractmethod
+    def user_vectors(self, user_id: str):
+        """Returns the user's first chunk vectors, or None if they are not indexed."""
+
+    @abstractmethod
+    def search(self, query_vectors, k: int, user_id: str, filters: dict, exclude=(), exclude_filters: dict = None):
+        """Returns one list of up to k distinct (user_id, score) hits per query vector."""
+
+class QdrantVectorIndex(VectorIndex):
+    """Searches the Qdrant collection through a QdrantClient."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def user_vectors(self, user_id):
+        points, _ = self.client.scroll(**_chunks_query(_first_chunks_filter(user_id)))
+        if not points:
+            # Points indexed before chunk_index was stored; their chunk order is unknown
+            points, _ = self.client.scroll(**_chunks_query(_user_filter(user_id)))
+        return _chunk_vectors(points)
+
+    def search(self, query_vectors, k, user_id, filters, exclude=(), exclude_filters=None):
+        query_filter = _search_filter(user_id, filters, exclude, exclude_filters or {})
+        return [_group_hits(self.client.search_groups(**_groups_query(vector, query_filter, k)))
+                for vector in query_vectors]
+
+class LocalVectorIndex(VectorIndex):
+    """Searches an in-process QuantizedVectorStore (VECTOR_BACKEND=local)."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def user_vectors(self, user_id):
+        vectors = self.store.get_vectors(user_id)
+        return None if vectors is None else vectors[:MAX_QUERY_CHUNKS]
+
+    def search(self, query_vectors, k, user_id, filters, exclude=(), exclude_filters=None):
+        # One mask serves every query vector
+        mask = self.store.filter_mask(filters, exclude_filters, exclude=[user_id, *exclude])
+        return [self.store.search(vector, k=k, mask=mask) for vector in query_vectors]
+
+def get_user_vectors(user_id: str, index):
+    """Fetches the chunk embeddings already stored for a user_id (at most MAX_QUERY_CHUNKS),
+    or None if the user is not indexed. `index` is a VectorIndex or a QdrantClient."""
+    return _as_vector_index(index).user_vectors(user_id)
+
+def _as_vector_index(index):
+    return index if isinstance(index, VectorIndex) else QdrantVectorIndex(index)
+
+def _encode_bio(user_id: str, model=None):
+    """Encodes the chunks of a user's bio with the shared model, or returns None if they have no bio."""
     target_bio = get_user_bio(user_id)
     if not target_bio:
         print(f"Could not find bio for user {user_id}")
-        return []
+        return None
+    model = model or get_embedding_model()
+    chunks = chunk_for_model(target_bio, model)[:MAX_QUERY_CHUNKS]
+    return [vector.tolist() for vector in model.encode(chunks)]
 
-    # Generate embedding for the bio
-    query_vector = model.encode(target_bio).tolist()
+@cached(key_args=["user_id", "k", "filters", "exclude", "exclude_filters", "aggregation"])
+def get_semantic_recommendations(user_id: str, index, model: "SentenceTransformer" = None, k: int = DEFAULT_K,
+                                 filters: dict = None, exclude: list = (), exclude_filters: dict = None,
+                                 aggregation: str = DEFAULT_AGGREGATION):
+    """Finds the k users with the most similar bios in `index`, a VectorIndex (see
+    get_vector_index) or a QdrantClient, which is wrapped in a QdrantVectorIndex.
 
-    # Search for similar vectors in Qdrant (top 5)
-    search_result = qdrant_client.search(
-        collection_name=COLLECTION_NAME,
-        query_vector=query_vector,
-        limit=5, # Return top 5, including the user themselves
-    )
-    
-    # Extract user_ids and construct reason, excluding the original user
-    recommendations = [{
-        "user_id": hit.payload['user_id'],
-        "reason": "Semantically similar bio"
-    } for hit in search_result if hit.payload['user_id'] != user_id]
-    return recommendations
+    `filters` maps company/school/location/title to a value or list of values that
+    results must have, e.g. {"location": "Seattle"}; `exclude_filters` removes matches
+    instead, e.g. {"company": "Google"} for "at other companies". Both, and the `exclude`
+    user_ids, are applied inside the index search. Values match case-insensitively.
+
+    Bios are indexed as several chunk vectors per user. Each of the user's chunks is
+    searched for the k best distinct users, and the hits are combined per user with
+    `aggregation` ("max" or "sum"). Uses the user's stored vectors when they are indexed;
+    only unknown users have their bio encoded on the fly, with the shared model loaded
+    if none is passed in."""
+    filters, exclude_filters = _normalize_filters(filters), _normalize_filters(exclude_filters)
+    index = _as_vector_index(index)
+    query_vectors = index.user_vectors(user_id)
+
+    if query_vectors is None:
+        query_vectors = _encode_bio(user_id, model)
+        if query_vectors is None:
+            return []
+
+    return aggregate_hits(index.search(query_vectors, k, user_id, filters, exclude, exclude_filters), k, aggregation)
+
+@cached(key_args=["user_id", "k", "filters", "exclude", "exclude_filters", "aggregation"],
+        namespace="get_semantic_recommendations")
+async def aget_semantic_recommendations(user_id: str, k: int = DEFAULT_K, filters: dict = None, exclude: list = (),
+                                        exclude_filters: dict = None, aggregation: str = DEFAULT_AGGREGATION):
+    """Async get_semantic_recommendations.
+    Uses AsyncQdrantClient when Qdrant runs as a server (QDRANT_URL); the embedded store
+    only allows one client per process, so then the sync client runs on the db executor.
+    Bio encoding and the local store (VECTOR_BACKEND=local) always run on the executor."""
+    client = get_async_qdrant_client() if VECTOR_BACKEND != "local" else None
+    if client is None:
+        return await run_blocking(lambda: get_semantic_recommendations.uncached(
+            user_id, get_vector_index(), None, k, filters, exclude, exclude_filters, aggregation))
+
+    query_filter = _search_filter(user_id, _normalize_filters(filters), exclude, _normalize_filters(exclude_filters))
+    points, _ = await client.scroll(**_chunks_query(_first_chunks_filter(user_id)))
+    if not points:
+        points, _ = await client.scroll(**_chunks_query(_user_filter(user_id)))
+    query_vectors = _chunk_vectors(points) or await run_blocking(_encode_bio, user_id)
+    if query_vectors is None:
+        return []
+    results = await asyncio.gather(*(client.search_groups(**_groups_query(vector, query_filter, k))
+                                     for vector in query_vectors))
+    return aggregate_hits([_group_hits(result) for result in results], k, aggregation)
 
 def main():
     """Main function to test the vector retriever."""
@@ -54,11 +230,10 @@ def main():
     args = parser.parse_args()
 
     try:
-        qdrant_client = QdrantClient(path=QDRANT_PATH)
-        model = SentenceTransformer('all-MiniLM-L6-v2', device='cpu')
-        print("Successfully loaded model and connected to Qdrant.")
+        index = get_vector_index()
+        print(f"Using the {VECTOR_BACKEND} vector backend.")
 
-        recommendations = get_semantic_recommendations(args.user_id, qdrant_client, model)
+        recommendations = get_semantic_recommendations.uncached(args.user_id, index)
 
         print(f"\n--- Semantic Recommendations for {args.user_id} ---")
         if recommendations:
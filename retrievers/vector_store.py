@@ -0,0 +1,309 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import numpy as np
+
+# Add project root to path to allow direct script execution
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ingest.manifest import bump_data_version
+
+# --- Configuration ---
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+VECTOR_STORE_DIR = os.path.join(DATA_DIR, 'vector_store')
+COLLECTION_NAME = "profiles"
+
+# Stores up to this size are scanned exhaustively; larger ones get an IVF index
+EXACT_SEARCH_MAX_VECTORS = 200_000
+# Candidates kept from the int8 scan per requested result, then rescored in float32
+RESCORE_FACTOR = 4
+# IVF lists searched per query
+DEFAULT_NPROBE = 16
+# Rows dequantized at a time during a scan, to bound temporary memory
+SCAN_CHUNK_ROWS = 16_384
+KMEANS_ITERATIONS = 20
+KMEANS_SAMPLE = 100_000
+
+STORE_ARRAYS = ["user_ids", "vectors", "codes", "scale", "offset"]
+IVF_ARRAYS = ["centroids", "list_indptr", "list_indices"]
+# Profile fields stored with every vector (lower-cased) so searches can filter on them
+PAYLOAD_FIELDS = ["company", "school", "location", "title"]
+
+def payload_key(value):
+    """Normalizes a payload value the same way for indexing and for filtering."""
+    return str(value).strip().lower()
+
+def _as_list(values):
+    return [values] if isinstance(values, str) else list(values)
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def quantize(vectors):
+    """Scalar-quantizes vectors to int8 with a per-dimension affine map.
+    Returns (codes, scale, offset) such that vectors ~= offset + scale * (codes + 128)."""
+    low, high = vectors.min(axis=0), vectors.max(axis=0)
+    scale = np.maximum(high - low, 1e-12) / 255
+    codes = np.clip(np.rint((vectors - low) / scale) - 128, -128, 127).astype(np.int8)
+    return codes, scale.astype(np.float32), low.astype(np.float32)
+
+def _top(scores, n):
+    """Indices of the n largest scores, unordered."""
+    if n >= len(scores):
+        return np.arange(len(scores))
+    return np.argpartition(-scores, n)[:n]
+
+def _nearest_centroids(vectors, centroids):
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), SCAN_CHUNK_ROWS):
+        chunk = np.asarray(vectors[start:start + SCAN_CHUNK_ROWS], dtype=np.float32)
+        assignments[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+    return assignments
+
+def train_centroids(vectors, n_lists, iterations=KMEANS_ITERATIONS, seed=0):
+    """Spherical k-means on a sample of unit vectors; returns (n_lists, dim) unit centroids."""
+    rng = np.random.default_rng(seed)
+    sample = np.asarray(vectors[np.sort(rng.choice(len(vectors), min(len(vectors), KMEANS_SAMPLE), replace=False))])
+    centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = _nearest_centroids(sample, centroids)
+        order = np.argsort(assignments, kind='stable')
+        counts = np.bincount(assignments, minlength=n_lists)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        filled = counts > 0
+        # Empty lists keep their previous centroid
+        centroids[filled] = _normalize(np.add.reduceat(sample[order], starts[filled]))
+    return centroids
+
+class QuantizedVectorStore:
+    """A read-only, in-process cosine similarity index over user embeddings.
+
+    Vectors are kept twice: as an int8 scalar-quantized matrix (a quarter of the
+    float32 size) that every query scans, and as unit float32 vectors that are only
+    read for the few candidates being rescored. Small stores are scanned exhaustively
+    with a chunked matmul; large ones add an IVF index (k-means lists stored as CSR
+    arrays) so a query only scans the nprobe closest lists. A user may own several
+    rows (one per bio chunk); rows are sorted by user_id and snapshots are directories
+    of .npy files that load memory-mapped.
+    """
+
+    def __init__(self, user_ids, vectors, codes, scale, offset, centroids=None, list_indptr=None, list_indices=None,
+                 payload=None):
+        self.user_ids = user_ids
+        self.vectors = vectors
+        self.codes = codes
+        self.scale = scale
+        self.offset = offset
+        self.centroids = centroids
+        self.list_indptr = list_indptr
+        self.list_indices = list_indices
+        # {field: (sorted value names, per-row index into names or -1)}
+        self.payload = payload or {}
+
+    @classmethod
+    def from_vectors(cls, user_ids, vectors, n_lists=None, payloads=None):
+        """Builds a store from parallel sequences of user_ids and embeddings, plus optional
+        per-user payload dicts holding the PAYLOAD_FIELDS.
+        n_lists=None builds an IVF index only above EXACT_SEARCH_MAX_VECTORS; 0 never does."""
+        user_ids = np.asarray(user_ids, dtype=str)
+        # Stable, so a user's chunks keep their order
+        order = np.argsort(user_ids, kind='stable')
+        user_ids, vectors = user_ids[order], _normalize(vectors)[order]
+        codes, scale, offset = quantize(vectors)
+        store = cls(user_ids, vectors, codes, scale, offset)
+        if payloads is not None:
+            payloads = [payloads[i] for i in order]
+            for field in PAYLOAD_FIELDS:
+                values = [payload_key(p[field]) if p.get(field) is not None else None for p in payloads]
+                names = np.array(sorted({v for v in values if v is not None}), dtype=str)
+                lookup = {name: i for i, name in enumerate(names)}
+                ids = np.array([lookup[v] if v is not None else -1 for v in values], dtype=np.int32)
+                store.payload[field] = (names, ids)
+        if n_lists is None and len(user_ids) > EXACT_SEARCH_MAX_VECTORS:
+            n_lists = int(4 * np.sqrt(len(user_ids)))
+        if n_lists:
+            store.build_ivf(n_lists)
+        return store
+
+    def build_ivf(self, n_lists):
+        """Clusters the vectors into n_lists inverted lists."""
+        self.centroids = train_centroids(self.vectors, n_lists)
+        assignments = _nearest_centroids(self.vectors, self.centroids)
+        self.list_indptr = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignments, minlength=n_lists), out=self.list_indptr[1:])
+        # Stable sort keeps each list in row order, which reads the mmap sequentially
+        self.list_indices = np.argsort(assignments, kind='stable').astype(np.int64)
+
+    def save(self, store_dir=VECTOR_STORE_DIR):
+        """Writes the store as a directory of .npy files, replacing any previous snapshot."""
+        tmp_dir = store_dir + ".tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        names = STORE_ARRAYS + (IVF_ARRAYS if self.centroids is not None else [])
+        for name in names:
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), getattr(self, name))
+        for field, (value_names, ids) in self.payload.items():
+            np.save(os.path.join(tmp_dir, f"payload_{field}_names.npy"), value_names)
+            np.save(os.path.join(tmp_dir, f"payload_{field}_ids.npy"), ids)
+        shutil.rmtree(store_dir, ignore_errors=True)
+        os.replace(tmp_dir, store_dir)
+
+    @classmethod
+    def load(cls, store_dir=VECTOR_STORE_DIR):
+        """Memory-maps a store written by save()."""
+        arrays = {name: np.load(os.path.join(store_dir, f"{name}.npy"), mmap_mode='r') for name in STORE_ARRAYS}
+        if os.path.exists(os.path.join(store_dir, "centroids.npy")):
+            arrays.update({name: np.load(os.path.join(store_dir, f"{name}.npy")) for name in IVF_ARRAYS})
+        arrays["payload"] = {
+            field: (np.load(os.path.join(store_dir, f"payload_{field}_names.npy")),
+                    np.load(os.path.join(store_dir, f"payload_{field}_ids.npy"), mmap_mode='r'))
+            for field in PAYLOAD_FIELDS if os.path.exists(os.path.join(store_dir, f"payload_{field}_ids.npy"))
+        }
+        return cls(**arrays)
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def _rows(self, user_id):
+        """Returns the (start, stop) row range of a user's vectors; empty if not indexed."""
+        return (int(np.searchsorted(self.user_ids, user_id, side='left')),
+                int(np.searchsorted(self.user_ids, user_id, side='right')))
+
+    def get_vectors(self, user_id):
+        """Returns a user's unit float32 vectors (one per chunk), or None if they are not indexed."""
+        start, stop = self._rows(user_id)
+        return np.array(self.vectors[start:stop]) if stop > start else None
+
+    def _payload_match(self, field, values):
+        if field not in self.payload:
+            raise ValueError(f"Cannot filter on '{field}'. Allowed fields are: {', '.join(self.payload) or 'none'}")
+        names, ids = self.payload[field]
+        wanted = [i for i in np.searchsorted(names, values) if i < len(names) and names[i] in values]
+        return np.isin(ids, wanted)
+
+    def filter_mask(self, filters=None, exclude_filters=None, exclude=()):
+        """Returns a boolean row mask keeping users whose payload matches every field in
+        `filters` (a value or list of values per field), none of `exclude_filters`, and
+        who are not in `exclude`. Values must already be payload_key()-normalized.
+        Returns None when nothing is filtered."""
+        if not filters and not exclude_filters and not exclude:
+            return None
+        mask = np.ones(len(self), dtype=bool)
+        for field, values in (filters or {}).items():
+            mask &= self._payload_match(field, _as_list(values))
+        for field, values in (exclude_filters or {}).items():
+            mask &= ~self._payload_match(field, _as_list(values))
+        for user_id in exclude:
+            start, stop = self._rows(user_id)
+            mask[start:stop] = False
+        return mask
+
+    def _candidate_rows(self, query, nprobe, mask=None):
+        """Rows to scan for a query: all of them (None), the rows passing `mask`, or the
+        members of the nprobe nearest lists that pass it. Filters that leave few enough
+        rows for an exact scan skip the IVF lists, so selective filters never come up short."""
+        allowed = None if mask is None else np.flatnonzero(mask)
+        if self.centroids is None or (allowed is not None and len(allowed) <= EXACT_SEARCH_MAX_VECTORS):
+            return allowed
+        lists = _top(self.centroids @ query, nprobe)
+        rows = np.sort(np.concatenate([self.list_indices[self.list_indptr[l]:self.list_indptr[l + 1]] for l in lists]))
+        return rows if mask is None else rows[mask[rows]]
+
+    def _coarse_scores(self, query, rows):
+        # Ranking only needs (query * scale) . codes; the offset terms are constant per query
+        weights = query * self.scale
+        n = len(self) if rows is None else len(rows)
+        scores = np.empty(n, dtype=np.float32)
+        for start in range(0, n, SCAN_CHUNK_ROWS):
+            if rows is None:
+                chunk = self.codes[start:start + SCAN_CHUNK_ROWS]
+            else:
+                chunk = self.codes[rows[start:start + SCAN_CHUNK_ROWS]]
+            scores[start:start + len(chunk)] = chunk.astype(np.float32) @ weights
+        return scores
+
+    def search(self, query, k=5, nprobe=DEFAULT_NPROBE, rescore_factor=RESCORE_FACTOR, mask=None):
+        """Returns up to k (user_id, cosine similarity) pairs for distinct users, best first,
+        among the rows passing `mask` (see filter_mask); filtered rows are never scanned.
+        A user with several matching chunks is scored by their best one. Candidates come
+        from the int8 matrix and are rescored with the float32 vectors; the candidate pool
+        grows until it holds k distinct users, so one user's many near-identical chunks
+        cannot crowd the others out."""
+        query = _normalize(query)
+        rows = self._candidate_rows(query, nprobe, mask)
+        coarse = self._coarse_scores(query, rows)
+        pool = k * rescore_factor
+        while True:
+            candidates = _top(coarse, pool)
+            if rows is not None:
+                candidates = rows[candidates]
+            candidates = np.sort(candidates)
+            if len(np.unique(self.user_ids[candidates])) >= k or pool >= len(coarse):
+                break
+            pool *= 4
+        exact = np.asarray(self.vectors[candidates], dtype=np.float32) @ query
+        results = {}
+        for i in np.lexsort((candidates, -exact)):
+            user_id = str(self.user_ids[candidates[i]])
+            if user_id not in results:
+                results[user_id] = float(exact[i])
+                if len(results) == k:
+                    break
+        return list(results.items())
+
+def export_qdrant_vectors(client, collection_name=COLLECTION_NAME, page_size=1024):
+    """Reads every point of a Qdrant collection. Returns (user_ids, vectors, payloads)."""
+    user_ids, vectors, payloads = [], [], []
+    offset = None
+    while True:
+        points, offset = client.scroll(collection_name=collection_name, limit=page_size, offset=offset,
+                                       with_payload=["user_id"] + PAYLOAD_FIELDS, with_vectors=True)
+        for point in points:
+            user_ids.append(point.payload["user_id"])
+            vectors.append(point.vector)
+            payloads.append(point.payload)
+        if offset is None:
+            return user_ids, np.asarray(vectors, dtype=np.float32), payloads
+
+def build_vector_store(client, store_dir=VECTOR_STORE_DIR, n_lists=None):
+    """Builds the local store from the Qdrant collection written by semantic_indexer and saves it."""
+    user_ids, vectors, payloads = export_qdrant_vectors(client)
+    store = QuantizedVectorStore.from_vectors(user_ids, vectors, n_lists, payloads)
+    store.save(store_dir)
+    bump_data_version()
+    return store
+
+def main():
+    """Builds the local vector store from Qdrant, or queries it when a user_id is given."""
+    parser = argparse.ArgumentParser(description="Build or query the local quantized vector store.")
+    parser.add_argument("user_id", type=str, nargs="?", help="Find users similar to this user instead of building.")
+    parser.add_argument("--k", type=int, default=5, help="Number of neighbours to return.")
+    parser.add_argument("--lists", type=int, default=None, help="IVF lists (0 disables the index; default depends on size).")
+    args = parser.parse_args()
+
+    if args.user_id is None:
+        from qdrant_client import QdrantClient
+        from retrievers.resources import QDRANT_PATH, QDRANT_URL
+        client = QdrantClient(url=QDRANT_URL) if QDRANT_URL else QdrantClient(path=QDRANT_PATH)
+        start = time.perf_counter()
+        store = build_vector_store(client, n_lists=args.lists)
+        client.close()
+        index = f"IVF with {len(store.centroids)} lists" if store.centroids is not None else "exact search"
+        print(f"Saved vector store with {len(store)} vectors for {len(np.unique(store.user_ids))} users ({index}) in {time.perf_counter() - start:.2f}s.")
+        return
+
+    store = QuantizedVectorStore.load()
+    vectors = store.get_vectors(args.user_id)
+    if vectors is None:
+        print(f"User {args.user_id} is not in the vector store.")
+        return
+    # Search with the user's first chunk; retrievers/vector.py aggregates over all of them
+    for user_id, score in store.search(vectors[0], k=args.k, mask=store.filter_mask(exclude=[args.user_id])):
+        print(f"- {user_id} ({score:.3f})")
+
+if __name__ == "__main__":
+    main()
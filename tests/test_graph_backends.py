@@ -0,0 +1,171 @@
+import os
+import sys
+import math
+import pytest
+
+# Add project root to path to allow direct test execution
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from retrievers.graph import get_graph_recommendations, Neo4jGraphBackend
+from retrievers.graph_memory import CSRGraph
+
+# Neo4j tests wipe the target database, so they only run against an explicitly named test server
+NEO4J_TEST_URI = os.getenv("NEO4J_TEST_URI")
+
+# u1 shares a small school with u2, a mid-sized company with u3/u4 and a hub with u2-u5.
+# u6 only belongs to a company nobody else works at.
+FIXTURE_EDGES = [
+    ("u1", "School", "Tiny College"), ("u2", "School", "Tiny College"),
+    ("u1", "Company", "Mid Corp"), ("u3", "Company", "Mid Corp"), ("u4", "Company", "Mid Corp"),
+    ("u1", "Company", "Hub Inc"), ("u2", "Company", "Hub Inc"), ("u3", "Company", "Hub Inc"),
+    ("u4", "Company", "Hub Inc"), ("u5", "Company", "Hub Inc"),
+    ("u6", "Company", "Solo Ltd"),
+]
+
+def _load_neo4j(driver):
+    relationship = {"School": "ATTENDED", "Company": "WORKED_AT"}
+    with driver.session() as session:
+        session.run("MATCH (n) DETACH DELETE n")
+        for user_id, entity_type, name in FIXTURE_EDGES:
+            session.run(f"MERGE (u:User {{user_id: $user_id}}) MERGE (e:{entity_type} {{name: $name}}) "
+                        f"MERGE (u)-[:{relationship[entity_type]}]->(e)", user_id=user_id, name=name)
+
+@pytest.fixture(params=["memory", "neo4j"])
+def backend(request):
+    if request.param == "memory":
+        yield CSRGraph.from_edges(FIXTURE_EDGES)
+        return
+    if not NEO4J_TEST_URI:
+        pytest.skip("Set NEO4J_TEST_URI (plus NEO4J_USER/NEO4J_PASSWORD) to run against Neo4j")
+    from neo4j import GraphDatabase
+    driver = GraphDatabase.driver(NEO4J_TEST_URI, auth=(os.getenv("NEO4J_USER"), os.getenv("NEO4J_PASSWORD")))
+    _load_neo4j(driver)
+    yield Neo4jGraphBackend(driver)
+    driver.close()
+
+def _reasons(match):
+    return sorted((reason["type"], reason["name"]) for reason in match["reasons"])
+
+def test_ranked_order_and_scores(backend):
+    matches = backend.second_degree("u1", k=10, max_hub_degree=None)
+    assert [m["user_id"] for m in matches] == ["u2", "u3", "u4", "u5"]
+    expected = {
+        "u2": 1 / math.log(2) + 1 / math.log(5),
+        "u3": 1 / math.log(3) + 1 / math.log(5),
+        "u4": 1 / math.log(3) + 1 / math.log(5),
+        "u5": 1 / math.log(5),
+    }
+    for match in matches:
+        assert match["score"] == pytest.approx(expected[match["user_id"]])
+    assert _reasons(matches[0]) == [("Company", "Hub Inc"), ("School", "Tiny College")]
+
+def test_k_limits_results(backend):
+    assert [m["user_id"] for m in backend.second_degree("u1", k=2, max_hub_degree=None)] == ["u2", "u3"]
+
+def test_hub_pruning(backend):
+    matches = backend.second_degree("u1", k=10, max_hub_degree=4)
+    assert [m["user_id"] for m in matches] == ["u2", "u3", "u4"]
+    assert all(("Company", "Hub Inc") not in _reasons(m) for m in matches)
+
+def test_unranked_returns_all_candidates_without_scores(backend):
+    matches = backend.second_degree("u1", k=10, ranked=False)
+    assert {m["user_id"] for m in matches} == {"u2", "u3", "u4", "u5"}
+    assert all(m["score"] is None for m in matches)
+
+def test_unknown_user(backend):
+    assert backend.second_degree("missing", k=10) == []
+
+def test_user_without_shared_nodes(backend):
+    assert backend.second_degree("u6", k=10) == []
+
+def test_recommendations_format(backend):
+    recommendations = get_graph_recommendations.uncached("u1", backend, k=1, max_hub_degree=4)
+    assert recommendations == [{"user_id": "u2", "reason": "Shared School: Tiny College", "score": pytest.approx(1 / math.log(2))}]
+
+# --- Precomputed candidates and fallback ---
+
+@pytest.fixture
+def candidates_con(tmp_path):
+    duckdb = pytest.importorskip("duckdb")
+    from retrievers.graph import CANDIDATES_TABLE
+    con = duckdb.connect(str(tmp_path / "candidates.duckdb"))
+    con.execute(f"CREATE TABLE {CANDIDATES_TABLE} (user_id VARCHAR, rank INTEGER, recommended_user_id VARCHAR, "
+                "score DOUBLE, reason VARCHAR)")
+    con.execute(f"INSERT INTO {CANDIDATES_TABLE} VALUES ('u1', 1, 'u9', 5.0, 'Precomputed')")
+    yield con
+    con.close()
+
+@pytest.fixture
+def live_graph(monkeypatch):
+    """Points the resource accessors at the fixture graph and records backend resets."""
+    from retrievers import resources
+    from retrievers.cache import query_cache
+    monkeypatch.setattr(query_cache, "ttl", 0)
+    monkeypatch.setattr(resources, "get_graph_backend", lambda: CSRGraph.from_edges(FIXTURE_EDGES))
+    resets = []
+    monkeypatch.setattr(resources, "reset_graph_backend", lambda use_async=False: resets.append(use_async))
+    return resets
+
+def test_precomputed_returns_none_without_table_or_user(candidates_con, tmp_path):
+    import duckdb
+    from retrievers.graph import get_precomputed_graph_recommendations
+    assert get_precomputed_graph_recommendations("u1", candidates_con)[0]["user_id"] == "u9"
+    assert get_precomputed_graph_recommendations("u2", candidates_con) is None
+    empty = duckdb.connect(str(tmp_path / "empty.duckdb"))
+    assert get_precomputed_graph_recommendations("u1", empty) is None
+    empty.close()
+
+def test_connections_use_precomputed_then_live(candidates_con, live_graph, monkeypatch):
+    from retrievers import resources
+    from retrievers.graph import get_graph_connections
+    monkeypatch.setattr(resources, "GRAPH_BACKEND", "neo4j")
+    monkeypatch.setattr(resources, "get_thread_duckdb_cursor", lambda: candidates_con)
+    assert [r["user_id"] for r in get_graph_connections("u1")] == ["u9"]
+    # u2 was added after the precompute, so it is answered live
+    assert [r["user_id"] for r in get_graph_connections("u2")] == ["u1", "u3", "u4", "u5"]
+
+def test_memory_backend_skips_precomputed(candidates_con, live_graph, monkeypatch):
+    from retrievers import resources
+    from retrievers.graph import get_graph_connections
+    monkeypatch.setattr(resources, "GRAPH_BACKEND", "memory")
+    monkeypatch.setattr(resources, "get_thread_duckdb_cursor", lambda: candidates_con)
+    assert [r["user_id"] for r in get_graph_connections("u1")] == ["u2", "u3", "u4", "u5"]
+
+def test_duckdb_error_falls_back_without_resetting_graph_backend(live_graph, monkeypatch):
+    duckdb = pytest.importorskip("duckdb")
+    from retrievers import resources
+    from retrievers.graph import get_graph_connections
+
+    def broken_cursor():
+        raise duckdb.IOException("Could not set lock on file")
+
+    monkeypatch.setattr(resources, "GRAPH_BACKEND", "neo4j")
+    monkeypatch.setattr(resources, "get_thread_duckdb_cursor", broken_cursor)
+    assert [r["user_id"] for r in get_graph_connections("u1")] == ["u2", "u3", "u4", "u5"]
+    assert live_graph == []
+
+def test_live_backend_error_resets_backend(live_graph, monkeypatch):
+    from retrievers import resources
+    from retrievers.graph import get_graph_connections
+
+    def failing_backend():
+        raise ConnectionError("graph unavailable")
+
+    monkeypatch.setattr(resources, "GRAPH_BACKEND", "memory")
+    monkeypatch.setattr(resources, "get_graph_backend", failing_backend)
+    with pytest.raises(ConnectionError):
+        get_graph_connections("u1")
+    assert live_graph == [False]
+
+def test_precomputed_candidates_match_live_order(backend):
+    from collections import defaultdict
+    from recommenders.graph_candidates import compute_candidates
+    user_entities, entity_members = defaultdict(set), defaultdict(set)
+    for user_id, entity_type, name in FIXTURE_EDGES:
+        user_entities[user_id].add((entity_type, name))
+        entity_members[(entity_type, name)].add(user_id)
+    for max_hub_degree in [None, 4]:
+        rows = [row for row in compute_candidates(user_entities, entity_members, 10, max_hub_degree) if row[0] == "u1"]
+        live = backend.second_degree("u1", k=10, max_hub_degree=max_hub_degree)
+        assert [row[2] for row in rows] == [m["user_id"] for m in live]
+        assert [row[3] for row in rows] == pytest.approx([m["score"] for m in live])
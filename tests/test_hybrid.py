@@ -0,0 +1,28 @@
+import os
+import sys
+import threading
+
+# Add project root to path to allow direct test execution
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from recommenders import hybrid
+
+def test_hung_retriever_does_not_starve_the_others(monkeypatch):
+    release = threading.Event()
+
+    def hung_graph(user_id):
+        release.wait()
+        return []
+
+    monkeypatch.setitem(hybrid.RETRIEVERS, "sql", lambda user_id: [{"user_id": "u2", "reason": "Same company: A"}])
+    monkeypatch.setitem(hybrid.RETRIEVERS, "vector", lambda user_id: [])
+    monkeypatch.setitem(hybrid.RETRIEVERS, "graph", hung_graph)
+    try:
+        # Enough requests for the hung calls to outnumber the graph pool's threads
+        for _ in range(2 * hybrid.RETRIEVER_WORKERS + 4):
+            response = hybrid.hybrid_recommend("u1", timeouts={"sql": 1.0, "vector": 1.0, "graph": 0.01})
+            assert response["sources"]["graph"]["status"] == "timeout"
+            assert response["sources"]["sql"]["status"] == "ok"
+            assert [rec["user_id"] for rec in response["results"]] == ["u2"]
+    finally:
+        release.set()
@@ -0,0 +1,95 @@
+import os
+import sys
+import pytest
+
+# Add project root to path to allow direct test execution
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ingest import manifest
+from ingest.pipeline import PipelineContext, Stage, run_pipeline
+
+@pytest.fixture(autouse=True)
+def manifest_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(manifest, "MANIFEST_DIR", str(tmp_path))
+
+def _stages(store, runs):
+    """A two-stage pipeline whose outputs live in `store`, a dict standing in for a database."""
+    def build(ctx):
+        runs.append("build")
+        store["table"] = True
+
+    def derive(ctx):
+        runs.append("derive")
+        store["derived"] = True
+
+    return [
+        Stage("build", [], [], [lambda ctx: "table" in store], [], build),
+        Stage("derive", ["build"], [], [lambda ctx: "derived" in store], [], derive),
+    ]
+
+def test_unchanged_stages_with_present_outputs_are_not_rerun():
+    store, runs = {}, []
+    run_pipeline(_stages(store, runs), PipelineContext())
+    results = run_pipeline(_stages(store, runs), PipelineContext())
+    assert runs == ["build", "derive"]
+    assert results == {"build": ("unchanged", 0.0), "derive": ("unchanged", 0.0)}
+
+def test_missing_output_reruns_stage():
+    store, runs = {}, []
+    run_pipeline(_stages(store, runs), PipelineContext())
+    del store["derived"]
+    results = run_pipeline(_stages(store, runs), PipelineContext())
+    assert runs == ["build", "derive", "derive"]
+    assert results["build"] == ("unchanged", 0.0)
+    assert results["derive"][0] == "ran"
+
+class FakeGraphBuilder:
+    """Stands in for Neo4jGraphBuilder, keeping User nodes in `graph`, a set the test
+    patches in so it outlives each build."""
+    graph = None
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def has_users(self):
+        return bool(self.graph)
+
+    def clear_graph(self):
+        self.graph.clear()
+
+    def remove_users(self, user_ids):
+        self.graph.difference_update(user_ids)
+
+    def reset_user_edges(self, user_ids):
+        pass
+
+    def prune_orphans(self):
+        pass
+
+    def build_graph(self, users_df, user_bios, batch_size=None, user_organizations=None):
+        self.graph.update(users_df['user_id'])
+
+    def close(self):
+        pass
+
+def test_delta_run_rebuilds_a_wiped_graph(monkeypatch):
+    pd = pytest.importorskip("pandas")
+    pytest.importorskip("spacy")
+    from retrievers import graph_builder
+    graph = set()
+    monkeypatch.setattr(FakeGraphBuilder, "graph", graph)
+    monkeypatch.setattr(graph_builder, "Neo4jGraphBuilder", FakeGraphBuilder)
+    users_df = pd.DataFrame({"user_id": ["u001", "u002"], "name": ["Alice Heart", "Bob Womack"]})
+
+    def stages():
+        build = lambda ctx: graph_builder.build_knowledge_graph(users_df, {}, delta=ctx.delta, user_organizations={})
+        return [Stage("graph", [], [], [lambda ctx: bool(graph)], [], build)]
+
+    run_pipeline(stages(), PipelineContext(delta=True))
+    assert graph == {"u001", "u002"}
+
+    # The database is wiped but the manifest still lists every user as built
+    graph.clear()
+    results = run_pipeline(stages(), PipelineContext(delta=True))
+    assert results["graph"][0] == "ran"
+    assert graph == {"u001", "u002"}
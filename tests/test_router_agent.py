@@ -0,0 +1,124 @@
+import os
+import sys
+import pytest
+
+# Add project root to path to allow direct test execution
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from recommenders.router_agent import FAST_PATH_THRESHOLD, RecommendationRouter, classify_prompt
+
+# Prompts the fast path must serve, with the tool call it should make
+FAST_PATH_PROMPTS = [
+    ("Find users who work at Google", "sql_retriever", "company:Google"),
+    ("Who went to MIT?", "sql_retriever", "school:MIT"),
+    ("Show me people based in San Francisco", "sql_retriever", "location:San Francisco"),
+    ("company: Johnson & Johnson", "sql_retriever", "company:Johnson & Johnson"),
+    ("Who works at 3M?", "sql_retriever", "company:3M"),
+    ("users who attended Andover", "sql_retriever", "school:Andover"),
+    ("Find users similar to u001", "vector_retriever", "u001"),
+    ("Who is in u001's network?", "graph_retriever", "u001"),
+    ("Find connections for u002", "graph_retriever", "u002"),
+    ("Recommend people for u001", "hybrid_retriever", "u001"),
+    ("Who should u003 meet?", "hybrid_retriever", "u003"),
+]
+
+# Prompts with more than one constraint, or none the rules know, must go to the agent
+AGENT_PROMPTS = [
+    "Who works at Google in Seattle?",
+    "Find users who work at Google and went to MIT",
+    "people like u001 who went to Stanford",
+    "Who works at Google or Meta?",
+    "Find users similar to u001 who live in Seattle",
+    "What is the weather like today?",
+]
+
+@pytest.mark.parametrize("prompt, tool_name, tool_input", FAST_PATH_PROMPTS)
+def test_fast_path_prompts(prompt, tool_name, tool_input):
+    assert classify_prompt(prompt) == (tool_name, tool_input, 1.0)
+
+@pytest.mark.parametrize("prompt", AGENT_PROMPTS)
+def test_multi_constraint_prompts_fall_below_threshold(prompt):
+    _, _, confidence = classify_prompt(prompt)
+    assert confidence < FAST_PATH_THRESHOLD
+
+def test_partial_match_keeps_whole_entity():
+    assert classify_prompt("Who works at Google in Seattle?")[:2] == ("sql_retriever", "company:Google")
+
+class StubAgent:
+    """Stands in for the LLM agent executor and records the prompts it receives."""
+
+    def __init__(self):
+        self.prompts = []
+
+    def invoke(self, inputs):
+        self.prompts.append(inputs["input"])
+        return {"input": inputs["input"], "output": "stub answer", "intermediate_steps": []}
+
+def _router():
+    agent = StubAgent()
+    router = RecommendationRouter(agent_factory=lambda: agent)
+    calls = []
+
+    def recording_tool(name):
+        def run(tool_input):
+            calls.append((name, tool_input))
+            return [{"user_id": "u9"}]
+        return run
+
+    router.tools = {name: recording_tool(name) for name in router.tools}
+    return router, agent, calls
+
+def test_fast_path_skips_agent():
+    router, agent, calls = _router()
+    result = router.invoke({"input": "Find users who work at Google"})
+    assert result["route"] == "fast:sql_retriever"
+    assert calls == [("sql_retriever", "company:Google")]
+    assert agent.prompts == []
+
+@pytest.mark.parametrize("prompt", AGENT_PROMPTS)
+def test_agent_fallback(prompt):
+    router, agent, calls = _router()
+    result = router.invoke({"input": prompt})
+    assert result["route"] == "agent"
+    assert result["output"] == "stub answer"
+    assert agent.prompts == [prompt]
+    assert calls == []
+
+@pytest.fixture
+def company_index(monkeypatch):
+    from retrievers import sql
+    from retrievers.name_index import NameIndex
+    index = NameIndex([(name, name) for name in ["Google", "Goldman Sachs", "Meta"]])
+    monkeypatch.setattr(sql, "get_name_index", lambda field: index)
+
+def test_normalize_only_fixes_case(company_index):
+    from retrievers.sql import normalize_field_value
+    assert normalize_field_value("company", "google") == "Google"
+    assert normalize_field_value("company", "Gogle") == "Gogle"
+    assert normalize_field_value("company", "Goo") == "Goo"
+
+def test_empty_sql_result_suggests_close_values(company_index, monkeypatch):
+    from recommenders import router_agent
+    monkeypatch.setattr(router_agent, "get_sql_recommendations_page",
+                        lambda field, value: {"results": [], "next_cursor": None, "total": 0})
+    assert router_agent.sql_retriever("company:Gogle") == ["No users found with company 'Gogle'. Did you mean: Google?"]
+
+@pytest.fixture
+def user_index(monkeypatch):
+    from retrievers import sql
+    from retrievers.name_index import NameIndex
+    index = NameIndex([("Bob Womack", "u002"), ("Alec Prince", "u003"), ("Alice Heart", "u001"), ("Alan Smith", "u004")])
+    monkeypatch.setattr(sql, "get_name_index", lambda field: index)
+
+def test_resolve_user_name_only_accepts_unambiguous_matches(user_index):
+    from retrievers.sql import get_user_id_by_name, resolve_user_name
+    assert resolve_user_name("Alice Heart")[0] == ("Alice Heart", "u001")
+    assert resolve_user_name("alice heart")[0] == ("Alice Heart", "u001")
+    assert resolve_user_name("Alic")[0] == ("Alice Heart", "u001")
+    # A near miss or an ambiguous prefix is offered, never picked
+    assert resolve_user_name("Rob Womack") == (None, [("Bob Womack", "u002")])
+    match, candidates = resolve_user_name("Al")
+    assert match is None
+    assert {user_id for _, user_id in candidates} == {"u001", "u003", "u004"}
+    assert get_user_id_by_name("Rob Womack") is None
+    assert get_user_id_by_name("Al") is None
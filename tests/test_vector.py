@@ -0,0 +1,61 @@
+import os
+import sys
+import uuid
+import pytest
+
+# Add project root to path to allow direct test execution
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from retrievers.vector import COLLECTION_NAME, MAX_QUERY_CHUNKS, QdrantVectorIndex, aggregate_hits
+
+# Hits of two query chunks: b matches one chunk strongly, c matches both moderately
+HIT_LISTS = [
+    [("b", 0.9), ("c", 0.6), ("d", 0.5)],
+    [("c", 0.6), ("d", 0.5), ("e", 0.1)],
+]
+
+def _ids(recommendations):
+    return [rec["user_id"] for rec in recommendations]
+
+def test_max_aggregation_favours_the_strongest_chunk():
+    assert _ids(aggregate_hits(HIT_LISTS, k=3, aggregation="max")) == ["b", "c", "d"]
+
+def test_sum_aggregation_favours_users_similar_across_chunks():
+    assert _ids(aggregate_hits(HIT_LISTS, k=3, aggregation="sum")) == ["c", "d", "b"]
+
+def test_aggregation_breaks_ties_by_user_id_and_truncates():
+    assert _ids(aggregate_hits([[("z", 0.5), ("a", 0.5), ("m", 0.4)]], k=2)) == ["a", "z"]
+    assert aggregate_hits([], k=3) == []
+
+def _point_id(user_id, chunk):
+    # uuid5 ids like the indexer's, so scroll order is unrelated to chunk order
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{user_id}#{chunk}"))
+
+@pytest.fixture
+def qdrant():
+    pytest.importorskip("qdrant_client")
+    from qdrant_client import QdrantClient, models
+    client = QdrantClient(":memory:")
+    client.create_collection(COLLECTION_NAME, vectors_config=models.VectorParams(size=2, distance=models.Distance.DOT))
+    yield client, models
+    client.close()
+
+def test_user_vectors_are_the_first_chunks_in_order(qdrant):
+    client, models = qdrant
+    chunks = MAX_QUERY_CHUNKS + 4
+    client.upsert(COLLECTION_NAME, points=[
+        models.PointStruct(id=_point_id("u001", i), vector=[float(i), 1.0],
+                           payload={"user_id": "u001", "chunk_index": i})
+        for i in range(chunks)
+    ])
+    vectors = QdrantVectorIndex(client).user_vectors("u001")
+    assert [vector[0] for vector in vectors] == [float(i) for i in range(MAX_QUERY_CHUNKS)]
+    assert QdrantVectorIndex(client).user_vectors("u002") is None
+
+def test_user_vectors_read_points_without_chunk_index(qdrant):
+    client, models = qdrant
+    client.upsert(COLLECTION_NAME, points=[
+        models.PointStruct(id=_point_id("u001", i), vector=[float(i), 1.0], payload={"user_id": "u001"})
+        for i in range(3)
+    ])
+    assert len(QdrantVectorIndex(client).user_vectors("u001")) == 3
@@ -0,0 +1,83 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+# Add project root to path to allow direct test execution
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from retrievers.vector_store import QuantizedVectorStore
+
+DIM = 16
+
+def _random_vectors(n, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, DIM)).astype(np.float32)
+
+@pytest.fixture
+def people():
+    """Four users with one chunk each, and the company/location payload of each."""
+    user_ids = ["a", "b", "c", "d"]
+    payloads = [
+        {"company": "Google", "location": "Seattle"},
+        {"company": "Google", "location": "Boston"},
+        {"company": "Meta", "location": "Seattle"},
+        {"company": "Meta", "location": None},
+    ]
+    return user_ids, _random_vectors(4), payloads
+
+def test_crowded_user_does_not_hide_others():
+    query = np.ones(DIM, dtype=np.float32)
+    others = _random_vectors(3)
+    user_ids = ["a"] * 50 + ["b", "c", "d"]
+    vectors = np.vstack([np.tile(query, (50, 1)), others])
+    store = QuantizedVectorStore.from_vectors(user_ids, vectors, n_lists=0)
+    # a's 50 chunks fill the default rescoring pool of k * RESCORE_FACTOR rows on their own
+    hits = store.search(query, k=3)
+    assert len(hits) == 3
+    assert hits[0] == ("a", pytest.approx(1.0))
+    assert {user_id for user_id, _ in hits[1:]} <= {"b", "c", "d"}
+
+def test_search_returns_distinct_users_best_first():
+    user_ids = [f"u{i % 10}" for i in range(200)]
+    store = QuantizedVectorStore.from_vectors(user_ids, _random_vectors(200), n_lists=0)
+    hits = store.search(_random_vectors(1, seed=1)[0], k=5)
+    assert len({user_id for user_id, _ in hits}) == 5
+    assert [score for _, score in hits] == sorted((score for _, score in hits), reverse=True)
+
+def test_filters_and_exclusions(people):
+    user_ids, vectors, payloads = people
+    store = QuantizedVectorStore.from_vectors(user_ids, vectors, n_lists=0, payloads=payloads)
+    query = vectors[0]
+
+    def found(**kwargs):
+        return {user_id for user_id, _ in store.search(query, k=4, mask=store.filter_mask(**kwargs))}
+
+    assert found(filters={"company": "google"}) == {"a", "b"}
+    assert found(filters={"company": ["google", "meta"], "location": "seattle"}) == {"a", "c"}
+    assert found(exclude_filters={"company": "google"}) == {"c", "d"}
+    assert found(exclude=["a", "c"]) == {"b", "d"}
+    assert found(filters={"company": "amazon"}) == set()
+    assert store.filter_mask() is None
+    with pytest.raises(ValueError):
+        store.filter_mask(filters={"email": "x"})
+
+def test_ivf_search_matches_exact_search():
+    user_ids = [f"u{i:03d}" for i in range(300)]
+    vectors = _random_vectors(300)
+    exact = QuantizedVectorStore.from_vectors(user_ids, vectors, n_lists=0)
+    ivf = QuantizedVectorStore.from_vectors(user_ids, vectors, n_lists=8)
+    assert ivf.centroids is not None
+    query = _random_vectors(1, seed=2)[0]
+    # Probing every list scans every row, so the IVF path must agree with the exhaustive scan
+    assert ivf.search(query, k=5, nprobe=8) == exact.search(query, k=5)
+    assert len(ivf.search(query, k=5, nprobe=2)) == 5
+
+def test_ivf_store_survives_save_and_load(tmp_path, people):
+    user_ids, vectors, payloads = people
+    store = QuantizedVectorStore.from_vectors(user_ids, vectors, n_lists=2, payloads=payloads)
+    store.save(str(tmp_path / "store"))
+    loaded = QuantizedVectorStore.load(str(tmp_path / "store"))
+    mask = loaded.filter_mask(filters={"location": "seattle"})
+    assert loaded.search(vectors[2], k=2, mask=mask) == store.search(vectors[2], k=2, mask=mask)
+    assert np.allclose(loaded.get_vectors("b"), store.get_vectors("b"))
+    assert loaded.get_vectors("z") is None
@@ -1,18 +1,16 @@
 import streamlit as st
-import duckdb
 import os
 import re
-import spacy
 import sys
-import ast
+import time
 
 # Add project root to Python path to allow absolute imports
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from recommenders.router_agent import create_agent_executor
-from retrievers.sql import get_user_details, get_user_id_by_name
-
-# --- Constants ---
-DUCKDB_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'db', 'profiles.duckdb')
+from recommenders.router_agent import create_router
+from retrievers.sql import get_user_details, resolve_user_name
+from retrievers.resources import registry, get_ner_model, get_name_index
+from retrievers.cache import query_cache
+from recommenders.hybrid import reciprocal_rank_fusion
 
 st.set_page_config(page_title="Network Recommendation Engine", layout="centered")
 
@@ -23,82 +21,148 @@ st.info("Welcome! Ask a question like \"Find users who work at Google\" or \"Fin
 # Initialize agent executor
 if 'agent_executor' not in st.session_state:
     with st.spinner("Initializing agent..."):
-        st.session_state.agent_executor = create_agent_executor()
+        # Recognisable prompts are answered without the LLM; the agent is built on first need
+        st.session_state.agent_executor = create_router()
+
+# Load the NER model and name index once per process; later sessions reuse them
+if 'startup_timings' not in st.session_state:
+    with st.spinner("Loading models..."):
+        timings = {}
+        for name, load in [("ner_model", get_ner_model), ("name_indexes", get_name_index)]:
+            start = time.perf_counter()
+            load()
+            timings[name] = (time.perf_counter() - start) * 1000
+        st.session_state.startup_timings = timings
+
+# Seconds a resource health report is reused; every rerun would otherwise ping Neo4j and Qdrant
+HEALTH_TTL_SECONDS = 30
+
+@st.cache_data(ttl=HEALTH_TTL_SECONDS, show_spinner=False)
+def resource_health():
+    return registry.health()
+
+# Shared connections and models live in the process-wide registry, so they
+# survive Streamlit reruns and are reused across sessions.
+with st.sidebar.expander("Resource status"):
+    if st.button("Recheck"):
+        resource_health.clear()
+    status = resource_health()
+    if status:
+        for name, healthy in status.items():
+            st.write(f"**{name}:** {'OK' if healthy is True else healthy}")
+    else:
+        st.write("No resources loaded yet.")
+    st.write(f"**Query cache:** {query_cache.stats()}")
+    st.write("**Startup (ms):** " + ", ".join(f"{name} {ms:.1f}" for name, ms in st.session_state.startup_timings.items()))
+
+def show_recommendations(processed_prompt, timings):
+    """Runs a prompt whose user names are already replaced by ids and renders the results."""
+    # 1. Get agent's raw output, including intermediate steps
+    start = time.perf_counter()
+    result = st.session_state.agent_executor.invoke({"input": processed_prompt})
+    timings[result.get("route", "agent")] = time.perf_counter() - start
+    output_text = result['output']
+
+    # 2. Parse recommendations from the raw tool output in intermediate_steps
+    recommendations = {}
+    user_ids = []
+
+    if 'intermediate_steps' in result and result['intermediate_steps']:
+        # Fuse the ranked outputs of every tool call so users found by several tools rank first
+        ranked_lists = {
+            f"{step[0].tool}#{i}": step[1]  # step[1] is the observation from the tool
+            for i, step in enumerate(result['intermediate_steps'])
+            if isinstance(step[1], list)
+        }
+        for rec in reciprocal_rank_fusion(ranked_lists):
+            reasons = list(dict.fromkeys(r['reason'] for r in rec['reasons'] if r['reason']))
+            recommendations[rec['user_id']] = " & ".join(reasons) or "N/A"
+        user_ids = list(recommendations.keys())
+
+    # Fallback: If intermediate steps didn't yield users, parse the final output text
+    if not user_ids and output_text:
+        user_ids = list(set(re.findall(r'u\d{3}', output_text)))
+
+    if user_ids:
+        # 3. Get user details from DuckDB
+        start = time.perf_counter()
+        users = get_user_details(user_ids)
+        timings["user details"] = time.perf_counter() - start
+        # Keep the fused ranking order rather than DuckDB's row order
+        rank = {user_id: i for i, user_id in enumerate(user_ids)}
+        users.sort(key=lambda user: rank.get(user['user_id'], len(rank)))
+
+        # 4. Display results in cards
+        st.success("Found the following users:")
+        st.caption(" | ".join(f"{name}: {seconds * 1000:.1f} ms" for name, seconds in timings.items()))
+        for user in users:
+            with st.container(border=True):
+                # Get specific reason if available, otherwise "N/A"
+                reason = recommendations.get(user['user_id'], "N/A")
+                st.subheader(f"{user['name']} - *{user.get('title', 'N/A')}*")
+                # Display the reason in a distinct caption format if available
+                if reason != "N/A":
+                    st.caption(f"{reason}")
+                st.write(f"**Email:** {user.get('email', 'N/A')}")
+                st.write(f"**Company:** {user.get('company', 'N/A')}")
+                st.write(f"**School:** {user.get('school', 'N/A')}")
+                st.write(f"**Location:** {user.get('location', 'N/A')}")
+                with st.expander("View Bio"):
+                    st.write(user.get('bio', 'No bio available.'))
+    else:
+        # Display the agent's raw output if no users are found or if there's a message
+        st.warning(output_text)
+
+def resolve_name_and_run(prompt):
+    """Replaces the PERSON named in the prompt with their user_id and runs it. Ambiguous or
+    approximate names are never guessed: the candidates are kept for the user to choose."""
+    timings = {}
+    start = time.perf_counter()
+    doc = get_ner_model()(prompt)
+    name_to_find = next((ent.text for ent in doc.ents if ent.label_ == "PERSON"), None)
+    timings["ner"] = time.perf_counter() - start
+
+    if not name_to_find:
+        show_recommendations(prompt, timings)
+        return
+
+    start = time.perf_counter()
+    match, candidates = resolve_user_name(name_to_find)
+    timings["name resolution"] = time.perf_counter() - start
+    if match:
+        display_name, user_id = match
+        st.info(f"Found user '{display_name}' ({user_id}). Searching their network...")
+        show_recommendations(prompt.replace(name_to_find, user_id), timings)
+    elif candidates:
+        st.session_state.name_choice = {"prompt": prompt, "name": name_to_find, "candidates": candidates}
+    else:
+        st.warning(f"Could not find a user named '{name_to_find}'. Please try another name.")
 
 prompt = st.text_input("Enter your prompt:", placeholder="e.g., Find users similar to Alice Heart")
 
 if st.button("Get Recommendations"):
+    st.session_state.pop("name_choice", None)
     if prompt:
         with st.spinner("Thinking..."):
             try:
-                # --- Name-to-ID Resolution ---
-                processed_prompt = prompt
-                nlp = spacy.load("en_core_web_sm")
-                doc = nlp(prompt)
-                name_to_find = next((ent.text for ent in doc.ents if ent.label_ == "PERSON"), None)
-
-                if name_to_find:
-                    user_id = get_user_id_by_name(name_to_find)
-                    if user_id:
-                        processed_prompt = prompt.replace(name_to_find, user_id)
-                        st.info(f"Found user '{name_to_find}.' Searching their network...")
-                    else:
-                        st.warning(f"Could not find a user named '{name_to_find}'. Please try another name.")
-                        st.stop()
-                
-                # 1. Get agent's raw output, including intermediate steps
-                result = st.session_state.agent_executor.invoke({"input": processed_prompt})
-                output_text = result['output']
-
-                # 2. Parse recommendations from the raw tool output in intermediate_steps
-                recommendations = {}
-                user_ids = []
-                
-                if 'intermediate_steps' in result and result['intermediate_steps']:
-                    # Iterate over all tool calls to aggregate results
-                    for step in result['intermediate_steps']:
-                        tool_output = step[1]  # This is the observation from the tool
-                        if isinstance(tool_output, list):
-                            for item in tool_output:
-                                user_id = item.get('user_id')
-                                reason = item.get('reason')
-                                if user_id and reason:
-                                    # If user is already recommended, append the new reason
-                                    if user_id in recommendations:
-                                        recommendations[user_id] += f" & {reason}"
-                                    else:
-                                        recommendations[user_id] = reason
-                    user_ids = list(recommendations.keys())
-
-                # Fallback: If intermediate steps didn't yield users, parse the final output text
-                if not user_ids and output_text:
-                    user_ids = list(set(re.findall(r'u\d{3}', output_text)))
-
-                if user_ids:
-                    # 3. Get user details from DuckDB
-                    users = get_user_details(user_ids)
-
-                    # 4. Display results in cards
-                    st.success("Found the following users:")
-                    for user in users:
-                        with st.container(border=True):
-                            # Get specific reason if available, otherwise "N/A"
-                            reason = recommendations.get(user['user_id'], "N/A")
-                            st.subheader(f"{user['name']} - *{user.get('title', 'N/A')}*")
-                            # Display the reason in a distinct caption format if available
-                            if reason != "N/A":
-                                st.caption(f"{reason}")
-                            st.write(f"**Email:** {user.get('email', 'N/A')}")
-                            st.write(f"**Company:** {user.get('company', 'N/A')}")
-                            st.write(f"**School:** {user.get('school', 'N/A')}")
-                            st.write(f"**Location:** {user.get('location', 'N/A')}")
-                            with st.expander("View Bio"):
-                                st.write(user.get('bio', 'No bio available.'))
-                else:
-                    # Display the agent's raw output if no users are found or if there's a message
-                    st.warning(output_text)
-
+                resolve_name_and_run(prompt)
             except Exception as e:
                 st.error(f"An error occurred: {e}")
     else:
         st.warning("Please enter a prompt.")
+
+# A name without a certain match: the user picks who they meant
+if "name_choice" in st.session_state:
+    choice = st.session_state.name_choice
+    labels = [f"{display} ({user_id})" for display, user_id in choice["candidates"]]
+    picked = st.radio(f"No user is named exactly '{choice['name']}'. Did you mean:", range(len(labels)),
+                      format_func=labels.__getitem__)
+    if st.button("Search as this user"):
+        display_name, user_id = choice["candidates"][picked]
+        del st.session_state.name_choice
+        with st.spinner("Thinking..."):
+            try:
+                st.info(f"Searching the network of '{display_name}' ({user_id})...")
+                show_recommendations(choice["prompt"].replace(choice["name"], user_id), {})
+            except Exception as e:
+                st.error(f"An error occurred: {e}")